@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Measure the per-line cost of feeding ffmpeg output through FfmpegProgress.
+
+The cost per line should stay flat as the log grows. Run with:
+
+    uv run python benchmarks/bench_log_buffer.py [max_lines]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+
+_TEST_LOG = os.path.join(
+    os.path.dirname(__file__), "../tests/fixtures/ffmpeg_output.log"
+)
+
+
+def main() -> None:
+    max_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with open(_TEST_LOG) as f:
+        lines = f.read().splitlines()
+
+    # feed the banner once, then keep repeating the progress blocks
+    first_block = lines.index("progress=continue") + 1
+    header, body = lines[:first_block], lines[first_block:]
+
+    ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4"], exclude_progress=True)
+    for line in header:
+        ff._process_output(line, None)
+    checkpoints = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+    window = 1_000
+    fed = 0
+    print(f"{'lines':>10} {'ns/line':>10}")
+    for checkpoint in checkpoints:
+        if checkpoint > max_lines:
+            break
+        # fill up to just before the checkpoint, then time a window of lines
+        while fed < checkpoint - window:
+            ff._process_output(body[fed % len(body)], None)
+            fed += 1
+        start = time.perf_counter()
+        while fed < checkpoint:
+            ff._process_output(body[fed % len(body)], None)
+            fed += 1
+        elapsed = time.perf_counter() - start
+        print(f"{checkpoint:>10} {elapsed / window * 1e9:>10.0f}")
+
+    start = time.perf_counter()
+    assert ff.stderr is not None
+    print(
+        f"building stderr of {len(ff.stderr)} chars took {time.perf_counter() - start:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
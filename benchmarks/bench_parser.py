@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compare the throughput of the block-oriented progress parser against the
+previous per-line regex approach.
+
+A multi-megabyte log is synthesized from the recorded log in
+tests/fixtures by repeating its progress blocks with increasing timestamps.
+Run with:
+
+    uv run python benchmarks/bench_parser.py [size_mb]
+"""
+
+import os
+import sys
+import time
+from typing import List, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.ffmpeg_progress_yield import to_ms  # noqa: E402
+from ffmpeg_progress_yield.log_buffer import LogBuffer  # noqa: E402
+
+_TEST_LOG = os.path.join(
+    os.path.dirname(__file__), "../tests/fixtures/ffmpeg_output.log"
+)
+
+DUR_REGEX = FfmpegProgress.DUR_REGEX
+TIME_REGEX = FfmpegProgress.TIME_REGEX
+PROGRESS_REGEX = FfmpegProgress.PROGRESS_REGEX
+
+
+def synthesize_log(size_mb: float) -> List[str]:
+    with open(_TEST_LOG) as f:
+        lines = f.read().splitlines()
+    first_block = lines.index("progress=continue") + 1
+    header, block = lines[:first_block], lines[first_block - 12 : first_block]
+
+    out = list(header)
+    size = sum(len(line) + 1 for line in out)
+    us = 0
+    while size < size_mb * 1024 * 1024:
+        us += 40_000
+        sec = us / 1_000_000
+        for line in block:
+            if line.startswith("out_time_us=") or line.startswith("out_time_ms="):
+                line = f"{line[:12]}{us}"
+            elif line.startswith("out_time="):
+                line = f"out_time={int(sec // 3600):02d}:{int(sec % 3600 // 60):02d}:{sec % 60:09.6f}"
+            out.append(line)
+            size += len(line) + 1
+    return out
+
+
+class LegacyProcessor:
+    """
+    The previous hot path of FfmpegProgress._process_output: every line is searched
+    for a duration and an output time, and optionally matched against the progress regex.
+    """
+
+    def __init__(self, exclude_progress: bool) -> None:
+        self.log = LogBuffer(exclude_progress=exclude_progress)
+        self.total_dur: Union[int, None] = None
+        self.stderr_callback = None
+
+    def process_output(self, stderr_line: str) -> Union[float, None]:
+        if self.stderr_callback:
+            self.stderr_callback(stderr_line)
+
+        self.log.append(stderr_line.strip())
+
+        progress = None
+        if current_dur_match := DUR_REGEX.search(stderr_line):
+            self.total_dur = to_ms(**current_dur_match.groupdict())
+
+        if (
+            progress_time := TIME_REGEX.search(stderr_line)
+        ) and self.total_dur is not None:
+            elapsed_time = to_ms(**progress_time.groupdict())
+            progress = min(max(round(elapsed_time / self.total_dur * 100, 2), 0), 100)
+
+        return progress
+
+
+def legacy_process(lines: List[str], exclude_progress: bool) -> int:
+    processor = LegacyProcessor(exclude_progress)
+    progress_count = 0
+    for line in lines:
+        if processor.process_output(line) is not None:
+            progress_count += 1
+    return progress_count
+
+
+def current_process(lines: List[str], exclude_progress: bool) -> int:
+    ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4"], exclude_progress=exclude_progress)
+    progress_count = 0
+    for line in lines:
+        if ff._process_output(line, None) is not None:
+            progress_count += 1
+    return progress_count
+
+
+def main() -> None:
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    lines = synthesize_log(size_mb)
+    print(f"log: {size_mb} MB, {len(lines)} lines")
+    print(f"{'implementation':<16} {'exclude':<8} {'lines/s':>12} {'updates':>8}")
+    for exclude_progress in (False, True):
+        for name, func in (("before", legacy_process), ("after", current_process)):
+            # best of several runs, to reduce noise
+            elapsed = float("inf")
+            for _ in range(5):
+                start = time.perf_counter()
+                updates = func(lines, exclude_progress)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            print(
+                f"{name:<16} {str(exclude_progress):<8} {len(lines) / elapsed:>12,.0f} {updates:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
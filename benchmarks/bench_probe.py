@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare the latency of reading the duration from the container header against
+running ffprobe, for every file in a directory of test assets.
+
+Run with:
+
+    uv run python benchmarks/bench_probe.py [directory] [ffprobe_path]
+
+The directory defaults to tests/. If ffprobe is not found, only the header
+reader is timed.
+"""
+
+import os
+import shutil
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.container import read_duration  # noqa: E402
+
+
+def measure(
+    func: Callable[[str], Optional[int]], file_name: str, runs: int
+) -> Tuple[float, Optional[int]]:
+    """
+    Returns:
+        Tuple[float, Optional[int]]: The median latency in milliseconds, and the duration.
+    """
+    times: List[float] = []
+    duration = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        duration = func(file_name)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, duration
+
+
+def main() -> None:
+    directory = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.path.join(os.path.dirname(__file__), "../tests")
+    )
+    ffprobe_path = shutil.which(sys.argv[2] if len(sys.argv) > 2 else "ffprobe")
+    ff = FfmpegProgress(["ffmpeg"], ffprobe_path=ffprobe_path or "ffprobe")
+
+    def ffprobe(file_name: str) -> Optional[int]:
+        try:
+            return ff._probe_file_duration(file_name)
+        except Exception:
+            return None
+
+    if ffprobe_path is None:
+        print("ffprobe not found, only timing the header reader")
+
+    print(
+        f"{'file':<32} {'header ms':>10} {'ffprobe ms':>11} {'header':>8} {'ffprobe':>8}"
+    )
+    for name in sorted(os.listdir(directory)):
+        file_name = os.path.join(directory, name)
+        if not os.path.isfile(file_name):
+            continue
+        header_ms, header_duration = measure(read_duration, file_name, 50)
+        if header_duration is None:
+            continue
+        ffprobe_ms, ffprobe_duration = (
+            measure(ffprobe, file_name, 5) if ffprobe_path else (float("nan"), None)
+        )
+        print(
+            f"{name[:32]:<32} {header_ms:>10.3f} {ffprobe_ms:>11.1f} "
+            f"{header_duration:>8} {str(ffprobe_duration):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare the CPU time spent reading ffmpeg's merged output in chunks against
+the previous line-by-line `readline()` loop, at a high log rate.
+
+The fake ffmpeg from tests/ replays a synthesized multi-megabyte log (see
+bench_parser.py) as fast as it can. Only the CPU time of this process is
+measured, not that of the child. Run with:
+
+    uv run python benchmarks/bench_reader.py [size_mb]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from typing import Iterator, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_parser import synthesize_log  # noqa: E402
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "../tests/fake_ffmpeg.py")
+
+
+class LegacyFfmpegProgress(FfmpegProgress):
+    """
+    Reads the merged output with the previous loop: one readline(), decode and
+    strip per line, stopping once the process has exited.
+    """
+
+    def _read_output(self, duration_override: Union[float, None]) -> Iterator[None]:
+        while True:
+            stderr_line = (
+                self.process.stdout.readline().decode("utf-8", errors="replace").strip()
+            )
+            if stderr_line == "" and self.process.poll() is not None:
+                break
+            if self._process_output(stderr_line, duration_override) is not None:
+                yield None
+
+
+def run(cls, exclude_progress: bool) -> int:
+    ff = cls([_FAKE_FFMPEG, "-i", "in.mp4"], exclude_progress=exclude_progress)
+    return sum(1 for _ in ff.run_command_with_progress())
+
+
+def main() -> None:
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    lines = synthesize_log(size_mb)
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        f.write("\n".join(lines) + "\n")
+    os.environ["FAKE_FFMPEG_LOG"] = f.name
+
+    try:
+        print(f"log: {size_mb} MB, {len(lines)} lines")
+        print(
+            f"{'implementation':<16} {'exclude':<8} {'cpu s':>8} {'us/line':>8} {'updates':>8}"
+        )
+        for exclude_progress in (False, True):
+            for name, cls in (
+                ("readline", LegacyFfmpegProgress),
+                ("chunked", FfmpegProgress),
+            ):
+                # best of several runs, to reduce noise
+                cpu = float("inf")
+                for _ in range(5):
+                    start = time.process_time()
+                    updates = run(cls, exclude_progress)
+                    cpu = min(cpu, time.process_time() - start)
+                print(
+                    f"{name:<16} {str(exclude_progress):<8} {cpu:>8.3f} "
+                    f"{cpu / len(lines) * 1e6:>8.2f} {updates:>8}"
+                )
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Measure the sync, async and CLI paths end to end, by replaying a recorded
+ffmpeg log through the fake ffmpeg from tests/, so that no real ffmpeg is needed.
+
+For each path, this reports:
+
+- the parse throughput in lines per second (best of several runs),
+- the latency of each progress update, from the moment the fake ffmpeg
+  flushed the block until the update is yielded (not for the CLI),
+- the memory: the peak and retained Python allocations of a run (measured
+  with tracemalloc), or the maximum resident set size of the CLI process,
+- where the time goes, from FfmpegProgress(collect_timings=True), with a
+  no-op stderr callback,
+
+followed by the startup cost of importing the package and of a CLI dry run.
+
+The log is synthesized from tests/fixtures (see bench_parser.py). By default,
+it is replayed as fast as possible. With --rate, the fake ffmpeg writes that
+many progress blocks per second, which is closer to a real encode (ffmpeg
+writes about two per second), but takes longer, so use a smaller log. Run with:
+
+    uv run python benchmarks/bench_suite.py [--size-mb 8] [--rate 0] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_parser import synthesize_log  # noqa: E402
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.timings import STAGES, Timings  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "../tests/fake_ffmpeg.py")
+_SRC = os.path.join(os.path.dirname(__file__), "../src")
+CMD = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+
+class Result:
+    def __init__(self) -> None:
+        self.elapsed = float("inf")
+        self.updates = 0
+        self.latencies: List[float] = []
+        self.peak_mb: Optional[float] = None
+        self.retained_mb: Optional[float] = None
+        self.timings: Optional[Timings] = None
+
+
+def block_latency(ff: FfmpegProgress) -> Optional[float]:
+    """
+    Get the time since the fake ffmpeg flushed the last completed block.
+    """
+    sent = ff._parser.block.get("bench_time")
+    return time.time() - float(sent) if sent is not None else None
+
+
+def run_sync(**kwargs) -> Tuple[FfmpegProgress, int, List[float]]:
+    ff = FfmpegProgress(CMD, **kwargs)
+    if ff.timings is not None:
+        ff.set_stderr_callback(lambda line: None)
+    updates = 0
+    latencies = []
+    for _ in ff.run_command_with_progress():
+        updates += 1
+        if (latency := block_latency(ff)) is not None:
+            latencies.append(latency)
+    return ff, updates, latencies
+
+
+def run_async(**kwargs) -> Tuple[FfmpegProgress, int, List[float]]:
+    async def run() -> Tuple[FfmpegProgress, int, List[float]]:
+        ff = FfmpegProgress(CMD, **kwargs)
+        if ff.timings is not None:
+            ff.set_stderr_callback(lambda line: None)
+        updates = 0
+        latencies = []
+        async for _ in ff.async_run_command_with_progress():
+            updates += 1
+            if (latency := block_latency(ff)) is not None:
+                latencies.append(latency)
+        return ff, updates, latencies
+
+    return asyncio.run(run())
+
+
+def measure_in_process(
+    run: Callable[..., Tuple[FfmpegProgress, int, List[float]]], runs: int
+) -> Result:
+    result = Result()
+    for _ in range(runs):
+        start = time.perf_counter()
+        _, updates, latencies = run()
+        elapsed = time.perf_counter() - start
+        if elapsed < result.elapsed:
+            result.elapsed, result.updates = elapsed, updates
+        result.latencies += latencies
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ff, _, _ = run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result.peak_mb = (peak - before) / 1024 / 1024
+    # what a finished run keeps, mostly the log
+    result.retained_mb = (current - before) / 1024 / 1024
+    del ff
+
+    result.timings = run(collect_timings=True)[0].timings
+    return result
+
+
+def cli_cmd(*args: str) -> List[str]:
+    return [sys.executable, "-m", "ffmpeg_progress_yield", *args]
+
+
+def cli_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [_SRC, env.get("PYTHONPATH")]))
+    return env
+
+
+def measure_cli(runs: int) -> Result:
+    result = Result()
+    # print the progress lines instead of a bar, so that they can be counted
+    env = {**cli_env(), "FFMPEG_PROGRESS_NO_TQDM": "1"}
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            cli_cmd("-p", *CMD),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+        )
+        output, _ = process.communicate()
+        updates = output.count(b"\r")
+        elapsed = time.perf_counter() - start
+        if elapsed < result.elapsed:
+            result.elapsed, result.updates = elapsed, updates
+
+    # the maximum resident set size of the CLI, in a fresh parent process
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import resource, subprocess, sys; "
+            "subprocess.run(sys.argv[1:], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL); "
+            "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)",
+            *cli_cmd("-p", *CMD),
+        ],
+        env=env,
+    )
+    # kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    result.peak_mb = int(output) / scale
+    return result
+
+
+def measure_startup(runs: int) -> Dict[str, float]:
+    """
+    Get the median wall-clock time of a few commands in milliseconds.
+    """
+    cmds = {
+        "python": [sys.executable, "-c", "pass"],
+        "import": [sys.executable, "-c", "import ffmpeg_progress_yield"],
+        "cli --dry-run": cli_cmd("-n", "ffmpeg", "-i", "in.mp4", "out.mp4"),
+    }
+    medians = {}
+    for name, cmd in cmds.items():
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=cli_env(),
+                check=True,
+            )
+            times.append(time.perf_counter() - start)
+        medians[name] = statistics.median(times) * 1000
+    return medians
+
+
+def format_mb(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def format_latency(latencies: List[float]) -> str:
+    if not latencies:
+        return f"{'-':>8} {'-':>8} {'-':>8}"
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    return f"{p50:>8.3f} {p95:>8.3f} {latencies[-1] * 1000:>8.3f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=8, help="Size of the log.")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="Progress blocks per second, or 0 for as fast as possible.",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Runs per path.")
+    args = parser.parse_args()
+
+    lines = synthesize_log(args.size_mb)
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        f.write("\n".join(lines) + "\n")
+    os.environ["FAKE_FFMPEG_LOG"] = f.name
+    os.environ["FAKE_FFMPEG_TIMESTAMPS"] = "1"
+    os.environ["FAKE_FFMPEG_DELAY"] = str(1 / args.rate if args.rate else 0)
+    # the log gains one line per block for the timestamps
+    total_lines = len(lines) + sum(line.startswith("progress=") for line in lines)
+
+    try:
+        results = {
+            "sync": measure_in_process(run_sync, args.runs),
+            "async": measure_in_process(run_async, args.runs),
+            "cli": measure_cli(args.runs),
+        }
+        startup = measure_startup(max(args.runs, 5))
+    finally:
+        os.unlink(f.name)
+
+    rate = f"{args.rate:g} blocks/s" if args.rate else "as fast as possible"
+    print(f"log: {args.size_mb} MB, {total_lines} lines, {rate}")
+    print()
+    print(
+        f"{'path':<6} {'lines/s':>12} {'updates':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'peak MB':>8} {'kept MB':>8}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<6} {total_lines / result.elapsed:>12,.0f} {result.updates:>8} "
+            f"{format_latency(result.latencies)} "
+            f"{format_mb(result.peak_mb):>8} {format_mb(result.retained_mb):>8}"
+        )
+    print("(cli: peak is the maximum resident set size)")
+
+    print()
+    print(f"{'path':<6} " + " ".join(f"{stage + ' s':>10}" for stage in STAGES))
+    for name, result in results.items():
+        if result.timings is not None:
+            seconds = result.timings.seconds
+            print(
+                f"{name:<6} " + " ".join(f"{seconds[stage]:>10.3f}" for stage in STAGES)
+            )
+
+    print()
+    for name, ms in startup.items():
+        print(f"{name:<14} {ms:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,83 @@
-from importlib import metadata
+import importlib
+from typing import TYPE_CHECKING, Any
 
-from .ffmpeg_progress_yield import FfmpegProgress
+if TYPE_CHECKING:
+    from .batch import BatchRunner
+    from .cancellation import CancellationToken, RunCancelledError
+    from .duration_cache import DurationCache
+    from .estimator import ProgressEstimator
+    from .events import EventBus, Subscription
+    from .ffmpeg_progress_yield import FfmpegProgress
+    from .metrics import Metrics
+    from .pipeline import Pipeline
+    from .progress import ProgressRecord
+    from .scheduler import CpuScheduler
+    from .segmented import SegmentedTranscode
+    from .timings import Timings
+    from .watchdog import StallError
 
-try:
-    __version__ = metadata.version("ffmpeg-progress-yield")
-except metadata.PackageNotFoundError:
-    __version__ = "unknown"
+    __version__: str
 
-__all__ = ["FfmpegProgress"]
+# the module of each exported name, which is only imported when the name is
+# first used, so that importing the package (e.g. for the CLI) stays cheap
+_EXPORTS = {
+    "BatchRunner": "batch",
+    "CancellationToken": "cancellation",
+    "CpuScheduler": "scheduler",
+    "DurationCache": "duration_cache",
+    "EventBus": "events",
+    "FfmpegProgress": "ffmpeg_progress_yield",
+    "Metrics": "metrics",
+    "Pipeline": "pipeline",
+    "ProgressEstimator": "estimator",
+    "ProgressRecord": "progress",
+    "RunCancelledError": "cancellation",
+    "SegmentedTranscode": "segmented",
+    "StallError": "watchdog",
+    "Subscription": "events",
+    "Timings": "timings",
+}
+
+
+def _version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version("ffmpeg-progress-yield")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def __getattr__(name: str) -> Any:
+    if name == "__version__":
+        value: Any = _version()
+    elif name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> Any:
+    return sorted([*globals(), *_EXPORTS, "__version__"])
+
+
+__all__ = [
+    "BatchRunner",
+    "CancellationToken",
+    "CpuScheduler",
+    "DurationCache",
+    "EventBus",
+    "FfmpegProgress",
+    "Metrics",
+    "Pipeline",
+    "ProgressEstimator",
+    "ProgressRecord",
+    "RunCancelledError",
+    "SegmentedTranscode",
+    "StallError",
+    "Subscription",
+    "Timings",
+]
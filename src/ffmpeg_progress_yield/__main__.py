@@ -1,13 +1,74 @@
 import argparse
-import platform
+import json
+import os
+import shlex
+from typing import TYPE_CHECKING, Any, Dict
 
-from . import __version__ as version
-from .ffmpeg_progress_yield import FfmpegProgress
+if TYPE_CHECKING:
+    from .estimator import ProgressEstimator
+    from .ffmpeg_progress_yield import FfmpegProgress
+    from .progress import ProgressRecord
+
+# the fields of a progress record that are written with --json
+JSON_FIELDS = ("percent", "out_time_us", "speed", "fps", "eta")
+
+
+def format_estimate(estimator: "ProgressEstimator") -> str:
+    """
+    Format the remaining time and throughput for the progress bar.
+    """
+    parts = []
+    if (eta := estimator.eta) is not None:
+        minutes, seconds = divmod(int(eta + 0.5), 60)
+        hours, minutes = divmod(minutes, 60)
+        parts.append(
+            f"ETA {hours}:{minutes:02d}:{seconds:02d}"
+            if hours
+            else f"ETA {minutes:02d}:{seconds:02d}"
+        )
+    if estimator.speed is not None:
+        parts.append(f"{estimator.speed:.2f}x")
+    if estimator.fps is not None:
+        parts.append(f"{estimator.fps:.1f} fps")
+    return ", ".join(parts)
+
+
+def format_json(record: "ProgressRecord") -> bytes:
+    """
+    Format a progress update as a compact JSON object on one line.
+    Unknown values are null, and the remaining time is rounded to milliseconds.
+    """
+    fields = {name: getattr(record, name) for name in JSON_FIELDS}
+    if record.eta is not None:
+        fields["eta"] = round(record.eta, 3)
+    return json.dumps(fields, separators=(",", ":")).encode() + b"\n"
+
+
+def write_json_progress(
+    ff: "FfmpegProgress", fd: int, run_options: Dict[str, Any]
+) -> None:
+    """
+    Run the command, and write each progress update to a file descriptor as a
+    line of JSON. Each line is written with a single write, so that a reader
+    never sees a partial line, and is flushed at once.
+    """
+    with open(fd, "wb", closefd=False) as out:
+        for record in ff.run_command_with_progress(structured=True, **run_options):
+            out.write(format_json(record))
+            out.flush()
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    def format_help(self) -> str:
+        # looking up the version is slow, so it is only done for the help
+        from . import __version__
+
+        self.description = f"ffmpeg-progress-yield v{__version__}"
+        return super().format_help()
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(
-        description=f"ffmpeg-progress-yield v{version}",
+    parser = _ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     parser.add_argument(
@@ -37,12 +98,54 @@ def main() -> None:
         type=str,
         help="Send ffmpeg log output to specified file.",
     )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        help="Minimum time between progress updates in seconds.",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        help="Minimum change between progress updates in percentage points.",
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        type=float,
+        help="Stop ffmpeg if it makes no progress for this many seconds.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Stop ffmpeg if it does not finish within this many seconds.",
+    )
     parser.add_argument(
         "--ffprobe-path",
         type=str,
         default="ffprobe",
         help="Path to ffprobe executable (for duration probing)",
     )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        metavar="LOG_FILE",
+        help="Replay a log written with --log-file instead of running ffmpeg. The ffmpeg command is optional.",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="With --replay, show each progress update at its original time.",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Write each progress update as a line of JSON instead of showing a progress bar.",
+    )
+    parser.add_argument(
+        "--progress-fd",
+        type=int,
+        metavar="FD",
+        help="Write the JSON progress lines to this file descriptor instead of stdout. Implies --json.",
+    )
     parser.add_argument(
         "ffmpeg_command",
         type=str,
@@ -51,37 +154,74 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    with FfmpegProgress(
-        args.ffmpeg_command,
-        dry_run=args.dry_run,
-        exclude_progress=args.exclude_progress,
-        ffprobe_path=args.ffprobe_path,
-    ) as ff:
+    if args.dry_run:
+        print(shlex.join(args.ffmpeg_command))
+        return
+
+    progress_fd = args.progress_fd
+    if progress_fd is None and args.json:
+        progress_fd = 1
+    if progress_fd is not None:
         try:
-            # Check if we should disable tqdm for testing, or in other cases
-            import os
-
-            if os.getenv("FFMPEG_PROGRESS_NO_TQDM"):
-                raise ImportError("Tqdm disabled")
-
-            from tqdm import tqdm
-
-            with tqdm(
-                total=100,
-                desc="Progress",
-                bar_format="{desc}: {percentage:3.2f}% |{bar}{r_bar}",
-            ) as pbar:
-                for progress in ff.run_command_with_progress(
-                    duration_override=args.duration
-                ):
-                    pbar.update(progress - pbar.n)
-        except ImportError:
-            for progress in ff.run_command_with_progress():
-                print(f"\x1b[K{progress}/100", end="\r")
-            print()
-
-    if platform.system() == "Windows":
-        print("\x1b[K", end="")
+            os.fstat(progress_fd)
+        except OSError as e:
+            parser.error(f"cannot write progress to file descriptor {progress_fd}: {e}")
+
+    # imported here, so that the dry run and the help do not pay for it
+    from .ffmpeg_progress_yield import FfmpegProgress
+
+    options = {
+        "exclude_progress": args.exclude_progress,
+        "ffprobe_path": args.ffprobe_path,
+    }
+    if args.replay is not None:
+        ff = FfmpegProgress.from_log(
+            args.replay,
+            args.ffmpeg_command or None,
+            realtime=args.realtime,
+            **options,
+        )
+    else:
+        ff = FfmpegProgress(args.ffmpeg_command, **options)
+
+    run_options = {
+        "duration_override": args.duration,
+        "min_interval": args.min_interval,
+        "min_delta": args.min_delta,
+        "stall_timeout": args.stall_timeout,
+        "timeout": args.timeout,
+    }
+
+    with ff:
+        if progress_fd is not None:
+            write_json_progress(ff, progress_fd, run_options)
+        else:
+            try:
+                # Check if we should disable tqdm for testing, or in other cases
+                if os.getenv("FFMPEG_PROGRESS_NO_TQDM"):
+                    raise ImportError("Tqdm disabled")
+
+                from tqdm import tqdm
+
+                with tqdm(
+                    total=100,
+                    desc="Progress",
+                    # the remaining time is taken from the estimator, which is
+                    # smoothed and uses ffmpeg's speed, instead of tqdm's own rate
+                    bar_format="{desc}: {percentage:3.2f}% |{bar}| [{elapsed}{postfix}]",
+                ) as pbar:
+                    for progress in ff.run_command_with_progress(**run_options):
+                        pbar.set_postfix_str(
+                            format_estimate(ff.estimator), refresh=False
+                        )
+                        pbar.update(progress - pbar.n)
+            except ImportError:
+                for progress in ff.run_command_with_progress(**run_options):
+                    print(f"\x1b[K{progress}/100", end="\r")
+                print()
+
+            if os.name == "nt":
+                print("\x1b[K", end="")
 
     if not args.progress_only:
         log_file = args.log_file
@@ -0,0 +1,268 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Generator, List, Optional, Tuple, Union
+
+from .ffmpeg_progress_yield import FfmpegProgress
+from .scheduler import CpuScheduler
+
+
+class BatchRunner:
+    """
+    Run many ffmpeg commands with a bounded number of concurrent processes.
+
+    Each command is run by its own `FfmpegProgress` instance, which is only
+    created once the job is started. While the batch runs, the progress of
+    every job is tracked in `progress`, and the overall progress in `overall`.
+
+    If `fail_fast` is set, the first failing job stops the batch: running jobs
+    are killed, pending jobs are not started, and the error is raised.
+    Otherwise, the remaining jobs continue, and the errors are collected in `errors`.
+    """
+
+    def __init__(
+        self,
+        cmds: List[List[str]],
+        concurrency: Optional[int] = None,
+        fail_fast: bool = False,
+        scheduler: Optional[CpuScheduler] = None,
+        durations: Optional[List[Optional[float]]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize the batch runner.
+
+        Args:
+            cmds (List[List[str]]): The ffmpeg commands, each a list of command line elements.
+            concurrency (int, optional): The maximum number of jobs to run at once. Defaults to None (the number of CPUs).
+            fail_fast (bool, optional): Stop the batch when the first job fails. Defaults to False.
+            scheduler (CpuScheduler, optional): Only start a job once its threads fit the CPU cores. Defaults to None (only limit the number of jobs).
+            durations (List[Optional[float]], optional): The duration of each job in seconds, passed as duration_override. Defaults to None (determined by each job).
+            **kwargs: Passed to FfmpegProgress for every job, e.g. exclude_progress=True.
+        """
+        if concurrency is None:
+            concurrency = os.cpu_count() or 1
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if durations is not None and len(durations) != len(cmds):
+            raise ValueError("there must be one duration per command")
+
+        self.cmds = cmds
+        self.concurrency = concurrency
+        self.fail_fast = fail_fast
+        self.scheduler = scheduler
+        self.durations: List[Optional[float]] = (
+            durations if durations is not None else [None] * len(cmds)
+        )
+        self.kwargs = kwargs
+
+        # the instance of each job, once it was started
+        self.jobs: List[Optional[FfmpegProgress]] = [None] * len(cmds)
+        # the progress in percent of each job
+        self.progress: List[float] = [0] * len(cmds)
+        # the error of each job, if it failed
+        self.errors: List[Optional[Exception]] = [None] * len(cmds)
+
+    @property
+    def overall(self) -> float:
+        """
+        The overall progress of the batch in percent, where each job has the same weight.
+        """
+        if not self.cmds:
+            return 100
+        return round(sum(self.progress) / len(self.cmds), 2)
+
+    @property
+    def failed(self) -> List[int]:
+        """
+        The indices of the jobs that failed.
+        """
+        return [index for index, error in enumerate(self.errors) if error is not None]
+
+    def _start_job(self, index: int, lazy_probe: bool = False) -> FfmpegProgress:
+        # with lazy_probe, probing (if needed) is left to the run, so that an
+        # async job is created without blocking the event loop
+        kwargs = {**self.kwargs, "lazy_probe": True} if lazy_probe else self.kwargs
+        job = FfmpegProgress(self.cmds[index], **kwargs)
+        self.jobs[index] = job
+        return job
+
+    def run(
+        self,
+        popen_kwargs=None,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+    ) -> Generator[Tuple[int, float], None, None]:
+        """
+        Run the batch, with each job in a worker thread.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call of every job.
+            min_interval (float, optional): Yield at most one update per job per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only yield an update once the progress of a job changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop a job that makes no progress for this many seconds, failing it with a StallError. Defaults to None (wait indefinitely).
+
+        Raises:
+            RuntimeError: If fail_fast is set and a job fails, its error is raised.
+
+        Yields:
+            Generator[Tuple[int, float], None, None]: The index of a job and its progress in percent, for every update.
+        """
+        # (index, progress or error) for every update, and (-1, None) when a worker is done
+        events: "queue.Queue[Tuple[int, Union[float, Exception, None]]]" = queue.Queue()
+        pending = iter(range(len(self.cmds)))
+        pending_lock = threading.Lock()
+        stop = threading.Event()
+
+        def worker() -> None:
+            try:
+                run_jobs()
+            finally:
+                events.put((-1, None))
+
+        def run_jobs() -> None:
+            while not stop.is_set():
+                with pending_lock:
+                    index = next(pending, None)
+                if index is None:
+                    break
+                try:
+                    job = self._start_job(index)
+                    threads = 0
+                    if self.scheduler is not None:
+                        threads = self.scheduler.prepare(job)
+                        # check for a stop regularly while waiting for admission
+                        while not self.scheduler.acquire(threads, timeout=0.1):
+                            if stop.is_set():
+                                return
+                    try:
+                        updates = job.run_command_with_progress(
+                            popen_kwargs,
+                            duration_override=self.durations[index],
+                            min_interval=min_interval,
+                            min_delta=min_delta,
+                            stall_timeout=stall_timeout,
+                        )
+                        try:
+                            for progress in updates:
+                                if stop.is_set():
+                                    break
+                                events.put((index, progress))
+                        finally:
+                            # kills the process if the loop was left early
+                            updates.close()  # type: ignore
+                    finally:
+                        if self.scheduler is not None:
+                            self.scheduler.release(threads)
+                except Exception as e:
+                    if not stop.is_set():
+                        self.errors[index] = e
+                        events.put((index, e))
+
+        if not self.cmds:
+            return
+
+        workers = min(self.concurrency, len(self.cmds))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for _ in range(workers):
+                executor.submit(worker)
+            running = workers
+            while running:
+                index, progress = events.get()
+                if index < 0:
+                    running -= 1
+                elif isinstance(progress, Exception):
+                    if self.fail_fast:
+                        raise progress
+                elif progress is not None:
+                    self.progress[index] = progress
+                    yield index, progress
+        finally:
+            stop.set()
+            # kill the running processes, so that the workers do not wait for their
+            # output; each worker then cleans up its own process
+            for job in self.jobs:
+                process = job.process if job is not None else None
+                if process is not None:
+                    try:
+                        process.kill()
+                    except Exception:
+                        pass
+            executor.shutdown(wait=True)
+
+    async def async_run(
+        self,
+        popen_kwargs=None,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+    ) -> AsyncGenerator[Tuple[int, float], None]:
+        """
+        Run the batch asynchronously, with each job in a task.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the process creation of every job.
+            min_interval (float, optional): Yield at most one update per job per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only yield an update once the progress of a job changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop a job that makes no progress for this many seconds, failing it with a StallError. Defaults to None (wait indefinitely).
+
+        Raises:
+            RuntimeError: If fail_fast is set and a job fails, its error is raised.
+
+        Yields:
+            AsyncGenerator[Tuple[int, float], None]: The index of a job and its progress in percent, for every update.
+        """
+        # (index, progress or error) for every update, and (-1, None) when a worker is done
+        events: asyncio.Queue = asyncio.Queue()
+        pending = iter(range(len(self.cmds)))
+
+        async def worker() -> None:
+            for index in pending:
+                try:
+                    job = self._start_job(index, lazy_probe=True)
+                    threads = 0
+                    if self.scheduler is not None:
+                        threads = self.scheduler.prepare(job)
+                        await self.scheduler.async_acquire(threads)
+                    try:
+                        async for progress in job.async_run_command_with_progress(
+                            popen_kwargs,
+                            duration_override=self.durations[index],
+                            min_interval=min_interval,
+                            min_delta=min_delta,
+                            stall_timeout=stall_timeout,
+                        ):
+                            events.put_nowait((index, progress))
+                    finally:
+                        if self.scheduler is not None:
+                            self.scheduler.release(threads)
+                except Exception as e:
+                    self.errors[index] = e
+                    events.put_nowait((index, e))
+            events.put_nowait((-1, None))
+
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(self.concurrency, len(self.cmds)))
+        ]
+        try:
+            running = len(workers)
+            while running:
+                index, progress = await events.get()
+                if index < 0:
+                    running -= 1
+                elif isinstance(progress, Exception):
+                    if self.fail_fast:
+                        raise progress
+                elif progress is not None:
+                    self.progress[index] = progress
+                    yield index, progress
+        finally:
+            # cancelling a worker closes its job's generator, which kills the process
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
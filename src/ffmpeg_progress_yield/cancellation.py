@@ -0,0 +1,132 @@
+import socket
+import threading
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class RunCancelledError(Exception):
+    """
+    Raised by a run method when its CancellationToken was cancelled.
+    """
+
+
+class CancellationToken:
+    """
+    A thread-safe flag to cancel runs of ffmpeg commands, e.g. from another thread.
+
+    Pass the token as `cancel` to `run_command_with_progress` or
+    `async_run_command_with_progress`, and call `cancel()` from anywhere to
+    stop the run: the process is killed, and the run raises a RunCancelledError.
+    A token can be shared by several runs, to cancel all of them at once.
+
+    Waiting runs are woken up through a socket (in sync mode), or a future (in
+    async mode), so that a token does not have to be polled.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+        self._wakeup: Optional[socket.socket] = None
+        self._wakeup_write: Optional[socket.socket] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Whether `cancel` was called.
+        """
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """
+        Cancel all runs that use this token. Calling this more than once has no effect.
+        """
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+            if self._wakeup_write is not None:
+                self._wakeup_write.send(b"\0")
+        for callback in callbacks:
+            callback()
+
+    def fileno(self) -> int:
+        """
+        Get a file descriptor that becomes readable once the token is cancelled,
+        e.g. to wait for it in a selector together with the process output.
+
+        Returns:
+            int: The file descriptor.
+        """
+        with self._lock:
+            if self._wakeup is None:
+                # a socket pair rather than a pipe, as only sockets can be selected on Windows
+                self._wakeup, self._wakeup_write = socket.socketpair()
+                self._wakeup.setblocking(False)
+                if self._cancelled:
+                    self._wakeup_write.send(b"\0")
+            return self._wakeup.fileno()
+
+    async def wait(self) -> None:
+        """
+        Wait until the token is cancelled.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+        if not self.add_callback(wake):
+            return
+        try:
+            await waiter
+        finally:
+            self.remove_callback(wake)
+
+    def add_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        Call a function (in the thread that cancels the token) once the token is cancelled.
+
+        Args:
+            callback (Callable[[], None]): The function.
+
+        Returns:
+            bool: False if the token is already cancelled, in which case the function is not called.
+        """
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._callbacks.append(callback)
+            return True
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Remove a function added with `add_callback`, if it was not called yet.
+        """
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def close(self) -> None:
+        """
+        Close the wakeup sockets, if they were created.
+        """
+        with self._lock:
+            for sock in (self._wakeup, self._wakeup_write):
+                if sock is not None:
+                    sock.close()
+            self._wakeup = self._wakeup_write = None
+
+    def __del__(self) -> None:
+        self.close()
+
+
+def _wake(waiter: "asyncio.Future") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,210 @@
+import io
+import struct
+from typing import BinaryIO, Optional, Tuple
+
+# the boxes that contain the mvhd box, or that may precede the moov box
+_MP4_TOP_LEVEL = (b"ftyp", b"free", b"skip", b"wide", b"mdat", b"moov", b"pdin")
+
+_EBML_HEADER = 0x1A45DFA3
+_MKV_SEGMENT = 0x18538067
+_MKV_INFO = 0x1549A966
+_MKV_CLUSTER = 0x1F43B675
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+
+# the maximum number of bytes to read from an element that is parsed
+_MAX_ELEMENT_SIZE = 1 << 16
+
+
+def read_duration(file_name: str) -> Optional[int]:
+    """
+    Read the duration of a media file from its header, without running ffprobe.
+
+    Supported are MP4/MOV (the `mvhd` box), Matroska/WebM (the Duration in the
+    Segment Info) and WAV (the size of the `data` chunk). Only the headers are
+    read, seeking past the media data. For other formats, or files that do not
+    state their duration in the header (e.g. fragmented MP4 or live Matroska),
+    None is returned, so that the caller can fall back to ffprobe.
+
+    Args:
+        file_name (str): The path of the file.
+
+    Returns:
+        Optional[int]: The duration in milliseconds, or None if the format is not
+            supported or the header does not state the duration.
+    """
+    try:
+        with open(file_name, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[4:8] in _MP4_TOP_LEVEL:
+                return _read_mp4_duration(f)
+            if magic[:4] == b"\x1a\x45\xdf\xa3":
+                return _read_mkv_duration(f)
+            if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+                return _read_wav_duration(f)
+    except (OSError, ValueError, struct.error):
+        pass
+    return None
+
+
+def _read_mp4_box_header(f: BinaryIO) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Read the header of a box at the current position.
+
+    Returns:
+        Optional[Tuple[bytes, int, int]]: The type, the size of the header, and the size
+            of the box (or -1 if it extends to the end of the file), or None at the end.
+    """
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", header)
+    if size == 1:
+        return box_type, 16, struct.unpack(">Q", f.read(8))[0]
+    if size == 0:
+        return box_type, 8, -1
+    return box_type, 8, size
+
+
+def _read_mp4_duration(f: BinaryIO) -> Optional[int]:
+    moov_end = None
+    while True:
+        box = _read_mp4_box_header(f)
+        if box is None:
+            return None
+        box_type, header_size, size = box
+        start = f.tell() - header_size
+        if box_type == b"moov":
+            moov_end = start + size if size > 0 else None
+            break
+        if size < header_size:
+            return None
+        f.seek(start + size)
+
+    while moov_end is None or f.tell() < moov_end:
+        box = _read_mp4_box_header(f)
+        if box is None:
+            return None
+        box_type, header_size, size = box
+        if box_type == b"mvhd":
+            version = f.read(4)[0]
+            if version == 1:
+                _, _, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                _, _, timescale, duration = struct.unpack(">IIII", f.read(16))
+                unknown = 0xFFFFFFFF
+            if not timescale or not duration or duration == unknown:
+                return None
+            return duration * 1000 // timescale
+        if size < header_size:
+            return None
+        f.seek(size - header_size, 1)
+    return None
+
+
+def _read_ebml_id(f: BinaryIO) -> Optional[int]:
+    first = f.read(1)
+    if not first:
+        return None
+    length = 1
+    while length <= 4 and not first[0] & (0x80 >> (length - 1)):
+        length += 1
+    if length > 4:
+        raise ValueError("invalid EBML element ID")
+    return int.from_bytes(first + f.read(length - 1), "big")
+
+
+def _read_ebml_size(f: BinaryIO) -> Optional[int]:
+    """
+    Read the size of an element.
+
+    Returns:
+        Optional[int]: The size, or None if it is unknown.
+    """
+    first = f.read(1)
+    if not first:
+        raise ValueError("unexpected end of file")
+    length = 1
+    while length <= 8 and not first[0] & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML element size")
+    value = first[0] & (0xFF >> length)
+    rest = f.read(length - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    if value == (1 << (7 * length)) - 1:
+        return None
+    return value
+
+
+def _read_mkv_duration(f: BinaryIO) -> Optional[int]:
+    if _read_ebml_id(f) != _EBML_HEADER:
+        return None
+    size = _read_ebml_size(f)
+    if size is None:
+        return None
+    f.seek(size, 1)
+
+    if _read_ebml_id(f) != _MKV_SEGMENT:
+        return None
+    _read_ebml_size(f)
+
+    # the Info element is usually at the start of the segment, before the first Cluster
+    while True:
+        element_id = _read_ebml_id(f)
+        if element_id is None or element_id == _MKV_CLUSTER:
+            return None
+        size = _read_ebml_size(f)
+        if size is None:
+            return None
+        if element_id == _MKV_INFO:
+            if size > _MAX_ELEMENT_SIZE:
+                return None
+            return _parse_mkv_info(f.read(size))
+        f.seek(size, 1)
+
+
+def _parse_mkv_info(data: bytes) -> Optional[int]:
+    f = io.BytesIO(data)
+    timecode_scale = 1_000_000
+    duration = None
+    while f.tell() < len(data):
+        element_id = _read_ebml_id(f)
+        size = _read_ebml_size(f)
+        if element_id is None or size is None:
+            break
+        value = f.read(size)
+        if element_id == _MKV_TIMECODE_SCALE:
+            timecode_scale = int.from_bytes(value, "big")
+        elif element_id == _MKV_DURATION:
+            if size == 4:
+                duration = struct.unpack(">f", value)[0]
+            elif size == 8:
+                duration = struct.unpack(">d", value)[0]
+    if not duration or duration < 0:
+        return None
+    return int(duration * timecode_scale / 1_000_000)
+
+
+def _read_wav_duration(f: BinaryIO) -> Optional[int]:
+    f.seek(12)
+    byte_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            _, _, _, byte_rate = struct.unpack("<HHII", f.read(12))
+            f.seek(size - 12 + size % 2, 1)
+        elif chunk_id == b"data":
+            # a size of 0 or 0xFFFFFFFF means that it was unknown when the file
+            # was written, e.g. because the muxer could not seek back to the header
+            if not byte_rate or size in (0, 0xFFFFFFFF):
+                return None
+            return size * 1000 // byte_rate
+        else:
+            f.seek(size + size % 2, 1)
@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, ClassVar, Optional, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# (real path, size, modification time in nanoseconds)
+CacheKey = Tuple[str, int, int]
+
+
+class DurationCache:
+    """
+    Cache of the durations of media files, as determined by ffprobe.
+
+    Entries are keyed by the real path, size and modification time of a file,
+    so that a changed file is probed again. The most recently used entries are
+    kept in memory, up to `maxsize`. If a `path` is given, entries are also
+    stored in an SQLite database there, which can be shared between processes.
+
+    `DurationCache.shared` is the cache used by `FfmpegProgress` by default.
+    It can be replaced (e.g. by a cache with a database), or set to None to
+    disable caching.
+    """
+
+    shared: ClassVar[Optional["DurationCache"]] = None
+
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int, optional): The maximum number of entries kept in memory. Defaults to 1024.
+            path (str, optional): The path of an SQLite database to store the entries in. Defaults to None (memory only).
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self.path = path
+        # the number of lookups that were answered from the cache, and that were not
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[CacheKey, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional["sqlite3.Connection"] = None
+        self._db_pid: Optional[int] = None
+
+    @staticmethod
+    def key(file_name: str) -> CacheKey:
+        """
+        Get the cache key of a file.
+
+        Args:
+            file_name (str): The path of the file.
+
+        Raises:
+            OSError: If the file cannot be accessed.
+
+        Returns:
+            CacheKey: The real path, size and modification time of the file.
+        """
+        real_path = os.path.realpath(file_name)
+        stat = os.stat(real_path)
+        return (real_path, stat.st_size, stat.st_mtime_ns)
+
+    def _connect(self) -> "sqlite3.Connection":
+        # must be called with the lock held; a connection must not be used
+        # across a fork, so each process opens its own
+        if self._db is None or self._db_pid != os.getpid():
+            import sqlite3
+
+            self._db = sqlite3.connect(
+                self.path,  # type: ignore
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "path TEXT, size INTEGER, mtime_ns INTEGER, duration_ms INTEGER, "
+                "PRIMARY KEY (path, size, mtime_ns))"
+            )
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _remember(self, key: CacheKey, duration: int) -> None:
+        # must be called with the lock held
+        self._entries[key] = duration
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, file_name: str) -> Optional[int]:
+        """
+        Look up the duration of a file.
+
+        Args:
+            file_name (str): The path of the file.
+
+        Returns:
+            Optional[int]: The duration in milliseconds, or None if it is not cached.
+        """
+        try:
+            key = self.key(file_name)
+        except OSError:
+            return None
+
+        with self._lock:
+            duration = self._entries.get(key)
+            if duration is not None:
+                self._entries.move_to_end(key)
+            elif self.path is not None:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT duration_ms FROM durations "
+                        "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                        key,
+                    )
+                    .fetchone()
+                )
+                if row is not None:
+                    duration = row[0]
+                    self._remember(key, duration)
+
+            if duration is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return duration
+
+    def put(self, file_name: str, duration: int) -> None:
+        """
+        Store the duration of a file.
+
+        Args:
+            file_name (str): The path of the file.
+            duration (int): The duration in milliseconds.
+        """
+        try:
+            key = self.key(file_name)
+        except OSError:
+            return
+
+        with self._lock:
+            self._remember(key, duration)
+            if self.path is not None:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?)",
+                    key + (duration,),
+                )
+
+    def clear(self) -> None:
+        """
+        Remove all entries from memory (but not from the database), and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+DurationCache.shared = DurationCache()
@@ -0,0 +1,104 @@
+from typing import Optional
+
+
+class ProgressEstimator:
+    """
+    Estimate the remaining time and throughput of a running ffmpeg job.
+
+    For every progress block, the rates since the previous block are calculated
+    from the wall-clock time, and smoothed with an exponentially weighted moving
+    average (EWMA), so that each update takes constant time and memory. Until
+    two blocks were seen, the speed reported by ffmpeg is used.
+
+    Attributes:
+        speed (float, optional): The encoding speed as a multiple of realtime.
+        fps (float, optional): The encoding speed in frames per second.
+    """
+
+    def __init__(self, alpha: float = 0.2) -> None:
+        """
+        Initialize the estimator.
+
+        Args:
+            alpha (float, optional): The weight of the latest update in the moving averages,
+                between 0 (exclusive) and 1. Lower values smooth more. Defaults to 0.2.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 (exclusive) and 1")
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget all updates, e.g. before a new run.
+        """
+        self.speed: Optional[float] = None
+        self.fps: Optional[float] = None
+        # the smoothed progress rate in percent per second
+        self._rate: Optional[float] = None
+        self._percent: Optional[float] = None
+        self._time: Optional[float] = None
+        self._out_time_us: Optional[int] = None
+        self._frame: Optional[int] = None
+
+    def _smooth(self, average: Optional[float], value: float) -> float:
+        if average is None:
+            return value
+        return average + self.alpha * (value - average)
+
+    def update(
+        self,
+        now: float,
+        percent: Optional[float],
+        out_time_us: Optional[int] = None,
+        frame: Optional[int] = None,
+        speed: Optional[float] = None,
+    ) -> None:
+        """
+        Add the state of a progress block.
+
+        Args:
+            now (float): The value of `time.monotonic()` when the block was completed.
+            percent (float, optional): The progress in percent, if known.
+            out_time_us (int, optional): The output timestamp in microseconds, if known.
+            frame (int, optional): The number of frames encoded so far, if known.
+            speed (float, optional): The speed reported by ffmpeg, if known.
+        """
+        if self._time is None:
+            if self.speed is None:
+                self.speed = speed
+        else:
+            elapsed = now - self._time
+            if elapsed <= 0:
+                # not enough time passed to measure the rates; keep the older state
+                return
+            if percent is not None and self._percent is not None:
+                self._rate = self._smooth(
+                    self._rate, (percent - self._percent) / elapsed
+                )
+            if out_time_us is not None and self._out_time_us is not None:
+                self.speed = self._smooth(
+                    self.speed, (out_time_us - self._out_time_us) / 1_000_000 / elapsed
+                )
+            if frame is not None and self._frame is not None:
+                self.fps = self._smooth(self.fps, (frame - self._frame) / elapsed)
+
+        self._time = now
+        self._percent = percent
+        if out_time_us is not None:
+            self._out_time_us = out_time_us
+        if frame is not None:
+            self._frame = frame
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        The estimated remaining time in seconds, or None if it cannot be estimated yet.
+        """
+        if self._percent is None:
+            return None
+        if self._percent >= 100:
+            return 0.0
+        if not self._rate or self._rate <= 0:
+            return None
+        return (100 - self._percent) / self._rate
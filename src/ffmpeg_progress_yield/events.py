@@ -0,0 +1,268 @@
+import threading
+import time
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    import asyncio
+
+# what happens when an event is published while a subscriber's buffer is full
+POLICIES = ("drop_oldest", "latest", "block")
+
+# "progress" events are ProgressRecord objects, "log" events are log lines (str)
+TOPICS = ("progress", "log")
+
+
+class Subscription:
+    """
+    A subscriber to the events of a topic, with its own buffer.
+
+    Events are delivered in a background thread (for callables), or in the
+    event loop of an asyncio queue, so that a slow subscriber does not hold up
+    the reader. When the buffer is full, the policy decides what happens:
+    "drop_oldest" discards the oldest buffered event, "latest" only keeps the
+    newest event, and "block" makes the publisher wait until there is room.
+
+    Attributes:
+        topic (str): The topic of the events.
+        policy (str): The policy for a full buffer.
+        dropped (int): The number of events that were discarded.
+        errors (int): The number of events for which the subscriber raised an exception.
+        last_error (Exception, optional): The last exception raised by the subscriber.
+    """
+
+    def __init__(
+        self,
+        subscriber: Union[Callable[[Any], Any], "asyncio.Queue[Any]"],
+        topic: str,
+        policy: str,
+        maxsize: int,
+    ) -> None:
+        self.subscriber = subscriber
+        self.topic = topic
+        self.policy = policy
+        self.maxsize = 1 if policy == "latest" else maxsize
+        self.dropped = 0
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+
+        self._buffer: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        # the number of events taken from the buffer, but not delivered yet
+        self._delivering = 0
+        self._loop: Optional["asyncio.AbstractEventLoop"] = None
+
+        if callable(subscriber):
+            threading.Thread(target=self._deliver_forever, daemon=True).start()
+            return
+
+        import asyncio
+
+        if not isinstance(subscriber, asyncio.Queue):
+            raise ValueError("subscriber must be a callable or an asyncio.Queue")
+        if policy == "block":
+            raise ValueError(
+                "the block policy is not supported for asyncio queues, "
+                "as it would block the event loop that consumes them"
+            )
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            raise ValueError(
+                "asyncio queues must be subscribed from within their event loop"
+            ) from None
+
+    def put(self, event: Any) -> None:
+        """
+        Add an event to the buffer, applying the policy if it is full.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._buffer) >= self.maxsize:
+                if self.policy == "block":
+                    self._cond.wait_for(
+                        lambda: len(self._buffer) < self.maxsize or self._closed
+                    )
+                    if self._closed:
+                        return
+                else:
+                    self._buffer.popleft()
+                    self.dropped += 1
+            self._buffer.append(event)
+            if self._loop is None:
+                self._cond.notify_all()
+                return
+        try:
+            self._loop.call_soon_threadsafe(self._deliver_to_queue)
+        except RuntimeError:
+            pass  # the event loop was closed
+
+    def _deliver_forever(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._closed)
+                if not self._buffer:
+                    return
+                event = self._buffer.popleft()
+                self._delivering += 1
+                # wake up a blocked publisher
+                self._cond.notify_all()
+            try:
+                self.subscriber(event)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            finally:
+                with self._cond:
+                    self._delivering -= 1
+                    self._cond.notify_all()
+
+    def _deliver_to_queue(self) -> None:
+        queue: "asyncio.Queue[Any]" = self.subscriber  # type: ignore
+        with self._cond:
+            events, self._buffer = self._buffer, deque()
+            self._cond.notify_all()
+        for event in events:
+            if self.policy == "latest":
+                while not queue.empty():
+                    queue.get_nowait()
+                    self.dropped += 1
+            elif queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all buffered events were delivered to a callable. Events for an
+        asyncio queue are put into it by its event loop, so this returns at once.
+
+        Args:
+            timeout (float, optional): The maximum time to wait in seconds. Defaults to None (wait indefinitely).
+
+        Returns:
+            bool: True if all events were delivered, False if the timeout expired.
+        """
+        if self._loop is not None:
+            return True
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._buffer and not self._delivering, timeout=timeout
+            )
+
+    def close(self) -> None:
+        """
+        Stop delivering events. Events that are still buffered are delivered first.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class EventBus:
+    """
+    Publish the events of a running command to any number of subscribers.
+
+    Each subscriber has its own buffer and delivery, see `Subscription`. Publishing
+    to a topic without subscribers does nothing, so that the bus adds no overhead
+    unless it is used. When the bus is garbage collected, its subscriptions are
+    closed, so that their delivery threads end.
+    """
+
+    def __init__(self) -> None:
+        # the lists are only replaced, never changed, so that publish() needs no lock
+        self._subscriptions: Dict[str, List[Subscription]] = {
+            topic: [] for topic in TOPICS
+        }
+        self._lock = threading.Lock()
+        weakref.finalize(self, EventBus._close_all, self._subscriptions)
+
+    @staticmethod
+    def _close_all(subscriptions: Dict[str, List[Subscription]]) -> None:
+        for topic_subscriptions in subscriptions.values():
+            for subscription in topic_subscriptions:
+                subscription.close()
+
+    def subscribe(
+        self,
+        subscriber: Union[Callable[[Any], Any], "asyncio.Queue[Any]"],
+        topic: str = "progress",
+        policy: str = "drop_oldest",
+        maxsize: int = 1024,
+    ) -> Subscription:
+        """
+        Subscribe to the events of a topic.
+
+        Args:
+            subscriber (Union[Callable[[Any], Any], asyncio.Queue]): A callable (e.g. a function or bound method) that is called with each event in a background thread, or an asyncio queue that the events are put into. Queues must be subscribed from within their event loop.
+            topic (str, optional): "progress" for a ProgressRecord per progress update, or "log" for each log line. Defaults to "progress".
+            policy (str, optional): What to do when the subscriber falls behind by `maxsize` events: "drop_oldest", "latest" (only keep the newest event), or "block" (wait for the subscriber, which also holds up ffmpeg; not for queues). Defaults to "drop_oldest".
+            maxsize (int, optional): The size of the buffer of a callable subscriber. The size of a queue is its own maxsize. Defaults to 1024.
+
+        Raises:
+            ValueError: If the topic, policy or subscriber is invalid.
+
+        Returns:
+            Subscription: The subscription, e.g. to unsubscribe later.
+        """
+        if topic not in TOPICS:
+            raise ValueError(f"topic must be one of {', '.join(TOPICS)}")
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        subscription = Subscription(subscriber, topic, policy, maxsize)
+        with self._lock:
+            self._subscriptions[topic] = self._subscriptions[topic] + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a subscription. Events that are still buffered are delivered.
+        """
+        with self._lock:
+            self._subscriptions[subscription.topic] = [
+                s
+                for s in self._subscriptions[subscription.topic]
+                if s is not subscription
+            ]
+        subscription.close()
+
+    def has_subscribers(self, topic: str) -> bool:
+        """
+        Check whether a topic has subscribers, e.g. to skip creating its events.
+        """
+        return bool(self._subscriptions[topic])
+
+    def publish(self, topic: str, event: Any) -> None:
+        """
+        Publish an event to all subscribers of a topic.
+        """
+        for subscription in self._subscriptions[topic]:
+            subscription.put(event)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all subscribers received the published events.
+
+        Args:
+            timeout (float, optional): The maximum time to wait in seconds. Defaults to None (wait indefinitely).
+
+        Returns:
+            bool: True if all events were delivered, False if the timeout expired.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in subscriptions:
+                remaining = (
+                    max(deadline - time.monotonic(), 0)
+                    if deadline is not None
+                    else None
+                )
+                if not subscription.join(remaining):
+                    return False
+        return True
@@ -1,10 +1,79 @@
-import asyncio
+import contextlib
 import os
 import re
+import selectors
 import subprocess
+import sys
+import threading
+import time
 import types
 import weakref
-from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+)
+
+from .cancellation import CancellationToken, RunCancelledError
+from .container import read_duration
+from .duration_cache import DurationCache
+from .estimator import ProgressEstimator
+from .events import EventBus, Subscription
+from .log_buffer import PROGRESS_REGEX, LogBuffer
+from .metrics import JobMetrics, Metrics, job_result
+from .progress import (
+    BLOCK_END,
+    LOG_LINE,
+    PROGRESS_LINE,
+    ProgressParser,
+    ProgressRecord,
+    _parse_float,
+)
+from .reader import LineSplitter
+from .replay import ReplayProcess
+from .throttle import Throttle
+from .timings import Timings
+from .watchdog import StallError, StallWatchdog
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+# whether pipes can be waited for in a selector, which only takes sockets on Windows
+_CAN_SELECT_PIPES = os.name != "nt"
+
+# the maximum number of ffprobe processes to run at once
+MAX_PARALLEL_PROBES = 16
+
+# the ways to calculate the progress, see FfmpegProgress.progress_basis
+PROGRESS_BASES = ("time", "frames", "auto")
+
+
+def _parse_frame_count(output: str) -> Optional[int]:
+    value = output.strip()
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def _decode_line(line: bytes) -> str:
+    return line.decode("utf-8", errors="replace").strip()
+
+
+def _observe_probe(started: float) -> None:
+    """
+    Record the time since `started` as the duration of an ffprobe run, if metrics are collected.
+    """
+    if (metrics := Metrics.shared) is not None:
+        metrics.observe_probe(time.monotonic() - started)
 
 
 def to_ms(**kwargs: Union[float, int, str]) -> int:
@@ -23,7 +92,7 @@ class FfmpegProgress:
     TIME_REGEX = re.compile(
         r"out_time=(?P<hour>\d{2}):(?P<min>\d{2}):(?P<sec>\d{2})\.(?P<ms>\d{2})"
     )
-    PROGRESS_REGEX = re.compile(r"[a-z0-9_]+=.+")
+    PROGRESS_REGEX = PROGRESS_REGEX
 
     def __init__(
         self,
@@ -31,6 +100,15 @@ class FfmpegProgress:
         dry_run: bool = False,
         exclude_progress: bool = False,
         ffprobe_path: str = "ffprobe",
+        max_log_lines: Optional[int] = None,
+        max_log_bytes: Optional[int] = None,
+        separate_progress: bool = False,
+        lazy_probe: bool = False,
+        read_headers: bool = True,
+        progress_basis: str = "time",
+        total_frames: Optional[int] = None,
+        grace_period: float = 5.0,
+        collect_timings: bool = False,
     ) -> None:
         """Initialize the FfmpegProgress class.
 
@@ -39,20 +117,54 @@ class FfmpegProgress:
             dry_run (bool, optional): Only show what would be done. Defaults to False.
             exclude_progress (bool, optional): Exclude progress lines from output. Defaults to False.
             ffprobe_path (str, optional): Path to ffprobe executable. Defaults to "ffprobe".
+            max_log_lines (int, optional): Only retain the header and the last N lines of the log. Defaults to None (keep everything).
+            max_log_bytes (int, optional): Only retain the header and the last N bytes (in UTF-8) of the log. Defaults to None (keep everything).
+            separate_progress (bool, optional): Let ffmpeg write progress to a dedicated pipe instead of stdout, and read the log from stderr only. This leaves ffmpeg's stdout free for media output. Not supported on Windows. Defaults to False.
+            lazy_probe (bool, optional): If the duration has to be probed with ffprobe (with `-loglevel error`), do so when the command is run, while the process starts, rather than here. Defaults to False.
+            read_headers (bool, optional): If the duration has to be probed, first try to read it from the headers of MP4/MOV, Matroska/WebM and WAV inputs, without running ffprobe. Defaults to True.
+            progress_basis (str, optional): How to calculate the progress: "time" (the output time against the duration), "frames" (the number of frames against the total number of frames), or "auto" (by time, or by frames if the duration is unknown). Defaults to "time".
+            total_frames (int, optional): The total number of frames, for progress by frames. If not specified, it is taken from `-frames:v` in the command, or probed with ffprobe. Defaults to None.
+            grace_period (float, optional): When a run is stopped because it stalled, the time in seconds to wait for ffmpeg to quit after sending 'q', before killing it. Defaults to 5.0.
+            collect_timings (bool, optional): Record the time spent reading, decoding and parsing the output, and in the stderr callback, in `timings` (see `Timings`). This adds some overhead per line. Defaults to False.
+
+        Raises:
+            ValueError: If separate_progress is set on Windows, or progress_basis is invalid.
         """
+        if separate_progress and os.name == "nt":
+            raise ValueError("separate_progress is not supported on Windows")
+        if progress_basis not in PROGRESS_BASES:
+            raise ValueError(
+                f"progress_basis must be one of {', '.join(PROGRESS_BASES)}"
+            )
+
         self.cmd = cmd
-        self.stderr: Union[str, None] = None
         self.dry_run = dry_run
         self.exclude_progress = exclude_progress
+        self.max_log_lines = max_log_lines
+        self.max_log_bytes = max_log_bytes
+        self._log = self._new_log_buffer()
         self.ffprobe_path = ffprobe_path
+        self.read_headers = read_headers
+        self.grace_period = grace_period
         self.process: Any = None
         self.stderr_callback: Union[Callable[[str], None], None] = None
-        self.base_popen_kwargs = {
-            "stdin": subprocess.PIPE,  # Apply stdin isolation by creating separate pipe.
-            "stdout": subprocess.PIPE,
-            "stderr": subprocess.STDOUT,
-            "universal_newlines": False,
-        }
+        self.separate_progress = separate_progress
+        if separate_progress:
+            # stdout is left to the caller (e.g. via popen_kwargs), progress is read
+            # from a pipe that is set up when the command is run
+            self.base_popen_kwargs = {
+                "stdin": subprocess.PIPE,
+                "stdout": subprocess.DEVNULL,
+                "stderr": subprocess.PIPE,
+                "universal_newlines": False,
+            }
+        else:
+            self.base_popen_kwargs = {
+                "stdin": subprocess.PIPE,  # Apply stdin isolation by creating separate pipe.
+                "stdout": subprocess.PIPE,
+                "stderr": subprocess.STDOUT,
+                "universal_newlines": False,
+            }
 
         self.cmd_with_progress = (
             [self.cmd[0]] + ["-progress", "-", "-nostats"] + self.cmd[1:]
@@ -61,13 +173,67 @@ class FfmpegProgress:
 
         self.current_input_idx: int = 0
         self.total_dur: Union[None, int] = None
+        self.progress_basis = progress_basis
+        self.total_frames: Union[None, int] = (
+            total_frames
+            if total_frames is not None
+            else FfmpegProgress._get_frames_from_cmd(self.cmd)
+        )
+
+        # state for parsing progress blocks, see run_command_with_progress
+        self._structured = False
+        self._throttle: Union[Throttle, None] = None
+        self._watchdog: Union[StallWatchdog, None] = None
+        # the overall timeout and cancellation of the current run, see _stop_error
+        self._timeout: Union[float, None] = None
+        self._deadline: Union[float, None] = None
+        self._cancel: Union[CancellationToken, None] = None
+        self._stopped_by: Union[Exception, None] = None
+        self._parser = ProgressParser()
+        self._prev_log_line = ""
+        self._record: Union[ProgressRecord, None] = None
+        self._last_record: Union[ProgressRecord, None] = None
+        # the progress in percent of the last completed progress block
+        self.progress: Union[float, None] = None
+        # the remaining time and throughput, updated with every progress block
+        self.estimator = ProgressEstimator()
+        # subscribers to the progress updates and log lines, see subscribe()
+        self.events = EventBus()
+        # the log to replay instead of running the command, see from_log()
+        self._replay_file: Union[str, None] = None
+        self._replay_realtime = False
+        # the time spent in each stage of reading the output of the last run
+        self.timings: Union[Timings, None] = Timings() if collect_timings else None
+        # the job of the current run in Metrics.shared, and the lines parsed in it
+        self._metrics: Union[Metrics, None] = None
+        self._metrics_job: Union[JobMetrics, None] = None
+        self._lines_parsed = 0
+
         # Skip probing duration in dry-run mode to avoid running ffprobe
-        if not self.dry_run and FfmpegProgress._uses_error_loglevel(self.cmd):
-            self.total_dur = self._probe_duration(self.cmd)
+        self._needs_probe = not self.dry_run and (
+            FfmpegProgress._uses_error_loglevel(self.cmd) or self._needs_frame_count()
+        )
+        if not lazy_probe:
+            self._probe_if_needed()
 
         # Set up cleanup on garbage collection as a fallback
         self._cleanup_ref = weakref.finalize(self, self._cleanup_process, None)
 
+    def _new_log_buffer(self) -> LogBuffer:
+        return LogBuffer(
+            exclude_progress=self.exclude_progress,
+            max_lines=self.max_log_lines,
+            max_bytes=self.max_log_bytes,
+        )
+
+    @property
+    def stderr(self) -> Union[str, None]:
+        """
+        The ffmpeg log output collected so far, or None if nothing was read yet.
+        The string is only built when this property is accessed.
+        """
+        return self._log.text
+
     @staticmethod
     def _cleanup_process(process: Any) -> None:
         """Clean up a process if it's still running."""
@@ -120,7 +286,6 @@ class FfmpegProgress:
     def _process_output(
         self,
         stderr_line: str,
-        stderr: List[str],
         duration_override: Union[float, None],
     ) -> Union[float, None]:
         """
@@ -128,71 +293,436 @@ class FfmpegProgress:
 
         Args:
             stderr_line (str): The line of stderr output.
-            stderr (List[str]): The list of stderr output.
             duration_override (Union[float, None]): The duration of the video in seconds.
 
         Returns:
-            Union[float, None]: The progress in percent.
+            Union[float, None]: The progress in percent, if the line completed a progress block.
         """
 
         if self.stderr_callback:
-            self.stderr_callback(stderr_line)
-
-        stderr.append(stderr_line.strip())
-        self.stderr = "\n".join(
-            filter(
-                lambda line: not (
-                    self.exclude_progress and self.PROGRESS_REGEX.match(line)
-                ),
-                stderr,
-            )
-        )
+            self._call_stderr_callback(stderr_line)
+
+        self._lines_parsed += 1
+        line = stderr_line.strip()
+        kind = self._parser.feed(line)
+        if kind == PROGRESS_LINE:
+            self._log.append(line, True)
+            return None
+        if kind == LOG_LINE:
+            self._add_log_line(line, duration_override)
+            return None
+        self._log.append(line, True)
+        return self._complete_block()
 
+    def _process_log_line(
+        self, stderr_line: str, duration_override: Union[float, None]
+    ) -> None:
+        """
+        Process a line of stderr output when progress is read from a separate pipe.
+
+        Args:
+            stderr_line (str): The line of stderr output.
+            duration_override (Union[float, None]): The duration of the video in seconds.
+        """
+        if self.stderr_callback:
+            self._call_stderr_callback(stderr_line)
+        self._lines_parsed += 1
+        self._add_log_line(stderr_line.strip(), duration_override)
+
+    def _call_stderr_callback(self, line: str) -> None:
+        if self.timings is not None:
+            self.timings.call("callback", self.stderr_callback, line)  # type: ignore
+        else:
+            self.stderr_callback(line)  # type: ignore
+
+    def _timed(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Get the function to call for a stage: `func` itself, or a timed wrapper if timings are collected.
+        """
+        return func if self.timings is None else self.timings.wrap(stage, func)
+
+    def _async_timed(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Same as `_timed`, for a coroutine function.
+        """
+        return func if self.timings is None else self.timings.wrap_async(stage, func)
+
+    def _add_log_line(self, line: str, duration_override: Union[float, None]) -> None:
+        self._log.append(line, False)
+        self.events.publish("log", line)
+        # cold path: only banner lines can carry the input duration
+        if duration_override is None and "Duration: " in line:
+            self._update_total_dur(line)
+        self._prev_log_line = line
+
+    def _complete_block(self) -> Union[float, None]:
+        """
+        Handle a completed progress block.
+
+        Returns:
+            Union[float, None]: The progress in percent, if the total duration is known.
+        """
         progress: Union[float, None] = None
-        # assign the total duration if it was found. this can happen multiple times for multiple inputs,
-        # in which case we have to determine the overall duration by taking the min/max (dependent on -shortest being present)
-        if (
-            current_dur_match := self.DUR_REGEX.search(stderr_line)
-        ) and duration_override is None:
-            input_options = self.inputs_with_options[self.current_input_idx]
-            current_dur_ms: int = to_ms(**current_dur_match.groupdict())
-            # if the previous line had "image2", it's a single image and we assume a really short intrinsic duration (4ms),
-            # but if it's a loop, we assume infinity
-            if "image2" in stderr[-2] and "-loop 1" in " ".join(input_options):
-                current_dur_ms = 2**64
-            if "-shortest" in self.cmd:
-                self.total_dur = (
-                    min(self.total_dur, current_dur_ms)
-                    if self.total_dur is not None
-                    else current_dur_ms
+        if self.progress_basis == "frames" or (
+            self.progress_basis == "auto" and self.total_dur is None
+        ):
+            frame = self._parser.block.get("frame")
+            if frame is not None and frame.isdigit() and self.total_frames:
+                progress = min(
+                    max(round(int(frame) * 100 / self.total_frames, 2), 0),
+                    100,
                 )
-            else:
-                self.total_dur = (
-                    max(self.total_dur, current_dur_ms)
-                    if self.total_dur is not None
-                    else current_dur_ms
+        else:
+            out_time_us = self._parser.out_time_us
+            if out_time_us is not None and self.total_dur is not None:
+                progress = min(
+                    max(round(out_time_us / 10 / self.total_dur, 2), 0),
+                    100,
                 )
-            self.current_input_idx += 1
 
-        if (
-            progress_time := self.TIME_REGEX.search(stderr_line)
-        ) and self.total_dur is not None:
-            elapsed_time = to_ms(**progress_time.groupdict())
-            progress = min(max(round(elapsed_time / self.total_dur * 100, 2), 0), 100)
+        if self._watchdog is not None:
+            self._watchdog.feed(self._parser.out_time_us)
+        if self._metrics_job is not None:
+            self._metrics_job.update(self._parser.block, progress, self._lines_parsed)
+
+        if self._structured:
+            record = ProgressRecord.from_fields(self._parser.block, progress)
+            self.estimator.update(
+                record.timestamp,
+                progress,
+                record.out_time_us,
+                record.frame,
+                record.speed,
+            )
+            record.eta = self.estimator.eta
+            self._record = self._last_record = record
+            self.events.publish("progress", record)
+        else:
+            frame = self._parser.block.get("frame")
+            speed = self._parser.block.get("speed")
+            self.estimator.update(
+                time.monotonic(),
+                progress,
+                self._parser.out_time_us,
+                int(frame) if frame is not None and frame.isdigit() else None,
+                _parse_float(speed, "x") if speed is not None else None,
+            )
+            if self.events.has_subscribers("progress"):
+                record = ProgressRecord.from_fields(self._parser.block, progress)
+                record.eta = self.estimator.eta
+                self.events.publish("progress", record)
 
+        self.progress = progress
         return progress
 
-    def _probe_duration(self, cmd: List[str]) -> Optional[int]:
+    def _update_total_dur(self, line: str) -> None:
         """
-        Get the duration via ffprobe from input media file
-        in case ffmpeg was run with loglevel=error.
+        Update the total duration from a "Duration: " line of an input banner.
+        This can happen multiple times for multiple inputs, in which case we have to
+        determine the overall duration by taking the min/max (dependent on -shortest being present).
+
+        Args:
+            line (str): The log line.
+        """
+        if not (current_dur_match := self.DUR_REGEX.search(line)):
+            return
+        # the command may not list all inputs, e.g. when replaying a log
+        input_options = (
+            self.inputs_with_options[self.current_input_idx]
+            if self.current_input_idx < len(self.inputs_with_options)
+            else []
+        )
+        current_dur_ms: int = to_ms(**current_dur_match.groupdict())
+        # if the previous line had "image2", it's a single image and we assume a really short intrinsic duration (4ms),
+        # but if it's a loop, we assume infinity
+        if "image2" in self._prev_log_line and "-loop 1" in " ".join(input_options):
+            current_dur_ms = 2**64
+        if "-shortest" in self.cmd:
+            self.total_dur = (
+                min(self.total_dur, current_dur_ms)
+                if self.total_dur is not None
+                else current_dur_ms
+            )
+        else:
+            self.total_dur = (
+                max(self.total_dur, current_dur_ms)
+                if self.total_dur is not None
+                else current_dur_ms
+            )
+        self.current_input_idx += 1
+
+    def _reset_records(
+        self,
+        structured: bool,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+    ) -> None:
+        self._structured = structured
+        self._throttle = None
+        self._watchdog = None
+        self._timeout = None
+        self._deadline = None
+        self._cancel = None
+        self._stopped_by = None
+        if min_interval or min_delta:
+            self._throttle = Throttle(min_interval, min_delta)
+        self.progress = None
+        self._lines_parsed = 0
+        if self.timings is not None:
+            self.timings.reset()
+        self.estimator.reset()
+        self._parser = ProgressParser()
+        self._prev_log_line = ""
+        self._record = None
+        self._last_record = None
+
+    @contextlib.contextmanager
+    def _watchdog_paused(self) -> Generator[None, None, None]:
+        """
+        Pause the stall watchdog while the caller handles an update, if there is one.
+        """
+        if self._watchdog is None:
+            yield
+            return
+        self._watchdog.pause()
+        try:
+            yield
+        finally:
+            self._watchdog.resume()
+
+    def _set_stop_conditions(
+        self, timeout: Union[float, None], cancel: Union[CancellationToken, None]
+    ) -> None:
+        self._timeout = timeout
+        self._deadline = time.monotonic() + timeout if timeout is not None else None
+        self._cancel = cancel
+
+    def _stop_error(self) -> Union[Exception, None]:
+        """
+        Get the error to raise if the run was cancelled, or its timeout expired.
+        """
+        if self._cancel is not None and self._cancel.cancelled:
+            return RunCancelledError(f"Cancelled command {self.cmd}")
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return TimeoutError(
+                f"Command {self.cmd} did not finish within {self._timeout} seconds"
+            )
+        return None
+
+    def _select(
+        self, selector: selectors.BaseSelector
+    ) -> List[Tuple[selectors.SelectorKey, int]]:
+        """
+        Wait until a file descriptor is readable, the run is cancelled, or its timeout expires.
+
+        Raises:
+            RunCancelledError: If the run was cancelled.
+            TimeoutError: If the timeout expired.
+        """
+        while True:
+            timeout = None
+            if self._deadline is not None:
+                timeout = max(self._deadline - time.monotonic(), 0)
+            events = selector.select(timeout)
+            if (error := self._stop_error()) is not None:
+                raise error
+            if events:
+                return events
+
+    async def _async_stop_process(self) -> None:
+        """
+        Kill the process once the run is cancelled, or its timeout expires.
+        Meant to be run as a task, which is cancelled when the process finished.
+        """
+        import asyncio
+
+        timeout = None
+        if self._deadline is not None:
+            timeout = max(self._deadline - time.monotonic(), 0)
+        try:
+            await asyncio.wait_for(
+                self._cancel.wait()
+                if self._cancel is not None
+                else asyncio.Event().wait(),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            pass
+        self._stopped_by = self._stop_error()
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass  # the process exited in the meantime
+
+    def _start_stopper(self) -> Callable[[], None]:
+        """
+        Kill the process from another thread once the run is cancelled, or its
+        timeout expires, which ends a blocking read of its output. The reason is
+        stored to be raised by `_raise_if_stopped`, as in `_async_stop_process`.
+
+        Returns:
+            Callable[[], None]: A function to call when the output was read, which stops waiting.
+        """
+        process = self.process
+
+        def stop(error: Union[Exception, None]) -> None:
+            self._stopped_by = error
+            try:
+                process.kill()
+            except OSError:
+                pass  # the process exited in the meantime
+
+        def stop_on_timeout() -> None:
+            stop(
+                TimeoutError(
+                    f"Command {self.cmd} did not finish within {self._timeout} seconds"
+                )
+            )
+
+        def stop_on_cancel() -> None:
+            stop(RunCancelledError(f"Cancelled command {self.cmd}"))
+
+        timer: Union[threading.Timer, None] = None
+        if self._deadline is not None:
+            timer = threading.Timer(
+                max(self._deadline - time.monotonic(), 0), stop_on_timeout
+            )
+            timer.daemon = True
+            timer.start()
+        cancel = self._cancel
+        if cancel is not None and not cancel.add_callback(stop_on_cancel):
+            stop_on_cancel()
+
+        def stop_waiting() -> None:
+            if timer is not None:
+                timer.cancel()
+            if cancel is not None:
+                cancel.remove_callback(stop_on_cancel)
+
+        return stop_waiting
+
+    def _raise_if_stopped(self) -> None:
+        """
+        Raise an error if the process was stopped by a cancellation, the timeout,
+        or the stall watchdog.
+        """
+        if self._stopped_by is not None:
+            raise self._stopped_by
+        if self._watchdog is None or not self._watchdog.stalled:
+            return
+        record = self._last_record
+        if record is None and self._parser.block:
+            record = ProgressRecord.from_fields(self._parser.block, self.progress)
+        raise StallError(
+            self.cmd, self._watchdog.stall_timeout, self.progress, record, self.stderr
+        )
+
+    def _start_metrics(self) -> None:
+        """
+        Start tracking the run as a job, if metrics are collected (see `Metrics.shared`).
+        """
+        metrics = Metrics.shared
+        self._metrics_job = metrics.start_job() if metrics is not None else None
+        self._metrics = metrics
+
+    def _finish_metrics(self, error: Union[BaseException, None]) -> None:
+        """
+        Stop tracking the run, with the exception it ended with, if any.
+        """
+        if self._metrics_job is not None and self._metrics is not None:
+            # including the log lines after the last progress block
+            self._metrics_job.lines = self._lines_parsed
+            self._metrics.finish_job(self._metrics_job, job_result(error))
+        self._metrics_job = None
+
+    def _pop_record(self) -> Union[ProgressRecord, None]:
+        record, self._record = self._record, None
+        return record
+
+    def _pop_update(
+        self, progress: Union[float, None]
+    ) -> Union[float, ProgressRecord, None]:
+        """
+        Get the update to deliver for the last processed line, if any.
+
+        Args:
+            progress (Union[float, None]): The progress in percent, if the line completed a progress block.
+
+        Returns:
+            Union[float, ProgressRecord, None]: The progress or record, unless there is none or it is throttled.
+        """
+        update = self._pop_record() if self._structured else progress
+        if update is None or self._throttle is None:
+            return update
+        percent = update.percent if isinstance(update, ProgressRecord) else update
+        return update if self._throttle.ready(percent) else None
+
+    def _final_record(self) -> ProgressRecord:
+        if self._last_record is None:
+            return ProgressRecord(100, eta=0.0)
+        return self._last_record.copy(percent=100, timestamp=time.monotonic(), eta=0.0)
+
+    @classmethod
+    async def async_create(cls, cmd: List[str], **kwargs: Any) -> "FfmpegProgress":
+        """
+        Create an instance without blocking the event loop. If the duration has to be
+        probed with ffprobe (with `-loglevel error`), the inputs are probed concurrently
+        in subprocesses.
 
         Args:
             cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+            **kwargs: The other arguments of FfmpegProgress.
 
         Returns:
-            Optional[int]: The duration in milliseconds.
+            FfmpegProgress: The instance, with the duration probed.
         """
+        kwargs["lazy_probe"] = True
+        ff = cls(cmd, **kwargs)
+        await ff._async_probe_if_needed()
+        return ff
+
+    @classmethod
+    def from_log(
+        cls,
+        log_file: str,
+        cmd: Optional[List[str]] = None,
+        realtime: bool = False,
+        **kwargs: Any,
+    ) -> "FfmpegProgress":
+        """
+        Create an instance that replays a recorded ffmpeg log (e.g. from `--log-file`)
+        instead of running a command, see `ReplayProcess`. The log is read by
+        `run_command_with_progress` exactly like the output of ffmpeg, so it yields
+        the same progress as the original run, without spawning ffmpeg or ffprobe.
+
+        Only the header and the last 1000 lines of the log are kept in `stderr` by
+        default, so that large logs are replayed with constant memory.
+
+        Args:
+            log_file (str): The path of the log, which must include the progress lines. Logs ending in ".gz" are decompressed.
+            cmd (List[str], optional): The original command, if known, e.g. for `-shortest`. Defaults to None.
+            realtime (bool, optional): Replay each progress block at the time it was originally written, rather than as fast as possible. Defaults to False.
+            **kwargs: The other arguments of FfmpegProgress.
+
+        Raises:
+            ValueError: If separate_progress is set.
+
+        Returns:
+            FfmpegProgress: The instance.
+        """
+        if kwargs.get("separate_progress"):
+            raise ValueError("separate_progress is not supported when replaying a log")
+        kwargs.setdefault("max_log_lines", 1000)
+        kwargs["lazy_probe"] = True
+        ff = cls(cmd if cmd is not None else ["ffmpeg"], **kwargs)
+        # nothing is probed, the duration has to come from the log
+        ff._needs_probe = False
+        ff._replay_file = log_file
+        ff._replay_realtime = realtime
+        return ff
+
+    @staticmethod
+    def _probe_file_names(cmd: List[str]) -> List[str]:
         file_names = []
         for i, arg in enumerate(cmd):
             if arg == "-i":
@@ -201,34 +731,319 @@ class FfmpegProgress:
                 # filter for filenames that we can probe, i.e. regular files
                 if os.path.isfile(file_name):
                     file_names.append(file_name)
+        return file_names
 
+    def _known_durations(self, file_names: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Get the durations that are known without running ffprobe, i.e. cached ones,
+        and those that can be read from the file headers.
+        """
+        cache = DurationCache.shared
+        durations: Dict[str, Optional[int]] = {}
+        for file_name in file_names:
+            duration = cache.get(file_name) if cache is not None else None
+            if duration is None and self.read_headers:
+                duration = read_duration(file_name)
+            durations[file_name] = duration
+        return durations
+
+    @staticmethod
+    def _combine_durations(
+        cmd: List[str], known: Dict[str, Optional[int]], probed: Dict[str, int]
+    ) -> int:
+        cache = DurationCache.shared
+        if cache is not None:
+            for file_name, duration in probed.items():
+                cache.put(file_name, duration)
+        durations = [duration for duration in known.values() if duration is not None]
+        durations += probed.values()
+        return max(durations) if "-shortest" not in cmd else min(durations)
+
+    def _probe_duration(self, cmd: List[str]) -> Optional[int]:
+        """
+        Get the duration via ffprobe from input media file
+        in case ffmpeg was run with loglevel=error.
+        Inputs whose duration is neither cached nor stated in their header are probed in parallel.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+
+        Returns:
+            Optional[int]: The duration in milliseconds.
+        """
+        file_names = self._probe_file_names(cmd)
         if len(file_names) == 0:
             return None
 
-        durations = []
+        known = self._known_durations(file_names)
+        missing = [name for name, duration in known.items() if duration is None]
+        try:
+            if len(missing) <= 1:
+                probed = {name: self._probe_file_duration(name) for name in missing}
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(
+                    max_workers=min(len(missing), MAX_PARALLEL_PROBES)
+                ) as executor:
+                    probed = dict(
+                        zip(missing, executor.map(self._probe_file_duration, missing))
+                    )
+        except Exception:
+            # TODO: add logging
+            return None
+
+        return self._combine_durations(cmd, known, probed)
 
-        for file_name in file_names:
+    async def _async_probe_duration(self, cmd: List[str]) -> Optional[int]:
+        """
+        Get the duration via ffprobe from input media file
+        in case ffmpeg was run with loglevel=error, without blocking the event loop.
+        Inputs whose duration is neither cached nor stated in their header are probed concurrently.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+
+        Returns:
+            Optional[int]: The duration in milliseconds.
+        """
+        import asyncio
+
+        file_names = self._probe_file_names(cmd)
+        if len(file_names) == 0:
+            return None
+
+        known = self._known_durations(file_names)
+        missing = [name for name, duration in known.items() if duration is None]
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_PROBES)
+
+        async def probe(file_name: str) -> int:
+            async with semaphore:
+                return await self._async_probe_file_duration(file_name)
+
+        try:
+            probed = await asyncio.gather(*(probe(name) for name in missing))
+        except Exception:
+            # as in _probe_duration, the duration is then unknown
+            return None
+
+        return self._combine_durations(cmd, known, dict(zip(missing, probed)))
+
+    def _start_probe(
+        self, duration_override: Union[float, None]
+    ) -> Union[threading.Thread, None]:
+        """
+        Start probing in a thread, if probing was deferred (see lazy_probe).
+
+        Returns:
+            Union[threading.Thread, None]: The thread, to be joined before progress is read.
+        """
+        if not self._needs_probe:
+            return None
+        probe = threading.Thread(
+            target=self._probe_if_needed, args=(duration_override,), daemon=True
+        )
+        probe.start()
+        return probe
+
+    def _needs_frame_count(self) -> bool:
+        """
+        Check whether the total number of frames has to be probed.
+        With the "auto" basis, it is only probed if the duration is not known, and
+        cannot become known from the log (with `-loglevel error`).
+        """
+        if self.total_frames is not None or self.progress_basis == "time":
+            return False
+        return self.progress_basis == "frames" or (
+            self.total_dur is None and FfmpegProgress._uses_error_loglevel(self.cmd)
+        )
+
+    def _probe_if_needed(self, duration_override: Union[float, None] = None) -> None:
+        if not self._needs_probe:
+            return
+        self._needs_probe = False
+        if not duration_override and FfmpegProgress._uses_error_loglevel(self.cmd):
+            self.total_dur = self._probe_duration(self.cmd)
+        if self._needs_frame_count():
+            self.total_frames = self._probe_frame_count(self.cmd)
+
+    async def _async_probe_if_needed(
+        self, duration_override: Union[float, None] = None
+    ) -> None:
+        if not self._needs_probe:
+            return
+        self._needs_probe = False
+        if not duration_override and FfmpegProgress._uses_error_loglevel(self.cmd):
+            self.total_dur = await self._async_probe_duration(self.cmd)
+        if self._needs_frame_count():
+            self.total_frames = await self._async_probe_frame_count(self.cmd)
+
+    @staticmethod
+    def _get_frames_from_cmd(cmd: List[str]) -> Optional[int]:
+        """
+        Get the number of video frames to output, if it is limited in the command.
+        """
+        frames = None
+        for option, value in zip(cmd, cmd[1:]):
+            if option in ("-frames:v", "-vframes") and value.isdigit():
+                frames = int(value)
+        return frames
+
+    @staticmethod
+    def _frame_probe_input(cmd: List[str]) -> Optional[str]:
+        """
+        Get the input to probe the number of frames of, i.e. the first one that is not a pipe.
+        """
+        for i, arg in enumerate(cmd[:-1]):
+            if arg == "-i":
+                file_name = cmd[i + 1]
+                if file_name == "-" or file_name.startswith("pipe:"):
+                    return None
+                return file_name
+        return None
+
+    def _ffprobe_frames_cmd(self, file_name: str, count_packets: bool) -> List[str]:
+        entry = "stream=nb_read_packets" if count_packets else "stream=nb_frames"
+        return [
+            self.ffprobe_path,
+            "-loglevel",
+            "error",
+            "-select_streams",
+            "v:0",
+            *(["-count_packets"] if count_packets else []),
+            "-show_entries",
+            entry,
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            file_name,
+        ]
+
+    def _probe_frame_count(self, cmd: List[str]) -> Optional[int]:
+        """
+        Get the number of frames of the first input via ffprobe. If the container does
+        not state it, the packets are counted, which reads the whole input once.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+
+        Returns:
+            Optional[int]: The number of frames.
+        """
+        file_name = self._frame_probe_input(cmd)
+        if file_name is None:
+            return None
+        for count_packets in (False, True):
+            started = time.monotonic()
             try:
                 output = subprocess.check_output(
-                    [
-                        self.ffprobe_path,
-                        "-loglevel",
-                        "error",
-                        "-hide_banner",
-                        "-show_entries",
-                        "format=duration",
-                        "-of",
-                        "default=noprint_wrappers=1:nokey=1",
-                        file_name,
-                    ],
+                    self._ffprobe_frames_cmd(file_name, count_packets),
                     universal_newlines=True,
                 )
-                durations.append(int(float(output.strip()) * 1000))
             except Exception:
-                # TODO: add logging
+                # the frame count is then unknown, as the duration is if probing fails
                 return None
+            finally:
+                _observe_probe(started)
+            if (frames := _parse_frame_count(output)) is not None:
+                return frames
+        return None
 
-        return max(durations) if "-shortest" not in cmd else min(durations)
+    async def _async_probe_frame_count(self, cmd: List[str]) -> Optional[int]:
+        """
+        Get the number of frames of the first input via ffprobe, without blocking the event loop.
+        See `_probe_frame_count`.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+
+        Returns:
+            Optional[int]: The number of frames.
+        """
+        import asyncio
+
+        file_name = self._frame_probe_input(cmd)
+        if file_name is None:
+            return None
+        for count_packets in (False, True):
+            started = time.monotonic()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self._ffprobe_frames_cmd(file_name, count_packets),
+                    stdout=asyncio.subprocess.PIPE,
+                )
+                output, _ = await process.communicate()
+            except Exception:
+                # the frame count is then unknown, as the duration is if probing fails
+                return None
+            finally:
+                _observe_probe(started)
+            if process.returncode != 0:
+                return None
+            if (frames := _parse_frame_count(output.decode())) is not None:
+                return frames
+        return None
+
+    def _ffprobe_cmd(self, file_name: str) -> List[str]:
+        return [
+            self.ffprobe_path,
+            "-loglevel",
+            "error",
+            "-hide_banner",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            file_name,
+        ]
+
+    def _probe_file_duration(self, file_name: str) -> int:
+        """
+        Get the duration of a media file via ffprobe.
+
+        Args:
+            file_name (str): The path of the file.
+
+        Raises:
+            Exception: If ffprobe fails or does not report a duration.
+
+        Returns:
+            int: The duration in milliseconds.
+        """
+        started = time.monotonic()
+        try:
+            output = subprocess.check_output(
+                self._ffprobe_cmd(file_name), universal_newlines=True
+            )
+        finally:
+            _observe_probe(started)
+        return int(float(output.strip()) * 1000)
+
+    async def _async_probe_file_duration(self, file_name: str) -> int:
+        """
+        Get the duration of a media file via ffprobe, without blocking the event loop.
+
+        Args:
+            file_name (str): The path of the file.
+
+        Raises:
+            Exception: If ffprobe fails or does not report a duration.
+
+        Returns:
+            int: The duration in milliseconds.
+        """
+        import asyncio
+
+        started = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._ffprobe_cmd(file_name), stdout=asyncio.subprocess.PIPE
+            )
+            output, _ = await process.communicate()
+        finally:
+            _observe_probe(started)
+        if process.returncode != 0:
+            raise RuntimeError(f"ffprobe failed for {file_name}")
+        return int(float(output.decode().strip()) * 1000)
 
     @staticmethod
     def _uses_error_loglevel(cmd: List[str]) -> bool:
@@ -277,9 +1092,296 @@ class FfmpegProgress:
 
         return inputs
 
+    def _open_progress_pipe(self, popen_kwargs: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        Create the pipe that ffmpeg writes its progress to, and set up the command
+        and popen arguments so that the child process inherits its write end.
+
+        Args:
+            popen_kwargs (Dict[str, Any]): The arguments for the popen call, updated in place.
+
+        Returns:
+            Tuple[int, int]: The read and write file descriptors.
+        """
+        read_fd, write_fd = os.pipe()
+        # only replace the target, to keep options that were added to the
+        # command, e.g. by CpuScheduler.prepare()
+        cmd = list(self.cmd_with_progress)
+        cmd[cmd.index("-progress") + 1] = f"pipe:{write_fd}"
+        self.cmd_with_progress = cmd
+        popen_kwargs["pass_fds"] = tuple(popen_kwargs.get("pass_fds", ())) + (write_fd,)
+        return read_fd, write_fd
+
+    def _read_output(self, duration_override: Union[float, None]) -> Iterator[None]:
+        """
+        Read the merged log and progress output from stdout until it is closed.
+
+        The output is read in large chunks, which are decoded and split into lines
+        at once, rather than line by line.
+
+        Args:
+            duration_override (Union[float, None]): The duration of the video in seconds.
+
+        Yields:
+            Iterator[None]: None whenever a progress block is completed (see `progress`).
+        """
+        if self.process.stdout is None:
+            # nothing to read, e.g. if stdout was redirected via popen_kwargs
+            return
+
+        fd = self.process.stdout.fileno()
+        splitter = LineSplitter()
+        read = self._timed("read", os.read)
+        split = self._timed("decode", splitter.feed)
+        flush = self._timed("decode", splitter.flush)
+        # same as _process_output(), with the lookups hoisted out of the per-line loop
+        callback = self.stderr_callback
+        if callback:
+            callback = self._timed("callback", callback)
+        feed = self._timed("parse", self._parser.feed)
+        append = self._timed("parse", self._log.append)
+        add_log_line = self._timed("parse", self._add_log_line)
+        complete_block = self._timed("parse", self._complete_block)
+        # only wait in a selector if the read may have to be interrupted; on
+        # Windows, where only sockets can be selected, the process is killed instead
+        selector: Union[selectors.BaseSelector, None] = None
+        stop_waiting: Union[Callable[[], None], None] = None
+        if self._deadline is not None or self._cancel is not None:
+            if not _CAN_SELECT_PIPES:
+                stop_waiting = self._start_stopper()
+            else:
+                selector = selectors.DefaultSelector()
+                selector.register(fd, selectors.EVENT_READ)
+                if self._cancel is not None:
+                    selector.register(self._cancel.fileno(), selectors.EVENT_READ)
+        try:
+            while True:
+                if selector is not None:
+                    self._select(selector)
+                data = read(fd, 65536)
+                lines = split(data) if data else flush()
+                self._lines_parsed += len(lines)
+                for line in lines:
+                    if callback:
+                        callback(line)
+                    kind = feed(line)
+                    if kind == PROGRESS_LINE:
+                        append(line, True)
+                    elif kind == LOG_LINE:
+                        add_log_line(line, duration_override)
+                    else:
+                        append(line, True)
+                        complete_block()
+                        yield None
+                if not data:
+                    return
+        finally:
+            if selector is not None:
+                selector.close()
+            if stop_waiting is not None:
+                stop_waiting()
+
+    def _popen_with_progress_pipe(self, popen_kwargs: Dict[str, Any]) -> int:
+        """
+        Start the process, letting it write its progress to a dedicated pipe.
+
+        Args:
+            popen_kwargs (Dict[str, Any]): The arguments for the popen call.
+
+        Returns:
+            int: The read end of the progress pipe, to be closed by the caller.
+        """
+        progress_fd, write_fd = self._open_progress_pipe(popen_kwargs)
+        try:
+            self.process = subprocess.Popen(self.cmd_with_progress, **popen_kwargs)
+        except BaseException:
+            os.close(progress_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        return progress_fd
+
+    def _read_pipes(
+        self,
+        progress_fd: int,
+        duration_override: Union[float, None],
+        output_buffer: Union[bytearray, None] = None,
+    ) -> Iterator[Union[memoryview, None]]:
+        """
+        Read the log from stderr and the progress from the progress pipe, until both are closed.
+        If an output buffer is given, also read the media output from stdout into it.
+
+        Args:
+            progress_fd (int): The read end of the progress pipe.
+            duration_override (Union[float, None]): The duration of the video in seconds.
+            output_buffer (bytearray, optional): The buffer to read stdout into. Defaults to None.
+
+        Yields:
+            Iterator[Union[memoryview, None]]: None whenever a progress block is completed
+                (see `progress`), and a view of the output buffer whenever output was read.
+        """
+        stderr_fd = self.process.stderr.fileno()
+        splitters = {stderr_fd: LineSplitter(), progress_fd: LineSplitter()}
+        # handle the log first, so that the duration is known before the progress
+        order = {stderr_fd: 0, progress_fd: 1}
+        output_fd: Union[int, None] = None
+        output_view: Union[memoryview, None] = None
+        if output_buffer is not None:
+            output_fd = self.process.stdout.fileno()
+            output_view = memoryview(output_buffer)
+            order[output_fd] = 2
+
+        read = self._timed("read", os.read)
+        readv = self._timed("read", os.readv)
+        split = self._timed("decode", LineSplitter.feed)
+        flush = self._timed("decode", LineSplitter.flush)
+        feed = self._timed("parse", self._parser.feed)
+        complete_block = self._timed("parse", self._complete_block)
+        process_log_line = self._timed("parse", self._process_log_line)
+
+        with selectors.DefaultSelector() as selector:
+            for fd in order:
+                selector.register(fd, selectors.EVENT_READ)
+            if self._cancel is not None:
+                selector.register(self._cancel.fileno(), selectors.EVENT_READ)
+            open_fds = len(order)
+            while open_fds:
+                events = sorted(self._select(selector), key=lambda e: order[e[0].fd])
+                for key, _ in events:
+                    fd = key.fd
+                    if fd == output_fd:
+                        size = readv(fd, [output_buffer])
+                        if size:
+                            yield output_view[:size]  # type: ignore
+                        else:
+                            selector.unregister(fd)
+                            open_fds -= 1
+                        continue
+
+                    data = read(fd, 65536)
+                    if data:
+                        lines = split(splitters[fd], data)
+                    else:
+                        lines = flush(splitters[fd])
+                        selector.unregister(fd)
+                        open_fds -= 1
+                    if fd == progress_fd:
+                        self._lines_parsed += len(lines)
+                        for line in lines:
+                            if feed(line) == BLOCK_END:
+                                complete_block()
+                                yield None
+                    else:
+                        for line in lines:
+                            process_log_line(line, duration_override)
+
+    async def _async_spawn(self, popen_kwargs: Dict[str, Any]) -> Union[int, None]:
+        """
+        Start the process asynchronously.
+
+        Args:
+            popen_kwargs (Dict[str, Any]): The arguments for the process creation.
+
+        Returns:
+            Union[int, None]: The read end of the progress pipe with separate_progress, to be closed by the caller.
+        """
+        import asyncio
+
+        if not self.separate_progress:
+            # Remove stdout and stderr from popen_kwargs as we're setting them explicitly
+            popen_kwargs.pop("stdout", None)
+            popen_kwargs.pop("stderr", None)
+
+            self.process = await asyncio.create_subprocess_exec(
+                *self.cmd_with_progress,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                **popen_kwargs,
+            )
+            return None
+
+        progress_fd, write_fd = self._open_progress_pipe(popen_kwargs)
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.cmd_with_progress,
+                **popen_kwargs,
+            )
+        except BaseException:
+            os.close(progress_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        return progress_fd
+
+    async def _async_open_progress_pipe(
+        self, progress_fd: int
+    ) -> Tuple["asyncio.StreamReader", "asyncio.BaseTransport"]:
+        """
+        Wrap the read end of the progress pipe in a stream reader.
+
+        Args:
+            progress_fd (int): The read end of the progress pipe. It is closed together with the returned transport.
+
+        Returns:
+            Tuple[asyncio.StreamReader, asyncio.BaseTransport]: The reader and its transport.
+        """
+        import asyncio
+
+        reader = asyncio.StreamReader()
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(progress_fd, "rb", 0),
+        )
+        return reader, transport
+
+    async def _async_read_log(self, duration_override: Union[float, None]) -> None:
+        """
+        Read the log from stderr until it is closed, when progress is read from a separate pipe.
+        """
+        readline = self._async_timed("read", self.process.stderr.readline)
+        decode = self._timed("decode", _decode_line)
+        process_log_line = self._timed("parse", self._process_log_line)
+        while stderr_line := await readline():
+            process_log_line(decode(stderr_line), duration_override)
+
+    @overload
     def run_command_with_progress(
-        self, popen_kwargs=None, duration_override: Union[float, None] = None
-    ) -> Iterator[float]:
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        structured: Literal[False] = False,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> Iterator[float]: ...
+
+    @overload
+    def run_command_with_progress(
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        *,
+        structured: Literal[True],
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> Iterator[ProgressRecord]: ...
+
+    def run_command_with_progress(
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        structured: bool = False,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> Iterator[Union[float, ProgressRecord]]:
         """
         Run an ffmpeg command, trying to capture the process output and calculate
         the duration / progress.
@@ -288,15 +1390,27 @@ class FfmpegProgress:
         Args:
             popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call, e.g. { creationflags: CREATE_NO_WINDOW }
             duration_override (float, optional): The duration in seconds. If not specified, it will be calculated from the ffmpeg output.
+            structured (bool, optional): Yield a ProgressRecord for every completed progress block instead of the percentage. Defaults to False.
+            min_interval (float, optional): Yield at most one update per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only yield an update once the progress changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop the process if it makes no progress for this many seconds, see `StallWatchdog`. Defaults to None (wait indefinitely).
+            timeout (float, optional): Kill the process if the run takes longer than this many seconds in total. Defaults to None (no limit).
+            cancel (CancellationToken, optional): Kill the process once this token is cancelled. Defaults to None.
 
         Raises:
             RuntimeError: If the command fails, an exception is raised.
+            StallError: If the process was stopped because it stalled.
+            TimeoutError: If the timeout expired.
+            RunCancelledError: If the run was cancelled.
 
         Yields:
-            Iterator[float]: A generator that yields the progress in percent.
+            Iterator[float]: A generator that yields the progress in percent, or ProgressRecord objects if structured is set.
         """
         if self.dry_run:
-            yield from [0, 100]
+            if structured:
+                yield from [ProgressRecord(0), ProgressRecord(100, eta=0.0)]
+            else:
+                yield from [0, 100]
             return
 
         if duration_override:
@@ -306,58 +1420,192 @@ class FfmpegProgress:
         if popen_kwargs is not None:
             base_popen_kwargs.update(popen_kwargs)
 
-        self.process = subprocess.Popen(self.cmd_with_progress, **base_popen_kwargs)  # type: ignore
+        probe = self._start_probe(duration_override)
+        progress_fd: Union[int, None] = None
+        if self._replay_file is not None:
+            self.process = ReplayProcess(self._replay_file, self._replay_realtime)
+        elif self.separate_progress:
+            progress_fd = self._popen_with_progress_pipe(base_popen_kwargs)
+        else:
+            self.process = subprocess.Popen(self.cmd_with_progress, **base_popen_kwargs)  # type: ignore
 
         # Update the cleanup finalizer with the actual process
         self._cleanup_ref.detach()
         self._cleanup_ref = weakref.finalize(self, self._cleanup_process, self.process)
 
+        if probe is not None:
+            probe.join()
+
+        finished = False
+        self._start_metrics()
         try:
-            yield 0
+            yield ProgressRecord(0) if structured else 0
+
+            self._log = self._new_log_buffer()
+            self._reset_records(structured, min_interval, min_delta)
+            self._set_stop_conditions(timeout, cancel)
+            if stall_timeout is not None:
+                self._watchdog = StallWatchdog(stall_timeout, self.grace_period)
+                self._watchdog.start(self.process)  # type: ignore
+            if progress_fd is not None:
+                for _ in self._read_pipes(progress_fd, duration_override):
+                    if (update := self._pop_update(self.progress)) is not None:
+                        with self._watchdog_paused():
+                            yield update
+                self.process.wait()
+            else:
+                for _ in self._read_output(duration_override):
+                    if (update := self._pop_update(self.progress)) is not None:
+                        with self._watchdog_paused():
+                            yield update
+                self.process.wait()
 
-            stderr: List[str] = []
-            while True:
-                if self.process.stdout is None:
-                    continue
+            self._raise_if_stopped()
+            if self.process.returncode != 0:
+                raise RuntimeError(f"Error running command {self.cmd}: {self.stderr}")
 
-                stderr_line: str = (
-                    self.process.stdout.readline()
-                    .decode("utf-8", errors="replace")
-                    .strip()
-                )
+            final_record = self._final_record()
+            self.events.publish("progress", final_record)
+            finished = True
+            yield final_record if structured else 100
+        finally:
+            self._finish_metrics(None if finished else sys.exc_info()[1])
+            if self._watchdog is not None:
+                self._watchdog.stop()
+            if progress_fd is not None:
+                os.close(progress_fd)
+            self._sync_cleanup_process()
+
+    def _sync_cleanup_process(self) -> None:
+        """Clean up the process after a run, even if an exception occurred."""
+        if self.process is not None:
+            try:
+                if self.process.poll() is None:  # Process is still running
+                    self.process.kill()
+                    try:
+                        self.process.wait(timeout=1.0)
+                    except subprocess.TimeoutExpired:
+                        pass  # Process didn't terminate gracefully, but we killed it
+            except Exception:
+                pass  # Ignore any errors during cleanup
+            finally:
+                self.process = None
+                # Detach the finalizer since we've cleaned up manually
+                if hasattr(self, "_cleanup_ref"):
+                    self._cleanup_ref.detach()
+
+    def iter_output(
+        self,
+        chunk_size: int = 65536,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+    ) -> Iterator[memoryview]:
+        """
+        Run an ffmpeg command that writes media to stdout (e.g. `-f mpegts -`),
+        and yield its output in chunks. Requires `separate_progress`.
+
+        Each chunk is a view of a buffer that is reused for the next chunk, so it
+        must be consumed (or copied) before the next one is requested. While iterating,
+        the progress in percent is available in the `progress` attribute.
+
+        To write the output to a file or socket without passing it through Python
+        at all, pass it as `stdout` in `popen_kwargs` to `run_command_with_progress` instead.
+
+        Args:
+            chunk_size (int, optional): The maximum size of a chunk in bytes. Defaults to 65536.
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call, e.g. { creationflags: CREATE_NO_WINDOW }
+            duration_override (float, optional): The duration in seconds. If not specified, it will be calculated from the ffmpeg output.
+
+        Raises:
+            ValueError: If separate_progress is not set.
+            RuntimeError: If the command fails, an exception is raised.
+
+        Yields:
+            Iterator[memoryview]: The chunks of output.
+        """
+        if not self.separate_progress:
+            raise ValueError("iter_output requires separate_progress=True")
+
+        if self.dry_run:
+            return
+
+        if duration_override:
+            self.total_dur = int(duration_override * 1000)
 
-                if stderr_line == "" and self.process.poll() is not None:
-                    break
+        base_popen_kwargs = self.base_popen_kwargs.copy()
+        if popen_kwargs is not None:
+            base_popen_kwargs.update(popen_kwargs)
+        base_popen_kwargs["stdout"] = subprocess.PIPE
 
-                progress = self._process_output(stderr_line, stderr, duration_override)
-                if progress is not None:
-                    yield progress
+        probe = self._start_probe(duration_override)
+        progress_fd = self._popen_with_progress_pipe(base_popen_kwargs)
+
+        # Update the cleanup finalizer with the actual process
+        self._cleanup_ref.detach()
+        self._cleanup_ref = weakref.finalize(self, self._cleanup_process, self.process)
+
+        if probe is not None:
+            probe.join()
+
+        finished = False
+        self._start_metrics()
+        try:
+            self._log = self._new_log_buffer()
+            self._reset_records(False)
+            output_buffer = bytearray(chunk_size)
+            for chunk in self._read_pipes(
+                progress_fd, duration_override, output_buffer
+            ):
+                if chunk is not None:
+                    yield chunk
+            self.process.wait()
 
             if self.process.returncode != 0:
                 raise RuntimeError(f"Error running command {self.cmd}: {self.stderr}")
-
-            yield 100
+            finished = True
         finally:
-            # Ensure process cleanup even if an exception occurs
-            if self.process is not None:
-                try:
-                    if self.process.poll() is None:  # Process is still running
-                        self.process.kill()
-                        try:
-                            self.process.wait(timeout=1.0)
-                        except subprocess.TimeoutExpired:
-                            pass  # Process didn't terminate gracefully, but we killed it
-                except Exception:
-                    pass  # Ignore any errors during cleanup
-                finally:
-                    self.process = None
-                    # Detach the finalizer since we've cleaned up manually
-                    if hasattr(self, "_cleanup_ref"):
-                        self._cleanup_ref.detach()
+            self._finish_metrics(None if finished else sys.exc_info()[1])
+            os.close(progress_fd)
+            self._sync_cleanup_process()
+
+    @overload
+    def async_run_command_with_progress(
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        structured: Literal[False] = False,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> AsyncIterator[float]: ...
+
+    @overload
+    def async_run_command_with_progress(
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        *,
+        structured: Literal[True],
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> AsyncIterator[ProgressRecord]: ...
 
     async def async_run_command_with_progress(
-        self, popen_kwargs=None, duration_override: Union[float, None] = None
-    ) -> AsyncIterator[float]:
+        self,
+        popen_kwargs=None,
+        duration_override: Union[float, None] = None,
+        structured: bool = False,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+        timeout: Union[float, None] = None,
+        cancel: Union[CancellationToken, None] = None,
+    ) -> AsyncIterator[Union[float, ProgressRecord]]:
         """
         Asynchronously run an ffmpeg command, trying to capture the process output and calculate
         the duration / progress.
@@ -366,13 +1614,30 @@ class FfmpegProgress:
         Args:
             popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call, e.g. { creationflags: CREATE_NO_WINDOW }
             duration_override (float, optional): The duration in seconds. If not specified, it will be calculated from the ffmpeg output.
+            structured (bool, optional): Yield a ProgressRecord for every completed progress block instead of the percentage. Defaults to False.
+            min_interval (float, optional): Yield at most one update per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only yield an update once the progress changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop the process if it makes no progress for this many seconds, see `StallWatchdog`. Defaults to None (wait indefinitely).
+            timeout (float, optional): Kill the process if the run takes longer than this many seconds in total. Defaults to None (no limit).
+            cancel (CancellationToken, optional): Kill the process once this token is cancelled. Defaults to None.
 
         Raises:
             RuntimeError: If the command fails, an exception is raised.
+            StallError: If the process was stopped because it stalled.
+            TimeoutError: If the timeout expired.
+            RunCancelledError: If the run was cancelled.
+            ValueError: If the instance replays a log, see `from_log`.
         """
+        import asyncio
+
+        if self._replay_file is not None:
+            raise ValueError(
+                "replaying a log is only supported by run_command_with_progress"
+            )
+
         if self.dry_run:
-            yield 0
-            yield 100
+            yield ProgressRecord(0) if structured else 0
+            yield ProgressRecord(100, eta=0.0) if structured else 100
             return
 
         if duration_override:
@@ -382,47 +1647,103 @@ class FfmpegProgress:
         if popen_kwargs is not None:
             base_popen_kwargs.update(popen_kwargs)
 
-        # Remove stdout and stderr from base_popen_kwargs as we're setting them explicitly
-        base_popen_kwargs.pop("stdout", None)
-        base_popen_kwargs.pop("stderr", None)
-
-        self.process = await asyncio.create_subprocess_exec(
-            *self.cmd_with_progress,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
-            **base_popen_kwargs,  # type: ignore
-        )
+        # probe the duration while the process starts, if it was deferred
+        probe_task: Union[asyncio.Task, None] = None
+        if self._needs_probe:
+            probe_task = asyncio.ensure_future(
+                self._async_probe_if_needed(duration_override)
+            )
+        try:
+            progress_fd = await self._async_spawn(base_popen_kwargs)
+        except BaseException:
+            if probe_task is not None:
+                probe_task.cancel()
+            raise
 
         # Update the cleanup finalizer with the actual process
         self._cleanup_ref.detach()
         self._cleanup_ref = weakref.finalize(self, self._cleanup_process, self.process)
 
-        try:
-            yield 0
+        if probe_task is not None:
+            await probe_task
 
-            stderr: List[str] = []
-            while True:
-                if self.process.stdout is None:
-                    continue
-
-                stderr_line: Union[bytes, None] = await self.process.stdout.readline()
-                if not stderr_line:
-                    # Process has finished, check the return code
-                    await self.process.wait()
-                    if self.process.returncode != 0:
-                        raise RuntimeError(
-                            f"Error running command {self.cmd}: {self.stderr}"
-                        )
-                    break
-                stderr_line_str = stderr_line.decode("utf-8", errors="replace").strip()
-
-                progress = self._process_output(
-                    stderr_line_str, stderr, duration_override
+        progress_transport: Union[asyncio.BaseTransport, None] = None
+        log_task: Union[asyncio.Task, None] = None
+        watchdog_task: Union[asyncio.Task, None] = None
+        stop_task: Union[asyncio.Task, None] = None
+        finished = False
+        self._start_metrics()
+        try:
+            yield ProgressRecord(0) if structured else 0
+
+            self._log = self._new_log_buffer()
+            self._reset_records(structured, min_interval, min_delta)
+            self._set_stop_conditions(timeout, cancel)
+            if timeout is not None or cancel is not None:
+                stop_task = asyncio.ensure_future(self._async_stop_process())
+            if stall_timeout is not None:
+                self._watchdog = StallWatchdog(stall_timeout, self.grace_period)
+                watchdog_task = asyncio.ensure_future(
+                    self._watchdog.async_watch(self.process)
                 )
-                if progress is not None:
-                    yield progress
-
-            yield 100
+            if progress_fd is not None:
+                (
+                    progress_reader,
+                    progress_transport,
+                ) = await self._async_open_progress_pipe(progress_fd)
+                # the transport owns the file descriptor now
+                progress_fd = None
+                log_task = asyncio.ensure_future(
+                    self._async_read_log(duration_override)
+                )
+                readline = self._async_timed("read", progress_reader.readline)
+                decode = self._timed("decode", _decode_line)
+                feed = self._timed("parse", self._parser.feed)
+                complete_block = self._timed("parse", self._complete_block)
+                while progress_line := await readline():
+                    line = decode(progress_line)
+                    self._lines_parsed += 1
+                    if feed(line) != BLOCK_END:
+                        continue
+                    progress = complete_block()
+                    if (update := self._pop_update(progress)) is not None:
+                        with self._watchdog_paused():
+                            yield update
+                await log_task
+                await self.process.wait()
+                self._raise_if_stopped()
+                if self.process.returncode != 0:
+                    raise RuntimeError(
+                        f"Error running command {self.cmd}: {self.stderr}"
+                    )
+            else:
+                # stdout is always a pipe here, see _async_spawn
+                readline = self._async_timed("read", self.process.stdout.readline)
+                decode = self._timed("decode", _decode_line)
+                process_output = self._timed("parse", self._process_output)
+                while True:
+                    if self.process.stdout is None:
+                        continue
+
+                    stderr_line = await readline()
+                    if not stderr_line:
+                        # Process has finished, check the return code
+                        await self.process.wait()
+                        self._raise_if_stopped()
+                        if self.process.returncode != 0:
+                            raise RuntimeError(
+                                f"Error running command {self.cmd}: {self.stderr}"
+                            )
+                        break
+                    progress = process_output(decode(stderr_line), duration_override)
+                    if (update := self._pop_update(progress)) is not None:
+                        with self._watchdog_paused():
+                            yield update
+
+            final_record = self._final_record()
+            self.events.publish("progress", final_record)
+            finished = True
+            yield final_record if structured else 100
         except GeneratorExit:
             # Handle case where async generator is closed prematurely
             await self._async_cleanup_process()
@@ -432,6 +1753,16 @@ class FfmpegProgress:
             await self._async_cleanup_process()
             raise
         finally:
+            self._finish_metrics(None if finished else sys.exc_info()[1])
+            for task in (stop_task, watchdog_task):
+                if task is not None and not task.done():
+                    task.cancel()
+            if log_task is not None and not log_task.done():
+                log_task.cancel()
+            if progress_transport is not None:
+                progress_transport.close()
+            if progress_fd is not None:
+                os.close(progress_fd)
             # Normal cleanup
             await self._async_cleanup_process()
 
@@ -509,6 +1840,45 @@ class FfmpegProgress:
         await self.process.wait()
         self.process = None
 
+    def subscribe(
+        self,
+        subscriber: Union[Callable[[Any], Any], "asyncio.Queue[Any]"],
+        topic: str = "progress",
+        policy: str = "drop_oldest",
+        maxsize: int = 1024,
+    ) -> Subscription:
+        """
+        Subscribe to the progress updates or log lines of this command, in addition
+        to the run generator. Any number of subscribers can be added, also while
+        the command is running.
+
+        Each subscriber is fed from its own buffer, in a background thread (for
+        callables) or in its event loop (for asyncio queues), so that a slow
+        subscriber does not hold up reading ffmpeg's output.
+
+        Args:
+            subscriber (Union[Callable[[Any], Any], asyncio.Queue]): A callable (e.g. a function or bound method) that is called with each event, or an asyncio queue that the events are put into. Queues must be subscribed from within their event loop.
+            topic (str, optional): "progress" for a ProgressRecord per progress update (including the final one at 100%), or "log" for each log line. Defaults to "progress".
+            policy (str, optional): What to do when the subscriber falls behind by `maxsize` events: "drop_oldest", "latest" (only keep the newest event), or "block" (wait for the subscriber, which also holds up ffmpeg; not for queues). Defaults to "drop_oldest".
+            maxsize (int, optional): The size of the buffer of a callable subscriber. The size of a queue is its own maxsize. Defaults to 1024.
+
+        Raises:
+            ValueError: If the topic, policy or subscriber is invalid.
+
+        Returns:
+            Subscription: The subscription, e.g. to unsubscribe later.
+        """
+        return self.events.subscribe(subscriber, topic, policy, maxsize)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a subscription. Events that are still buffered are delivered.
+
+        Args:
+            subscription (Subscription): The subscription, as returned by `subscribe`.
+        """
+        self.events.unsubscribe(subscription)
+
     def set_stderr_callback(self, callback: Callable[[str], None]) -> None:
         """
         Set a callback function to be called on stderr output.
@@ -0,0 +1,138 @@
+import re
+from collections import deque
+from typing import Deque, List, Optional
+
+PROGRESS_REGEX = re.compile(r"[a-z0-9_]+=.+")
+
+
+def _size(line: str) -> int:
+    """
+    Get the size of a line in UTF-8, including its newline.
+    """
+    # isascii() is O(1), and ffmpeg logs are mostly ASCII
+    return (len(line) if line.isascii() else len(line.encode())) + 1
+
+
+class LogBuffer:
+    """
+    Append-only store for the lines of an ffmpeg log.
+
+    Lines are appended in amortized O(1). If progress lines are to be excluded,
+    they are filtered once when they arrive rather than on every read. The joined
+    log string is only built when `text` is accessed, and is cached until the
+    next append.
+
+    By default, all lines are kept. If `max_lines` or `max_bytes` is set, the
+    buffer keeps the header (everything before the first `progress=` line) plus
+    a ring of the most recent lines, each bounded by the given limits, so that
+    memory use stays constant for long-running jobs. The most recent lines are
+    where ffmpeg prints its errors, so these are always retained.
+    """
+
+    def __init__(
+        self,
+        exclude_progress: bool = False,
+        max_lines: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the log buffer.
+
+        Args:
+            exclude_progress (bool, optional): Do not keep progress (key=value) lines. Defaults to False.
+            max_lines (int, optional): Keep at most this many header lines and this many recent lines. Defaults to None (unlimited).
+            max_bytes (int, optional): Keep at most this many bytes (in UTF-8) of header and of recent lines. Defaults to None (unlimited).
+        """
+        if max_lines is not None and max_lines < 1:
+            raise ValueError("max_lines must be at least 1")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        self.exclude_progress = exclude_progress
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+        self._bounded = max_lines is not None or max_bytes is not None
+        self._header: List[str] = []
+        self._header_bytes = 0
+        self._in_header = True
+        # with a line limit only, the deque evicts the oldest lines by itself
+        self._lines: Deque[str] = deque(maxlen=max_lines if max_bytes is None else None)
+        self._lines_bytes = 0
+        self._text: Optional[str] = None
+        self._seen = False
+
+    def _fits(self, count: int, size: int) -> bool:
+        return (self.max_lines is None or count <= self.max_lines) and (
+            self.max_bytes is None or size <= self.max_bytes
+        )
+
+    def append(self, line: str, is_progress: Optional[bool] = None) -> None:
+        """
+        Add a line to the buffer.
+
+        Args:
+            line (str): The line, without trailing newline.
+            is_progress (bool, optional): Whether the line is a progress (key=value) line,
+                if already known. Defaults to None (check the line).
+        """
+        self._seen = True
+        if self._bounded and self._in_header and line.startswith("progress="):
+            self._in_header = False
+        if self.exclude_progress:
+            if is_progress is None:
+                is_progress = PROGRESS_REGEX.match(line) is not None
+            if is_progress:
+                return
+
+        self._text = None
+        if not self._bounded:
+            self._lines.append(line)
+            return
+
+        size = _size(line)
+        if self._in_header and self._fits(
+            len(self._header) + 1, self._header_bytes + size
+        ):
+            self._header.append(line)
+            self._header_bytes += size
+            return
+
+        if self.max_bytes is None:
+            if len(self._lines) == self.max_lines:
+                self.dropped += 1
+            self._lines.append(line)
+            return
+
+        self._lines.append(line)
+        self._lines_bytes += size
+        # always keep the newest line, even if it alone exceeds the limit
+        while len(self._lines) > 1 and not self._fits(
+            len(self._lines), self._lines_bytes
+        ):
+            self._lines_bytes -= _size(self._lines.popleft())
+            self.dropped += 1
+
+    def __len__(self) -> int:
+        return len(self._header) + len(self._lines)
+
+    @property
+    def text(self) -> Optional[str]:
+        """
+        The log as a single string, or None if no line was appended yet.
+        If lines were dropped, a marker is inserted where they were removed.
+        """
+        if not self._seen:
+            return None
+        if self._text is None:
+            if self.dropped:
+                lines = (
+                    self._header
+                    + [f"[... {self.dropped} lines omitted ...]"]
+                    + list(self._lines)
+                )
+            else:
+                lines = self._header + list(self._lines)
+            self._text = "\n".join(lines)
+        return self._text
@@ -0,0 +1,356 @@
+import itertools
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, ClassVar, Dict, List, Optional, Sequence, Tuple
+
+from .cancellation import RunCancelledError
+from .progress import _parse_float, _parse_int
+from .watchdog import StallError
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# the content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# the upper bounds of the histogram buckets, in seconds
+JOB_DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+PROBE_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# how a job ended, see job_result()
+RESULTS = ("succeeded", "failed", "cancelled", "timeout", "stalled")
+
+
+def job_result(error: Optional[BaseException]) -> str:
+    """
+    Get the result label of a job from the exception it ended with, if any.
+    """
+    if error is None:
+        return "succeeded"
+    if isinstance(error, StallError):
+        return "stalled"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, (RunCancelledError, GeneratorExit, KeyboardInterrupt)):
+        return "cancelled"
+    # only async runs can be cancelled by asyncio, and they have imported it
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is not None and isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return "failed"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = sorted(bounds)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {_format_value(self.sum)}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class JobMetrics:
+    """
+    The state of a running job, as last reported by its progress block.
+
+    The block is stored as is, and only parsed when the metrics are rendered,
+    so that updating it costs no more than a few assignments.
+
+    Attributes:
+        job (str): The value of the `job` label.
+        started (float): The value of `time.monotonic()` when the job started.
+        block (Dict[str, str]): The raw values of the last progress block.
+        percent (float, optional): The progress in percent.
+        lines (int): The number of output lines parsed so far.
+    """
+
+    __slots__ = ("job", "started", "block", "percent", "lines")
+
+    def __init__(self, job: str) -> None:
+        self.job = job
+        self.started = time.monotonic()
+        self.block: Dict[str, str] = {}
+        self.percent: Optional[float] = None
+        self.lines = 0
+
+    def update(
+        self, block: Dict[str, str], percent: Optional[float], lines: int
+    ) -> None:
+        """
+        Store the last completed progress block.
+        """
+        self.block = block
+        self.percent = percent
+        self.lines = lines
+
+    def frames(self) -> Tuple[int, int]:
+        """
+        Get the number of dropped and duplicated frames reported so far.
+        """
+        drop = _parse_int(self.block.get("drop_frames", "")) or 0
+        dup = _parse_int(self.block.get("dup_frames", "")) or 0
+        return drop, dup
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms of the ffmpeg commands run in this process,
+    in the Prometheus/OpenMetrics text exposition format.
+
+    Metrics are only collected while `Metrics.shared` is set, e.g. to `Metrics()`.
+    Each run of `FfmpegProgress` is then tracked as a job, with gauges for its
+    progress, speed, fps and parsed lines per second (labelled with a job number,
+    and removed when the job ends). Totals, such as the number of jobs by result,
+    dropped and duplicated frames, and parsed lines, cover all jobs, including
+    the running ones. The duration of jobs and of ffprobe runs are histograms.
+
+    Jobs only store their last progress block, which is parsed when the metrics
+    are rendered, so collecting them adds next to nothing to reading the output.
+    """
+
+    shared: ClassVar[Optional["Metrics"]] = None
+
+    def __init__(
+        self,
+        namespace: str = "ffmpeg_progress",
+        job_duration_buckets: Sequence[float] = JOB_DURATION_BUCKETS,
+        probe_duration_buckets: Sequence[float] = PROBE_DURATION_BUCKETS,
+    ) -> None:
+        """
+        Initialize the metrics.
+
+        Args:
+            namespace (str, optional): The prefix of the metric names. Defaults to "ffmpeg_progress".
+            job_duration_buckets (Sequence[float], optional): The bucket bounds of the job duration histogram in seconds.
+            probe_duration_buckets (Sequence[float], optional): The bucket bounds of the probe duration histogram in seconds.
+        """
+        self.namespace = namespace
+        self.jobs: Dict[str, JobMetrics] = {}
+        self.results: Dict[str, int] = {result: 0 for result in RESULTS}
+        self.job_duration = _Histogram(job_duration_buckets)
+        self.probe_duration = _Histogram(probe_duration_buckets)
+
+        # the totals of the jobs that ended
+        self._lines = 0
+        self._dropped = 0
+        self._duplicated = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_job(self) -> JobMetrics:
+        """
+        Start tracking a job.
+
+        Returns:
+            JobMetrics: The job, to be updated with its progress blocks, and passed to `finish_job`.
+        """
+        job = JobMetrics(str(next(self._ids)))
+        with self._lock:
+            self.jobs[job.job] = job
+        return job
+
+    def finish_job(self, job: JobMetrics, result: str = "succeeded") -> None:
+        """
+        Stop tracking a job, and add it to the totals.
+
+        Args:
+            job (JobMetrics): The job, as returned by `start_job`.
+            result (str, optional): How the job ended, one of RESULTS. Defaults to "succeeded".
+        """
+        drop, dup = job.frames()
+        with self._lock:
+            if self.jobs.pop(job.job, None) is None:
+                return
+            self.results[result] = self.results.get(result, 0) + 1
+            self.job_duration.observe(time.monotonic() - job.started)
+            self._lines += job.lines
+            self._dropped += drop
+            self._duplicated += dup
+
+    def observe_probe(self, seconds: float) -> None:
+        """
+        Record the time it took to run ffprobe.
+        """
+        with self._lock:
+            self.probe_duration.observe(seconds)
+
+    def render(self) -> str:
+        """
+        Render the metrics in the text exposition format.
+
+        Returns:
+            str: The metrics, to be served with CONTENT_TYPE.
+        """
+        ns = self.namespace
+        now = time.monotonic()
+        lines: List[str] = []
+
+        def add(name: str, kind: str, help: str, samples: List[str]) -> None:
+            lines.append(f"# HELP {ns}_{name} {help}")
+            lines.append(f"# TYPE {ns}_{name} {kind}")
+            lines.extend(samples)
+
+        with self._lock:
+            jobs = list(self.jobs.values())
+            total_lines, dropped, duplicated = (
+                self._lines,
+                self._dropped,
+                self._duplicated,
+            )
+            results = dict(self.results)
+            job_duration = self.job_duration.samples(f"{ns}_job_duration_seconds")
+            probe_duration = self.probe_duration.samples(f"{ns}_probe_duration_seconds")
+
+        speed, fps, percent, rate = [], [], [], []
+        for job in jobs:
+            label = f'{{job="{job.job}"}}'
+            block = job.block
+            if (value := _parse_float(block.get("speed", ""), "x")) is not None:
+                speed.append(f"{ns}_job_speed{label} {_format_value(value)}")
+            if (value := _parse_float(block.get("fps", ""))) is not None:
+                fps.append(f"{ns}_job_fps{label} {_format_value(value)}")
+            if job.percent is not None:
+                percent.append(
+                    f"{ns}_job_progress_percent{label} {_format_value(job.percent)}"
+                )
+            elapsed = now - job.started
+            rate.append(
+                f"{ns}_job_lines_per_second{label} "
+                f"{_format_value(round(job.lines / elapsed, 3) if elapsed else 0)}"
+            )
+            drop, dup = job.frames()
+            total_lines += job.lines
+            dropped += drop
+            duplicated += dup
+
+        add(
+            "active_jobs",
+            "gauge",
+            "The number of running ffmpeg commands.",
+            [f"{ns}_active_jobs {len(jobs)}"],
+        )
+        add(
+            "jobs_total",
+            "counter",
+            "The number of ffmpeg commands that ended, by result.",
+            [
+                f'{ns}_jobs_total{{result="{result}"}} {count}'
+                for result, count in results.items()
+            ],
+        )
+        add(
+            "job_duration_seconds",
+            "histogram",
+            "The wall-clock time of ffmpeg commands that ended.",
+            job_duration,
+        )
+        add(
+            "probe_duration_seconds",
+            "histogram",
+            "The wall-clock time of ffprobe runs.",
+            probe_duration,
+        )
+        add(
+            "job_speed",
+            "gauge",
+            "The encoding speed of a running command as a multiple of realtime.",
+            speed,
+        )
+        add(
+            "job_fps",
+            "gauge",
+            "The encoding speed of a running command in frames per second.",
+            fps,
+        )
+        add(
+            "job_progress_percent",
+            "gauge",
+            "The progress of a running command in percent.",
+            percent,
+        )
+        add(
+            "job_lines_per_second",
+            "gauge",
+            "The output lines parsed per second for a running command.",
+            rate,
+        )
+        add(
+            "lines_parsed_total",
+            "counter",
+            "The number of output lines parsed.",
+            [f"{ns}_lines_parsed_total {total_lines}"],
+        )
+        add(
+            "frames_dropped_total",
+            "counter",
+            "The number of frames dropped by ffmpeg.",
+            [f"{ns}_frames_dropped_total {dropped}"],
+        )
+        add(
+            "frames_duplicated_total",
+            "counter",
+            "The number of frames duplicated by ffmpeg.",
+            [f"{ns}_frames_duplicated_total {duplicated}"],
+        )
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """
+        Serve the metrics over HTTP in a background thread, on any path.
+
+        Args:
+            port (int, optional): The port to listen on, or 0 for any free port. Defaults to 9464.
+            host (str, optional): The address to listen on. Defaults to "127.0.0.1".
+
+        Returns:
+            ThreadingHTTPServer: The server, e.g. to get its `server_address`, or to `shutdown()` it.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,205 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .ffmpeg_progress_yield import FfmpegProgress
+
+
+def _check_run_kwargs(run_kwargs: Dict[str, Any]) -> None:
+    if "structured" in run_kwargs:
+        raise ValueError(
+            "structured is not supported, as the pipeline yields the overall progress in percent"
+        )
+
+
+class Pipeline:
+    """
+    Run several ffmpeg commands in sequence, e.g. the passes of a two-pass encode,
+    or a filter step followed by an encode, and report their combined progress.
+
+    Each step contributes to the overall progress according to its weight. If no
+    weights are given, they are estimated from the duration of each step's inputs,
+    or else all steps are weighted equally. The durations are probed once, before
+    the first step is run: steps with the same inputs share one probe, and steps
+    whose inputs do not exist yet (as they are created by a previous step) are
+    assumed to have the duration of the previous step. The durations are passed
+    to the steps, so that none of them probes again.
+    """
+
+    def __init__(
+        self,
+        cmds: List[List[str]],
+        weights: Optional[List[float]] = None,
+        duration_override: Optional[float] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize the pipeline.
+
+        Args:
+            cmds (List[List[str]]): The ffmpeg commands, in the order in which they are run.
+            weights (List[float], optional): The relative weight of each step. Defaults to None (estimated from the durations).
+            duration_override (float, optional): The duration in seconds of every step. Defaults to None (probed).
+            **kwargs: Passed to FfmpegProgress for every step, e.g. ffprobe_path="...".
+
+        Raises:
+            ValueError: If there are no commands, or the weights do not match them.
+        """
+        if not cmds:
+            raise ValueError("at least one command is required")
+        if weights is not None:
+            if len(weights) != len(cmds):
+                raise ValueError("there must be one weight per command")
+            if any(weight < 0 for weight in weights) or not sum(weights):
+                raise ValueError("weights must not be negative, and not all zero")
+
+        self.cmds = cmds
+        self.weights = weights
+        self.duration_override = duration_override
+        self.kwargs = kwargs
+
+        # one instance per step; probing is done by the pipeline
+        step_kwargs: Dict[str, Any] = {**kwargs, "lazy_probe": True}
+        self.steps = [FfmpegProgress(cmd, **step_kwargs) for cmd in cmds]
+        # the index of the step that is running, or was run last
+        self.current = 0
+        # the overall progress in percent
+        self.progress: float = 0
+        # the duration of each step in seconds, once probed
+        self.durations: List[Optional[float]] = [duration_override] * len(cmds)
+        self._probed = duration_override is not None
+
+    def _assign_durations(self, probed: Dict[Tuple[str, ...], Optional[int]]) -> None:
+        """
+        Assign the probed durations to the steps, by the files they read.
+        """
+        previous: Optional[float] = None
+        for index, step in enumerate(self.steps):
+            file_names = tuple(step._probe_file_names(step.cmd))
+            duration_ms = probed.get(file_names) if file_names else None
+            self.durations[index] = (
+                duration_ms / 1000 if duration_ms is not None else previous
+            )
+            previous = self.durations[index]
+        self._probed = True
+
+    def _files_to_probe(self) -> Dict[Tuple[str, ...], int]:
+        """
+        Get the distinct sets of input files of the steps, and a step that reads each.
+        """
+        files: Dict[Tuple[str, ...], int] = {}
+        for index, step in enumerate(self.steps):
+            file_names = tuple(step._probe_file_names(step.cmd))
+            if file_names and file_names not in files:
+                files[file_names] = index
+        return files
+
+    def _probe(self) -> None:
+        if self._probed:
+            return
+        probed = {
+            file_names: self.steps[index]._probe_duration(self.cmds[index])
+            for file_names, index in self._files_to_probe().items()
+        }
+        self._assign_durations(probed)
+
+    async def _async_probe(self) -> None:
+        if self._probed:
+            return
+        probed = {
+            file_names: await self.steps[index]._async_probe_duration(self.cmds[index])
+            for file_names, index in self._files_to_probe().items()
+        }
+        self._assign_durations(probed)
+
+    def _step_weights(self) -> List[float]:
+        """
+        Get the weight of each step as a fraction of the total.
+        """
+        weights: List[float]
+        if self.weights is not None:
+            weights = self.weights
+        elif all(self.durations) and sum(self.durations):  # type: ignore
+            weights = self.durations  # type: ignore
+        else:
+            weights = [1.0] * len(self.steps)
+        total = sum(weights)
+        return [weight / total for weight in weights]
+
+    def _update(
+        self, weights: List[float], index: int, progress: float
+    ) -> Optional[float]:
+        """
+        Update the overall progress with the progress of a step.
+
+        Returns:
+            Optional[float]: The overall progress in percent, if it advanced.
+        """
+        overall = round(100 * sum(weights[:index]) + weights[index] * progress, 2)
+        overall = min(overall, 100)
+        if overall <= self.progress:
+            return None
+        self.progress = overall
+        return overall
+
+    def run(self, popen_kwargs=None, **run_kwargs: Any) -> Iterator[float]:
+        """
+        Run the steps one after another.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call of every step.
+            **run_kwargs: Passed to `run_command_with_progress` of every step, e.g. min_interval=1.
+
+        Raises:
+            RuntimeError: If a step fails, its error is raised, and the remaining steps are not run.
+            ValueError: If structured is passed, as only the overall progress in percent is yielded.
+
+        Yields:
+            Iterator[float]: The overall progress in percent, which never decreases.
+        """
+        _check_run_kwargs(run_kwargs)
+        self._probe()
+        weights = self._step_weights()
+        self.progress = 0
+        yield 0
+        for index, step in enumerate(self.steps):
+            self.current = index
+            for progress in step.run_command_with_progress(
+                popen_kwargs, duration_override=self.durations[index], **run_kwargs
+            ):
+                if (overall := self._update(weights, index, progress)) is not None:
+                    yield overall
+        if self.progress < 100:
+            self.progress = 100
+            yield 100
+
+    async def async_run(
+        self, popen_kwargs=None, **run_kwargs: Any
+    ) -> AsyncIterator[float]:
+        """
+        Run the steps one after another, asynchronously.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the process creation of every step.
+            **run_kwargs: Passed to `async_run_command_with_progress` of every step, e.g. min_interval=1.
+
+        Raises:
+            RuntimeError: If a step fails, its error is raised, and the remaining steps are not run.
+            ValueError: If structured is passed, as only the overall progress in percent is yielded.
+
+        Yields:
+            AsyncIterator[float]: The overall progress in percent, which never decreases.
+        """
+        _check_run_kwargs(run_kwargs)
+        await self._async_probe()
+        weights = self._step_weights()
+        self.progress = 0
+        yield 0
+        for index, step in enumerate(self.steps):
+            self.current = index
+            async for progress in step.async_run_command_with_progress(
+                popen_kwargs, duration_override=self.durations[index], **run_kwargs
+            ):
+                if (overall := self._update(weights, index, progress)) is not None:
+                    yield overall
+        if self.progress < 100:
+            self.progress = 100
+            yield 100
@@ -0,0 +1,215 @@
+import time
+from typing import Callable, Dict, Optional, Union
+
+# what ProgressParser.feed() returns for a line
+LOG_LINE = 0
+PROGRESS_LINE = 1
+BLOCK_END = 2
+
+# the keys of a progress block that ffmpeg always writes, to skip further checks
+_PROGRESS_KEYS = frozenset(
+    (
+        "frame",
+        "fps",
+        "bitrate",
+        "total_size",
+        "out_time_us",
+        "out_time_ms",
+        "out_time",
+        "dup_frames",
+        "drop_frames",
+        "speed",
+        "progress",
+    )
+)
+
+
+def _parse_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _parse_float(value: str, suffix: str = "") -> Optional[float]:
+    if suffix and value.endswith(suffix):
+        value = value[: -len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ProgressRecord:
+    """
+    The state reported by ffmpeg in one `-progress` block.
+
+    Fields that ffmpeg did not report, or reported as "N/A", are None.
+
+    Attributes:
+        percent (float, optional): The progress in percent, or None if the total duration is unknown.
+        frame (int, optional): The number of frames encoded so far.
+        fps (float, optional): The encoding speed in frames per second.
+        bitrate (float, optional): The output bitrate in kbit/s.
+        total_size (int, optional): The output size in bytes.
+        out_time_us (int, optional): The output timestamp in microseconds.
+        speed (float, optional): The encoding speed as a multiple of realtime.
+        dup_frames (int, optional): The number of duplicated frames.
+        drop_frames (int, optional): The number of dropped frames.
+        timestamp (float): The value of `time.monotonic()` when the block was completed.
+        eta (float, optional): The estimated remaining time in seconds, see `ProgressEstimator`.
+    """
+
+    __slots__ = (
+        "percent",
+        "frame",
+        "fps",
+        "bitrate",
+        "total_size",
+        "out_time_us",
+        "speed",
+        "dup_frames",
+        "drop_frames",
+        "timestamp",
+        "eta",
+    )
+
+    # how to parse the value of each key in a progress block
+    FIELD_PARSERS: Dict[str, Callable[[str], Union[int, float, None]]] = {
+        "frame": _parse_int,
+        "fps": _parse_float,
+        "bitrate": lambda value: _parse_float(value, "kbits/s"),
+        "total_size": _parse_int,
+        "out_time_us": _parse_int,
+        "speed": lambda value: _parse_float(value, "x"),
+        "dup_frames": _parse_int,
+        "drop_frames": _parse_int,
+    }
+
+    def __init__(
+        self,
+        percent: Optional[float] = None,
+        frame: Optional[int] = None,
+        fps: Optional[float] = None,
+        bitrate: Optional[float] = None,
+        total_size: Optional[int] = None,
+        out_time_us: Optional[int] = None,
+        speed: Optional[float] = None,
+        dup_frames: Optional[int] = None,
+        drop_frames: Optional[int] = None,
+        timestamp: Optional[float] = None,
+        eta: Optional[float] = None,
+    ) -> None:
+        self.percent = percent
+        self.frame = frame
+        self.fps = fps
+        self.bitrate = bitrate
+        self.total_size = total_size
+        self.out_time_us = out_time_us
+        self.speed = speed
+        self.dup_frames = dup_frames
+        self.drop_frames = drop_frames
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.eta = eta
+
+    @classmethod
+    def from_fields(
+        cls, fields: Dict[str, str], percent: Optional[float]
+    ) -> "ProgressRecord":
+        """
+        Create a record from the raw key/value pairs of a progress block.
+
+        Args:
+            fields (Dict[str, str]): The raw values of the block. Keys not in FIELD_PARSERS are ignored.
+            percent (float, optional): The progress in percent.
+
+        Returns:
+            ProgressRecord: The parsed record.
+        """
+        record = cls(percent)
+        for key, parse in cls.FIELD_PARSERS.items():
+            if (value := fields.get(key)) is not None:
+                setattr(record, key, parse(value))
+        return record
+
+    def copy(self, **changes: Union[int, float, None]) -> "ProgressRecord":
+        """
+        Return a copy of this record with some fields replaced.
+        """
+        record = ProgressRecord.__new__(ProgressRecord)
+        for name in self.__slots__:
+            setattr(record, name, changes.get(name, getattr(self, name)))
+        return record
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ProgressRecord({fields})"
+
+
+class ProgressParser:
+    """
+    Incremental parser for the output of `ffmpeg -progress`.
+
+    ffmpeg writes its progress as blocks of `key=value` lines, each block
+    terminated by `progress=continue` or `progress=end`. The parser tells
+    these lines apart from regular log lines by their prefix, and collects
+    the values of the current block until it is complete.
+    """
+
+    __slots__ = ("fields", "block", "out_time_us")
+
+    def __init__(self) -> None:
+        # the raw values of the block that is currently being read
+        self.fields: Dict[str, str] = {}
+        # the raw values of the last completed block
+        self.block: Dict[str, str] = {}
+        # the output time of the last completed block, if it was reported
+        self.out_time_us: Optional[int] = None
+
+    def feed(self, line: str) -> int:
+        """
+        Parse a single line of output.
+
+        Args:
+            line (str): The line, without surrounding whitespace.
+
+        Returns:
+            int: LOG_LINE for regular log lines, PROGRESS_LINE for lines that are part
+                of a progress block, and BLOCK_END for the line that completes a block.
+        """
+        key, sep, value = line.partition("=")
+        if key not in _PROGRESS_KEYS and (
+            not sep or not key.isidentifier() or not key.islower()
+        ):
+            return LOG_LINE
+        if not value:
+            return LOG_LINE
+        if key != "progress":
+            self.fields[key] = value
+            return PROGRESS_LINE
+
+        self.block, self.fields = self.fields, {}
+        out_time_us = self.block.get("out_time_us")
+        if out_time_us is not None:
+            try:
+                self.out_time_us = int(out_time_us)
+            except ValueError:
+                # "N/A" before the first frame was written
+                self.out_time_us = None
+        else:
+            # ffmpeg before 4.2 only reports the output time as a string
+            self.out_time_us = _parse_time_us(self.block.get("out_time"))
+        return BLOCK_END
+
+
+def _parse_time_us(value: Optional[str]) -> Optional[int]:
+    """
+    Convert a time string like "01:02:03.456789" to microseconds.
+    """
+    if value is None:
+        return None
+    try:
+        hour, minute, sec = value.split(":")
+        return round(((int(hour) * 60 + int(minute)) * 60 + float(sec)) * 1_000_000)
+    except ValueError:
+        return None
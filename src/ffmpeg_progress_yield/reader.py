@@ -0,0 +1,40 @@
+import codecs
+from typing import List
+
+
+class LineSplitter:
+    """
+    Split a stream of byte chunks into lines.
+
+    Each chunk is decoded once, and lines are split in bulk. Incomplete lines
+    (and incomplete multi-byte characters) are kept until the next chunk arrives.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        """
+        Add a chunk of data.
+
+        Args:
+            data (bytes): The chunk, as read from the stream.
+
+        Returns:
+            List[str]: The lines completed by this chunk, stripped of surrounding whitespace.
+        """
+        lines = (self._pending + self._decoder.decode(data)).split("\n")
+        self._pending = lines.pop()
+        return [line.strip() for line in lines]
+
+    def flush(self) -> List[str]:
+        """
+        Signal the end of the stream.
+
+        Returns:
+            List[str]: The last line, if the stream did not end with a newline.
+        """
+        rest = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return [rest.strip()] if rest else []
@@ -0,0 +1,189 @@
+import os
+import subprocess
+import threading
+import time
+from typing import IO, Any, Optional, Union
+
+# the size of the chunks that are copied from the log to the pipe
+CHUNK_SIZE = 65536
+
+
+def _open_log(log_file: str) -> IO[bytes]:
+    if log_file.endswith(".gz"):
+        import gzip
+
+        return gzip.open(log_file, "rb")  # type: ignore
+    return open(log_file, "rb")
+
+
+def _block_time(
+    out_time_us: Optional[bytes], speed: Optional[bytes]
+) -> Optional[float]:
+    """
+    Get the time in seconds after the start at which ffmpeg wrote a progress block.
+    ffmpeg reports the speed as the output time divided by the elapsed time.
+    """
+    if out_time_us is None or speed is None:
+        return None
+    try:
+        speed_value = float(speed.rstrip(b"x"))
+        return int(out_time_us) / 1_000_000 / speed_value if speed_value > 0 else None
+    except ValueError:
+        return None
+
+
+class ReplayProcess:
+    """
+    A stand-in for the process of an ffmpeg command, that writes a recorded log
+    (e.g. from `--log-file`) to its stdout pipe instead of running anything.
+
+    The log is copied to the pipe by a background thread, in chunks, so that
+    logs of any size are replayed with constant memory. It is either copied as
+    fast as the pipe is read, or, with `realtime`, each progress block is held
+    back until the time at which ffmpeg originally wrote it, which is derived
+    from its output time and speed. Logs ending in ".gz" are decompressed.
+
+    Only the parts of `subprocess.Popen` that `FfmpegProgress` uses are provided.
+    The process "exits" with 0 once the log was written, or with -9 if it was killed.
+    If the log cannot be read to its end (e.g. a truncated ".gz" file), an error
+    line is written after the replayed output, and the process exits with 1, like
+    a failed ffmpeg.
+    """
+
+    def __init__(self, log_file: str, realtime: bool = False) -> None:
+        """
+        Start replaying a log.
+
+        Args:
+            log_file (str): The path of the log.
+            realtime (bool, optional): Write each progress block at its original time. Defaults to False.
+
+        Raises:
+            OSError: If the log cannot be opened.
+        """
+        self.args = [log_file]
+        self.realtime = realtime
+        self.stdin = None
+        self.stderr = None
+        self.returncode: Optional[int] = None
+
+        log = _open_log(log_file)
+        read_fd, self._write_fd = os.pipe()
+        self.stdout = open(read_fd, "rb", buffering=0)
+        self._killed = threading.Event()
+        self._thread = threading.Thread(target=self._replay, args=(log,), daemon=True)
+        self._thread.start()
+
+    def _write(self, data: Union[bytes, bytearray, memoryview]) -> bool:
+        """
+        Write data to the pipe, unless the process is killed in the meantime.
+
+        Returns:
+            bool: Whether all data was written.
+        """
+        view = memoryview(data)
+        while view:
+            if self._killed.is_set():
+                return False
+            # a blocking write, which kill() interrupts by draining the pipe
+            try:
+                view = view[os.write(self._write_fd, view) :]
+            except BrokenPipeError:
+                return False
+        return True
+
+    def _wait_until(self, deadline: float) -> bool:
+        """
+        Wait until a time, unless the process is killed in the meantime.
+        """
+        return not self._killed.wait(max(deadline - time.monotonic(), 0))
+
+    def _replay(self, log: IO[bytes]) -> None:
+        returncode = 0
+        try:
+            if self.realtime:
+                self._replay_realtime(log)
+            else:
+                while (chunk := log.read(CHUNK_SIZE)) and self._write(chunk):
+                    pass
+        except Exception as e:
+            returncode = 1
+            self._write(f"Error replaying {self.args[0]}: {e!r}\n".encode())
+        finally:
+            log.close()
+            os.close(self._write_fd)
+            self.returncode = -9 if self._killed.is_set() else returncode
+
+    def _replay_realtime(self, log: IO[bytes]) -> None:
+        start = time.monotonic()
+        pending = bytearray()
+        out_time_us: Optional[bytes] = None
+        speed: Optional[bytes] = None
+        for line in log:
+            if line.startswith(b"out_time_us="):
+                out_time_us = line[len(b"out_time_us=") :].strip()
+            elif line.startswith(b"speed="):
+                speed = line[len(b"speed=") :].strip()
+            elif line.startswith(b"progress="):
+                # hold back the block, and the log lines before it, until its time
+                block_time = _block_time(out_time_us, speed)
+                if block_time is not None and not self._wait_until(start + block_time):
+                    return
+                out_time_us = speed = None
+                pending += line
+                if not self._write(pending):
+                    return
+                pending.clear()
+                continue
+            pending += line
+            if len(pending) >= CHUNK_SIZE:
+                if not self._write(pending):
+                    return
+                pending.clear()
+        self._write(pending)
+
+    def poll(self) -> Optional[int]:
+        """
+        Get the return code, or None if the log is still being written.
+        """
+        return None if self._thread.is_alive() else self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """
+        Wait until the log was written, or the process was killed.
+
+        Raises:
+            subprocess.TimeoutExpired: If the timeout expired.
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise subprocess.TimeoutExpired(self.args, timeout)  # type: ignore
+        return self.returncode  # type: ignore
+
+    def kill(self) -> None:
+        """
+        Stop writing the log. The reader sees the end of the output.
+        """
+        self._killed.set()
+        # discard what is left in the pipe, so that a write blocked on a full
+        # pipe returns, and the writer sees that it was killed
+        if self._thread.is_alive() and not self.stdout.closed:
+            try:
+                while self.stdout.read(CHUNK_SIZE):
+                    pass
+            except (OSError, ValueError):
+                pass
+
+    terminate = kill
+
+    def communicate(self, input: Any = None, timeout: Optional[float] = None) -> Any:
+        """
+        Stop writing the log, like ffmpeg quits when "q" is written to its stdin.
+        """
+        self.kill()
+        self.wait(timeout)
+        return None, None
+
+    def __del__(self) -> None:
+        if hasattr(self, "stdout"):
+            self.stdout.close()
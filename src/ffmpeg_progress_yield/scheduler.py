@@ -0,0 +1,215 @@
+import asyncio
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .ffmpeg_progress_yield import FfmpegProgress
+
+# options that set the number of threads of a part of the ffmpeg pipeline
+THREAD_OPTIONS = ("-threads", "-filter_threads", "-filter_complex_threads")
+
+
+class CpuScheduler:
+    """
+    Admit ffmpeg jobs only while the sum of their threads fits the CPU cores.
+
+    Each job is assigned a thread budget: the largest value of its `-threads`,
+    `-filter_threads` or `-filter_complex_threads` options, or, if it sets none,
+    `threads_per_job`. If `threads_per_job` is set, these options are also added
+    to such jobs, so that ffmpeg actually stays within the budget; otherwise,
+    ffmpeg picks its thread count from the number of cores, and the job is
+    assigned all of them. A budget larger than the number of cores is capped,
+    so that the job can run once no other job is running.
+
+    The scheduler can be shared between threads, and between asyncio tasks.
+    To tune it, it keeps track of how long jobs waited to be admitted, and
+    of the achieved utilization of the thread budget.
+    """
+
+    def __init__(
+        self, cores: Optional[int] = None, threads_per_job: Optional[int] = None
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            cores (int, optional): The number of threads that may run at once. Defaults to None (the number of CPUs).
+            threads_per_job (int, optional): The thread budget of jobs that do not set one, which is then added to their command. Defaults to None (do not change the command, and assign all cores).
+        """
+        if cores is None:
+            cores = os.cpu_count() or 1
+        if cores < 1:
+            raise ValueError("cores must be at least 1")
+        if threads_per_job is not None and threads_per_job < 1:
+            raise ValueError("threads_per_job must be at least 1")
+
+        self.cores = cores
+        self.threads_per_job = threads_per_job
+
+        # the number of jobs admitted so far, and how long they waited in seconds
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._in_use = 0
+        # the integral of the threads in use over time, for the utilization
+        self._busy_time = 0.0
+        self._first_admitted: Optional[float] = None
+        self._last_change = 0.0
+
+    @staticmethod
+    def declared_threads(cmd: List[str]) -> Optional[int]:
+        """
+        Get the number of threads that a command sets.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+
+        Returns:
+            Optional[int]: The largest value of a thread option, None if there is none,
+                or 0 if ffmpeg is to choose the number of threads.
+        """
+        values = [
+            int(value)
+            for option, value in zip(cmd, cmd[1:])
+            if option in THREAD_OPTIONS and value.isdigit()
+        ]
+        if not values:
+            return None
+        return 0 if 0 in values else max(values)
+
+    def prepare(self, ff: "FfmpegProgress") -> int:
+        """
+        Determine the thread budget of a job, adding thread options to its command if needed.
+
+        Args:
+            ff (FfmpegProgress): The job, before it is run.
+
+        Returns:
+            int: The thread budget.
+        """
+        threads = self.declared_threads(ff.cmd)
+        if threads is None and self.threads_per_job is not None:
+            threads = self.threads_per_job
+            cmd = ff.cmd_with_progress
+            # -filter_threads is a global option, while -threads applies to the
+            # output that follows it, which is the last argument
+            ff.cmd_with_progress = (
+                cmd[:1]
+                + ["-filter_threads", str(threads)]
+                + cmd[1:-1]
+                + ["-threads", str(threads)]
+                + cmd[-1:]
+            )
+        if not threads:
+            return self.cores
+        return min(threads, self.cores)
+
+    def _try_admit(self, threads: int, start: float) -> bool:
+        # must be called with the lock held
+        if self._in_use and self._in_use + threads > self.cores:
+            return False
+        now = time.monotonic()
+        self._update_busy_time(now)
+        if self._first_admitted is None:
+            self._first_admitted = now
+        self._in_use += threads
+        self.admitted += 1
+        wait = now - start
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return True
+
+    def _update_busy_time(self, now: float) -> None:
+        self._busy_time += self._in_use * (now - self._last_change)
+        self._last_change = now
+
+    def acquire(self, threads: int, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until a job with the given thread budget can be admitted.
+
+        Args:
+            threads (int): The thread budget, as returned by `prepare`.
+            timeout (float, optional): The maximum time to wait in seconds. Defaults to None (wait indefinitely).
+
+        Returns:
+            bool: True if the job was admitted, False if the timeout expired.
+        """
+        start = time.monotonic()
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._try_admit(threads, start), timeout=timeout
+            )
+
+    async def async_acquire(self, threads: int) -> None:
+        """
+        Asynchronously wait until a job with the given thread budget can be admitted.
+
+        Args:
+            threads (int): The thread budget, as returned by `prepare`.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                if self._try_admit(threads, start):
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, threads: int) -> None:
+        """
+        Give back the thread budget of a finished job.
+
+        Args:
+            threads (int): The thread budget that the job was admitted with.
+        """
+        with self._cond:
+            self._update_busy_time(time.monotonic())
+            self._in_use -= threads
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    @property
+    def in_use(self) -> int:
+        """
+        The number of threads of the jobs that are currently admitted.
+        """
+        return self._in_use
+
+    @property
+    def mean_wait(self) -> float:
+        """
+        The mean time in seconds that jobs waited to be admitted.
+        """
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """
+        The fraction of the cores that were assigned to jobs, on average since the first job was admitted.
+        """
+        with self._cond:
+            if self._first_admitted is None:
+                return 0.0
+            now = time.monotonic()
+            self._update_busy_time(now)
+            elapsed = now - self._first_admitted
+            return self._busy_time / (self.cores * elapsed) if elapsed > 0 else 0.0
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,374 @@
+import asyncio
+import bisect
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+from .batch import BatchRunner
+from .ffmpeg_progress_yield import FfmpegProgress
+
+# the share of the overall progress that is assigned to concatenating the segments
+CONCAT_WEIGHT = 0.02
+
+# options that would conflict with the time ranges of the segments
+_TIME_OPTIONS = ("-ss", "-sseof", "-t", "-to")
+
+
+class SegmentedTranscode:
+    """
+    Transcode a long input faster by splitting it into segments that are
+    transcoded in parallel, and concatenated afterwards.
+
+    The command must have a single input (`-i`), and the output as its last
+    argument. The input is split into `segments` time ranges of roughly equal
+    length, starting at keyframes of the first video stream, so that the
+    segments can be cut without re-encoding overlaps. Each range is transcoded
+    by a copy of the command (with `-ss` and `-t` added), up to `workers` at a
+    time. The results are then joined with the concat demuxer, without
+    re-encoding.
+
+    The progress of the segments is weighted by their length. Concatenation,
+    which only copies data, accounts for the last 2%.
+
+    As each segment is encoded on its own, encoders that use the whole input
+    (e.g. two-pass rate control) cannot be split this way. For codecs that are
+    limited by the CPU, the wall-clock time drops roughly linearly with the
+    number of workers, until they exceed the number of cores.
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        segments: Optional[int] = None,
+        workers: Optional[int] = None,
+        temp_dir: Optional[str] = None,
+        keep_segments: bool = False,
+        ffprobe_path: str = "ffprobe",
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize the transcode.
+
+        Args:
+            cmd (List[str]): A list of command line elements, e.g. ["ffmpeg", "-i", ...]
+            segments (int, optional): The number of segments. Defaults to None (the number of workers).
+            workers (int, optional): The maximum number of segments to transcode at once. Defaults to None (the number of CPUs).
+            temp_dir (str, optional): The directory to create the directory for the segments in. Defaults to None (the system default).
+            keep_segments (bool, optional): Keep the segments after concatenating them. Defaults to False.
+            ffprobe_path (str, optional): Path to ffprobe executable. Defaults to "ffprobe".
+            **kwargs: Passed to FfmpegProgress for every segment, and for the concatenation.
+
+        Raises:
+            ValueError: If the command does not have exactly one input, or already sets a time range.
+        """
+        inputs = [i for i, arg in enumerate(cmd[:-1]) if arg == "-i"]
+        if len(inputs) != 1:
+            raise ValueError("the command must have exactly one input")
+        if any(option in cmd for option in _TIME_OPTIONS):
+            raise ValueError(
+                f"the command must not set a time range ({', '.join(_TIME_OPTIONS)})"
+            )
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if segments is not None and segments < 1:
+            raise ValueError("segments must be at least 1")
+
+        self.cmd = cmd
+        self.input_file = cmd[inputs[0] + 1]
+        self.output_file = cmd[-1]
+        self.segments = segments if segments is not None else workers
+        self.workers = workers
+        self.temp_dir = temp_dir
+        self.keep_segments = keep_segments
+        self.ffprobe_path = ffprobe_path
+        self.kwargs = kwargs
+
+        self._input_index = inputs[0]
+        # the overall progress in percent
+        self.progress: float = 0
+        # the duration of the input in seconds, and the (start, length) of each segment
+        self.duration: Optional[float] = None
+        self.ranges: List[Tuple[float, Optional[float]]] = []
+        # the batch of segments, once started
+        self.batch: Optional[BatchRunner] = None
+
+    def _probe_keyframes(self) -> List[float]:
+        """
+        Get the timestamps of the keyframes of the first video stream, from the
+        packet flags, without decoding.
+
+        Returns:
+            List[float]: The timestamps in seconds, or an empty list if there is no video.
+        """
+        output = subprocess.check_output(
+            [
+                self.ffprobe_path,
+                "-loglevel",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "packet=pts_time,flags",
+                "-of",
+                "csv=print_section=0",
+                self.input_file,
+            ],
+            universal_newlines=True,
+        )
+        keyframes = []
+        for line in output.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        return sorted(keyframes)
+
+    def _probe_duration(self) -> float:
+        ff = FfmpegProgress(
+            self.cmd, ffprobe_path=self.ffprobe_path, lazy_probe=True, dry_run=True
+        )
+        duration_ms = ff._probe_duration(self.cmd)
+        if duration_ms is None:
+            raise RuntimeError(f"Cannot determine the duration of {self.input_file}")
+        return duration_ms / 1000
+
+    @staticmethod
+    def split(
+        duration: float, segments: int, keyframes: List[float]
+    ) -> List[Tuple[float, Optional[float]]]:
+        """
+        Split a duration into time ranges of roughly equal length, starting at keyframes.
+
+        Args:
+            duration (float): The duration in seconds.
+            segments (int): The number of ranges to aim for. There may be fewer if there are not enough keyframes.
+            keyframes (List[float]): The sorted keyframe timestamps in seconds. If empty, every time is a valid start.
+
+        Returns:
+            List[Tuple[float, Optional[float]]]: The start and length of each range, in seconds.
+                The length of the last range is None (until the end).
+        """
+        # timestamps may not start at zero, while -ss is relative to the start
+        origin = keyframes[0] if keyframes else 0
+        starts = [0.0]
+        for i in range(1, segments):
+            target = duration * i / segments
+            start = target
+            if keyframes:
+                # the keyframe closest to the target
+                pos = bisect.bisect_left(keyframes, origin + target)
+                candidates = keyframes[max(pos - 1, 0) : pos + 1]
+                start = min(candidates, key=lambda k: abs(k - origin - target)) - origin
+            if starts[-1] < start < duration:
+                starts.append(start)
+        ends: List[Optional[float]] = [*starts[1:], None]
+        return [
+            (start, end - start if end is not None else None)
+            for start, end in zip(starts, ends)
+        ]
+
+    def plan(self) -> List[Tuple[float, Optional[float]]]:
+        """
+        Probe the input and determine the time ranges of the segments.
+
+        Returns:
+            List[Tuple[float, Optional[float]]]: The start and length of each segment, in seconds.
+        """
+        if not self.ranges:
+            self.duration = self._probe_duration()
+            keyframes = self._probe_keyframes() if self.segments > 1 else []
+            self.ranges = self.split(self.duration, self.segments, keyframes)
+        return self.ranges
+
+    def _segment_file(self, directory: str, index: int) -> str:
+        extension = os.path.splitext(self.output_file)[1]
+        return os.path.join(directory, f"segment_{index:05d}{extension}")
+
+    def segment_cmds(self, directory: str) -> List[List[str]]:
+        """
+        Get the commands that transcode the segments into a directory.
+
+        Args:
+            directory (str): The directory to write the segments to.
+
+        Returns:
+            List[List[str]]: One command per segment.
+        """
+        i = self._input_index
+        cmds = []
+        for index, (start, length) in enumerate(self.plan()):
+            cmd = self.cmd[:i] + ["-ss", f"{start:.6f}"] + self.cmd[i:-1]
+            if length is not None:
+                cmd += ["-t", f"{length:.6f}"]
+            cmds.append(cmd + [self._segment_file(directory, index)])
+        return cmds
+
+    def concat_cmd(self, list_file: str) -> List[str]:
+        """
+        Get the command that concatenates the segments listed in a file into the output.
+        """
+        cmd = [self.cmd[0]]
+        if "-y" in self.cmd:
+            cmd.append("-y")
+        return cmd + [
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_file,
+            "-c",
+            "copy",
+            self.output_file,
+        ]
+
+    def _write_list(self, directory: str) -> str:
+        list_file = os.path.join(directory, "segments.txt")
+        with open(list_file, "w") as f:
+            for index in range(len(self.ranges)):
+                path = self._segment_file(directory, index).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+        return list_file
+
+    def _prepare(self) -> Tuple[str, BatchRunner]:
+        ranges = self.plan()
+        directory = tempfile.mkdtemp(prefix="ffmpeg-progress-yield-", dir=self.temp_dir)
+        self.batch = BatchRunner(
+            self.segment_cmds(directory),
+            concurrency=self.workers,
+            fail_fast=True,
+            durations=[
+                length if length is not None else self.duration - start  # type: ignore
+                for start, length in ranges
+            ],
+            **self.kwargs,
+        )
+        self.progress = 0
+        return directory, self.batch
+
+    def _update(self, progress: float) -> Optional[float]:
+        progress = round(min(progress, 100), 2)
+        if progress <= self.progress:
+            return None
+        self.progress = progress
+        return progress
+
+    def _segments_progress(self, batch: BatchRunner) -> float:
+        # each segment is weighted by its share of the duration
+        total = sum(
+            progress * (duration or 0)
+            for progress, duration in zip(batch.progress, batch.durations)
+        )
+        return total / (self.duration or 1) * (1 - CONCAT_WEIGHT)
+
+    @staticmethod
+    def _run_kwargs(
+        min_interval: Union[float, None],
+        min_delta: Union[float, None],
+        stall_timeout: Union[float, None],
+    ) -> Dict[str, Any]:
+        # the options that both the batch of segments and the concatenation take
+        return {
+            "min_interval": min_interval,
+            "min_delta": min_delta,
+            "stall_timeout": stall_timeout,
+        }
+
+    def _cleanup(self, directory: str) -> None:
+        if not self.keep_segments:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(
+        self,
+        popen_kwargs=None,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+    ) -> Iterator[float]:
+        """
+        Transcode the segments in parallel, and concatenate them.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the popen call of every command.
+            min_interval (float, optional): Update the progress of each command at most once per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only update the progress of a command once it changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop a command that makes no progress for this many seconds, failing the run with a StallError. Defaults to None (wait indefinitely).
+
+        Raises:
+            RuntimeError: If probing the input, a segment, or the concatenation fails.
+
+        Yields:
+            Iterator[float]: The overall progress in percent.
+        """
+        run_kwargs = self._run_kwargs(min_interval, min_delta, stall_timeout)
+        directory, batch = self._prepare()
+        try:
+            yield 0
+            for _ in batch.run(popen_kwargs, **run_kwargs):
+                if (
+                    progress := self._update(self._segments_progress(batch))
+                ) is not None:
+                    yield progress
+
+            concat = FfmpegProgress(
+                self.concat_cmd(self._write_list(directory)), **self.kwargs
+            )
+            for concat_progress in concat.run_command_with_progress(
+                popen_kwargs, duration_override=self.duration, **run_kwargs
+            ):
+                progress = 100 * (1 - CONCAT_WEIGHT) + concat_progress * CONCAT_WEIGHT
+                if (progress := self._update(progress)) is not None:
+                    yield progress
+        finally:
+            self._cleanup(directory)
+
+    async def async_run(
+        self,
+        popen_kwargs=None,
+        min_interval: Union[float, None] = None,
+        min_delta: Union[float, None] = None,
+        stall_timeout: Union[float, None] = None,
+    ) -> AsyncIterator[float]:
+        """
+        Transcode the segments in parallel, and concatenate them, asynchronously.
+
+        Args:
+            popen_kwargs (dict, optional): A dict to specify extra arguments to the process creation of every command.
+            min_interval (float, optional): Update the progress of each command at most once per this many seconds. Defaults to None (no limit).
+            min_delta (float, optional): Only update the progress of a command once it changed by this many percentage points. Defaults to None (no limit).
+            stall_timeout (float, optional): Stop a command that makes no progress for this many seconds, failing the run with a StallError. Defaults to None (wait indefinitely).
+
+        Raises:
+            RuntimeError: If probing the input, a segment, or the concatenation fails.
+
+        Yields:
+            AsyncIterator[float]: The overall progress in percent.
+        """
+        run_kwargs = self._run_kwargs(min_interval, min_delta, stall_timeout)
+        # probing runs ffprobe to completion, so keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.plan)
+        directory, batch = self._prepare()
+        try:
+            yield 0
+            async for _ in batch.async_run(popen_kwargs, **run_kwargs):
+                if (
+                    progress := self._update(self._segments_progress(batch))
+                ) is not None:
+                    yield progress
+
+            # with lazy_probe, the event loop is not blocked by probing
+            concat_kwargs: Dict[str, Any] = {**self.kwargs, "lazy_probe": True}
+            concat = FfmpegProgress(
+                self.concat_cmd(self._write_list(directory)), **concat_kwargs
+            )
+            async for concat_progress in concat.async_run_command_with_progress(
+                popen_kwargs, duration_override=self.duration, **run_kwargs
+            ):
+                progress = 100 * (1 - CONCAT_WEIGHT) + concat_progress * CONCAT_WEIGHT
+                if (progress := self._update(progress)) is not None:
+                    yield progress
+        finally:
+            self._cleanup(directory)
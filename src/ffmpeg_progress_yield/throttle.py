@@ -0,0 +1,74 @@
+import time
+from typing import Optional
+
+
+class Throttle:
+    """
+    Limit how often progress updates are delivered to a consumer.
+
+    An update is delivered if at least `min_interval` seconds have passed since
+    the last delivered update, and the progress changed by at least `min_delta`
+    percentage points since then. Updates that do not qualify are dropped; as
+    each update supersedes the previous one, the consumer still receives the
+    latest value with the next delivered update.
+    """
+
+    def __init__(
+        self,
+        min_interval: Optional[float] = None,
+        min_delta: Optional[float] = None,
+    ) -> None:
+        """
+        Initialize the throttle.
+
+        Args:
+            min_interval (float, optional): The minimum time between updates in seconds. Defaults to None (no limit).
+            min_delta (float, optional): The minimum change between updates in percentage points. Defaults to None (no limit).
+        """
+        if min_interval is not None and min_interval < 0:
+            raise ValueError("min_interval must not be negative")
+        if min_delta is not None and min_delta < 0:
+            raise ValueError("min_delta must not be negative")
+
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.reset()
+
+    def reset(self, percent: float = 0) -> None:
+        """
+        Start over, as if an update with the given progress was just delivered.
+
+        Args:
+            percent (float, optional): The progress that was delivered. Defaults to 0.
+        """
+        self._last_percent: Optional[float] = percent
+        self._last_time = time.monotonic()
+
+    def ready(self, percent: Optional[float], now: Optional[float] = None) -> bool:
+        """
+        Check whether an update should be delivered, and if so, remember it as the last one.
+
+        Args:
+            percent (float, optional): The progress of the update, or None if unknown.
+                The minimum delta is not applied to updates without a known progress.
+            now (float, optional): The current value of `time.monotonic()`. Defaults to None (read the clock).
+
+        Returns:
+            bool: True if the update should be delivered.
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.min_interval is not None and now - self._last_time < self.min_interval:
+            return False
+        if (
+            self.min_delta is not None
+            and percent is not None
+            and self._last_percent is not None
+            and abs(percent - self._last_percent) < self.min_delta
+        ):
+            return False
+
+        if percent is not None:
+            self._last_percent = percent
+        self._last_time = now
+        return True
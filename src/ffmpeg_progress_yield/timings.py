@@ -0,0 +1,116 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+# the stages of reading ffmpeg's output that are timed
+STAGES = ("read", "decode", "parse", "callback")
+
+
+class Timings:
+    """
+    The time spent in each stage of reading ffmpeg's output during a run, for
+    profiling. Collected if `FfmpegProgress` is created with `collect_timings=True`.
+
+    The stages are "read" (reading from the pipes, including waiting for ffmpeg
+    to write), "decode" (decoding the output and splitting it into lines),
+    "parse" (parsing the lines, updating the log, the progress and the
+    subscribers), and "callback" (the stderr callback). Stages may be nested,
+    e.g. the callback is called while a line is parsed, in which case the inner
+    stage is not counted for the outer one. The time the caller spends handling
+    an update is not counted for any stage.
+
+    Attributes:
+        seconds (Dict[str, float]): The time spent in each stage, in seconds.
+        calls (Dict[str, int]): The number of times each stage was entered.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        # the stages that are being timed, as [stage, start, time of inner stages]
+        self._stack: List[List[Any]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set all times and counts to zero.
+        """
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.calls = {stage: 0 for stage in STAGES}
+        self._stack = []
+
+    def start(self, stage: str) -> None:
+        """
+        Start timing a stage. Must be followed by `stop()`.
+        """
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def stop(self) -> None:
+        """
+        Stop timing the stage that was started last.
+        """
+        stage, start, inner = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.seconds[stage] += elapsed - inner
+        self.calls[stage] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        Add time to a stage that was measured separately.
+        """
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def call(self, stage: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call a function, and time the call as a stage.
+        """
+        self.start(stage)
+        try:
+            return func(*args)
+        finally:
+            self.stop()
+
+    def wrap(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Get a function that calls `func` and times the call as a stage.
+        """
+
+        def timed(*args: Any) -> Any:
+            return self.call(stage, func, *args)
+
+        return timed
+
+    def wrap_async(
+        self, stage: str, func: Callable[..., Awaitable[Any]]
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Get a coroutine function that awaits `func` and times it as a stage.
+
+        As other stages can run while it is awaited, e.g. in another task, the
+        time is not nested with them, and may overlap with theirs.
+        """
+
+        async def timed(*args: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await func(*args)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        return timed
+
+    @property
+    def total(self) -> float:
+        """
+        The time spent in all stages, in seconds.
+        """
+        return sum(self.seconds.values())
+
+    def __repr__(self) -> str:
+        stages = ", ".join(
+            f"{stage}={self.seconds[stage]:.6f}s/{self.calls[stage]}"
+            for stage in STAGES
+        )
+        return f"Timings({stages})"
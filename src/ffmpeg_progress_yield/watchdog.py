@@ -0,0 +1,169 @@
+import subprocess
+import threading
+import time
+from typing import TYPE_CHECKING, Any, List, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+from .progress import ProgressRecord
+
+
+class StallError(TimeoutError):
+    """
+    Raised when an ffmpeg process made no progress for too long, and was stopped.
+
+    Attributes:
+        cmd (List[str]): The command that stalled.
+        stall_timeout (float): The timeout in seconds that was exceeded.
+        progress (float, optional): The last progress in percent, if known.
+        record (ProgressRecord, optional): The last progress block, if one was received.
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        stall_timeout: float,
+        progress: Optional[float],
+        record: Optional[ProgressRecord],
+        stderr: Optional[str] = None,
+    ) -> None:
+        self.cmd = cmd
+        self.stall_timeout = stall_timeout
+        self.progress = progress
+        self.record = record
+        super().__init__(
+            f"No progress for {stall_timeout} seconds, at {progress}%, running command {cmd}: {stderr}"
+        )
+
+
+class StallWatchdog:
+    """
+    Stop an ffmpeg process that makes no progress.
+
+    A process is considered stalled if no progress block arrived, or the output
+    time did not advance, for `stall_timeout` seconds. It is then asked to quit
+    by sending 'q' (as `quit_gracefully` does), and killed (as `quit` does) if it
+    is still running after `grace_period` seconds.
+
+    The time that the caller spends between two updates does not count, since
+    ffmpeg cannot make progress while its output is not read. The watchdog runs
+    in a thread (`start`), or in an asyncio task (`async_watch`).
+    """
+
+    def __init__(self, stall_timeout: float, grace_period: float = 5.0) -> None:
+        """
+        Initialize the watchdog.
+
+        Args:
+            stall_timeout (float): The time in seconds without progress after which the process is stopped.
+            grace_period (float, optional): The time in seconds to wait for the process to quit before killing it. Defaults to 5.0.
+        """
+        if stall_timeout <= 0:
+            raise ValueError("stall_timeout must be positive")
+        if grace_period < 0:
+            raise ValueError("grace_period must not be negative")
+
+        self.stall_timeout = stall_timeout
+        self.grace_period = grace_period
+        # whether the process was stopped because it stalled
+        self.stalled = False
+
+        self._last_advance = time.monotonic()
+        self._out_time_us: Optional[int] = None
+        self._paused_at: Optional[float] = None
+        self._stopped = threading.Event()
+
+    def feed(self, out_time_us: Optional[int]) -> None:
+        """
+        Note a completed progress block.
+
+        Args:
+            out_time_us (int, optional): The output time of the block, if it was reported.
+        """
+        if (
+            out_time_us is None
+            or self._out_time_us is None
+            or out_time_us > self._out_time_us
+        ):
+            self._last_advance = time.monotonic()
+        if out_time_us is not None:
+            self._out_time_us = out_time_us
+
+    def pause(self) -> None:
+        """
+        Stop counting the time, while the caller handles an update.
+        """
+        self._paused_at = time.monotonic()
+
+    def resume(self) -> None:
+        """
+        Continue counting the time after `pause`.
+        """
+        if self._paused_at is not None:
+            self._last_advance += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def remaining(self) -> float:
+        """
+        The time in seconds until the process is considered stalled.
+        """
+        if self._paused_at is not None:
+            return self.stall_timeout
+        return self._last_advance + self.stall_timeout - time.monotonic()
+
+    def start(self, process: "subprocess.Popen[Any]") -> None:
+        """
+        Start watching a process in a background thread, until `stop` is called.
+
+        Args:
+            process (subprocess.Popen): The process.
+        """
+        threading.Thread(target=self._watch, args=(process,), daemon=True).start()
+
+    def stop(self) -> None:
+        """
+        Stop watching, e.g. because the process finished.
+        """
+        self._stopped.set()
+
+    def _watch(self, process: "subprocess.Popen[Any]") -> None:
+        while not self._stopped.wait(max(self.remaining(), 0)):
+            if self.remaining() > 0:
+                continue
+            self.stalled = True
+            try:
+                if process.stdin is not None:
+                    process.stdin.write(b"q")
+                    process.stdin.flush()
+            except (OSError, ValueError):
+                pass  # the process may have closed its input, or exited
+            try:
+                process.wait(timeout=self.grace_period)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            return
+
+    async def async_watch(self, process: "asyncio.subprocess.Process") -> None:
+        """
+        Watch a process until it stalls, and stop it. Meant to be run as a task,
+        which is cancelled when the process finished.
+
+        Args:
+            process (asyncio.subprocess.Process): The process.
+        """
+        import asyncio
+
+        while (remaining := self.remaining()) > 0:
+            await asyncio.sleep(remaining)
+        self.stalled = True
+        try:
+            if process.stdin is not None:
+                process.stdin.write(b"q")
+                await process.stdin.drain()
+        except (OSError, RuntimeError):
+            pass  # the process may have closed its input, or exited
+        try:
+            await asyncio.wait_for(process.wait(), self.grace_period)
+        except asyncio.TimeoutError:
+            process.kill()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+A stand-in for ffmpeg that replays a recorded log, for tests that should not
+depend on an ffmpeg installation. Apart from "-progress", all command line
+arguments are ignored.
+
+With "-progress -", the whole log is written to stdout (as the progress and
+log streams are merged anyway). With "-progress pipe:N", progress lines are
+written to file descriptor N and log lines to stderr.
+
+Environment variables:
+    FAKE_FFMPEG_LOG: The log to replay. Defaults to fixtures/ffmpeg_output.log.
+    FAKE_FFMPEG_DELAY: Seconds to sleep after each progress block. Defaults to 0.
+    FAKE_FFMPEG_EXIT_CODE: The exit code. Defaults to 0.
+    FAKE_FFMPEG_MEDIA_BYTES: With "-progress pipe:N", write this many bytes of
+        media output to stdout, spread over the progress blocks. Defaults to 0.
+    FAKE_FFMPEG_HANG_AFTER: Stop after this many progress blocks, as if an input
+        stalled, until "q" is read from stdin. Defaults to never.
+    FAKE_FFMPEG_IGNORE_QUIT: If set, ignore "q" while stalled, so that the
+        process has to be killed.
+    FAKE_FFMPEG_TIMESTAMPS: If set, add a "bench_time" line with the value of
+        time.time() to each progress block, right before it is flushed, so
+        that readers can measure their latency.
+"""
+
+import os
+import sys
+import time
+
+log = os.environ.get(
+    "FAKE_FFMPEG_LOG",
+    os.path.join(os.path.dirname(__file__), "fixtures", "ffmpeg_output.log"),
+)
+delay = float(os.environ.get("FAKE_FFMPEG_DELAY", "0"))
+media_bytes = int(os.environ.get("FAKE_FFMPEG_MEDIA_BYTES", "0"))
+hang_after = int(os.environ.get("FAKE_FFMPEG_HANG_AFTER", "-1"))
+ignore_quit = bool(os.environ.get("FAKE_FFMPEG_IGNORE_QUIT"))
+timestamps = bool(os.environ.get("FAKE_FFMPEG_TIMESTAMPS"))
+blocks = 0
+
+progress_target = "-"
+if "-progress" in sys.argv:
+    progress_target = sys.argv[sys.argv.index("-progress") + 1]
+
+if progress_target.startswith("pipe:"):
+    progress_out = os.fdopen(int(progress_target[len("pipe:") :]), "wb")
+    log_out = sys.stderr.buffer
+    media_out = sys.stdout.buffer
+else:
+    progress_out = log_out = sys.stdout.buffer
+    media_out = None
+    media_bytes = 0
+
+# the media output is a repeating byte pattern, so that readers can check it
+media = (bytes(range(256)) * (media_bytes // 256 + 1))[:media_bytes]
+media_written = 0
+
+with open(log, "rb") as f:
+    for line in f:
+        key, sep, _ = line.partition(b"=")
+        if sep and key.decode().isidentifier() and key.islower():
+            if timestamps and key == b"progress":
+                progress_out.write(f"bench_time={time.time()}\n".encode())
+            progress_out.write(line)
+        else:
+            log_out.write(line)
+        if line.startswith(b"progress="):
+            if media_out is not None:
+                # write a part of the output per block, and the rest at the end
+                end = media_bytes
+                if line.startswith(b"progress=continue"):
+                    end = min(media_written + 4096, media_bytes)
+                media_out.write(media[media_written:end])
+                media_out.flush()
+                media_written = end
+            progress_out.flush()
+            log_out.flush()
+            if delay:
+                time.sleep(delay)
+            blocks += 1
+            if blocks == hang_after:
+                if not ignore_quit and sys.stdin.buffer.read(1) == b"q":
+                    sys.exit(255)
+                time.sleep(3600)
+
+progress_out.flush()
+log_out.flush()
+sys.exit(int(os.environ.get("FAKE_FFMPEG_EXIT_CODE", "0")))
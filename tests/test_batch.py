@@ -0,0 +1,102 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import BatchRunner  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+GOOD_CMD = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+BAD_CMD = [os.path.join(os.path.dirname(__file__), "does_not_exist"), "-i", "in.mp4"]
+
+
+def running_jobs(batch):
+    return sum(
+        1
+        for job in batch.jobs
+        if job is not None
+        and job.process is not None
+        and job.process.returncode is None
+    )
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestBatchRunner:
+    @pytest.fixture(autouse=True)
+    def progress_delay(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_DELAY", "0.002")
+
+    def test_invalid_concurrency(self):
+        with pytest.raises(ValueError):
+            BatchRunner([GOOD_CMD], concurrency=0)
+
+    def test_empty(self):
+        batch = BatchRunner([])
+        assert list(batch.run()) == []
+        assert batch.overall == 100
+
+    def test_run(self):
+        batch = BatchRunner([GOOD_CMD] * 5, concurrency=2)
+        max_running = 0
+        for index, progress in batch.run():
+            assert 0 <= index < 5
+            max_running = max(max_running, running_jobs(batch))
+        assert max_running <= 2
+        assert batch.progress == [100] * 5
+        assert batch.overall == 100
+        assert batch.failed == []
+
+    def test_continue_on_error(self):
+        batch = BatchRunner([GOOD_CMD, BAD_CMD, GOOD_CMD], concurrency=2)
+        updates = list(batch.run())
+        assert batch.failed == [1]
+        assert isinstance(batch.errors[1], OSError)
+        assert batch.progress == [100, 0, 100]
+        assert all(index != 1 for index, _ in updates)
+
+    def test_fail_fast(self):
+        batch = BatchRunner([BAD_CMD] + [GOOD_CMD] * 3, concurrency=1, fail_fast=True)
+        with pytest.raises(OSError):
+            list(batch.run())
+        assert batch.jobs[2:] == [None, None]
+        assert running_jobs(batch) == 0
+
+    def test_stop_early(self):
+        batch = BatchRunner([GOOD_CMD] * 4, concurrency=2)
+        updates = batch.run()
+        next(updates)
+        updates.close()
+        assert running_jobs(batch) == 0
+        assert batch.overall < 100
+
+    @pytest.mark.asyncio
+    async def test_async_run(self):
+        batch = BatchRunner([GOOD_CMD] * 5, concurrency=2)
+        max_running = 0
+        async for index, progress in batch.async_run():
+            max_running = max(max_running, running_jobs(batch))
+        assert max_running <= 2
+        assert batch.overall == 100
+
+    @pytest.mark.asyncio
+    async def test_async_fail_fast(self):
+        batch = BatchRunner(
+            [GOOD_CMD, BAD_CMD] + [GOOD_CMD] * 3, concurrency=2, fail_fast=True
+        )
+        with pytest.raises(OSError):
+            async for _ in batch.async_run():
+                pass
+        assert running_jobs(batch) == 0
+        assert batch.jobs[-1] is None
+
+    @pytest.mark.asyncio
+    async def test_async_stop_early(self):
+        batch = BatchRunner([GOOD_CMD] * 4, concurrency=2)
+        updates = batch.async_run()
+        await updates.__anext__()
+        await updates.aclose()
+        assert running_jobs(batch) == 0
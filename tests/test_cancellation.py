@@ -0,0 +1,167 @@
+#!/usr/bin/env pytest
+import asyncio
+import os
+import select
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import (  # noqa: E402
+    CancellationToken,
+    FfmpegProgress,
+    RunCancelledError,
+)
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestCancellationToken:
+    def test_cancel(self):
+        token = CancellationToken()
+        called = []
+        assert not token.cancelled
+        assert token.add_callback(lambda: called.append(True))
+        token.cancel()
+        token.cancel()
+        assert token.cancelled
+        assert called == [True]
+        # not called if added after the cancellation
+        assert not token.add_callback(lambda: called.append(True))
+        assert called == [True]
+
+    def test_remove_callback(self):
+        token = CancellationToken()
+        called = []
+
+        def callback():
+            called.append(True)
+
+        token.add_callback(callback)
+        token.remove_callback(callback)
+        token.cancel()
+        assert called == []
+
+    def test_fileno(self):
+        token = CancellationToken()
+        fd = token.fileno()
+        assert select.select([fd], [], [], 0)[0] == []
+        token.cancel()
+        assert select.select([fd], [], [], 0)[0] == [fd]
+        # a socket created after the cancellation is readable as well
+        token.close()
+        fd = token.fileno()
+        assert select.select([fd], [], [], 0)[0] == [fd]
+        token.close()
+
+    @pytest.mark.asyncio
+    async def test_wait(self):
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        await asyncio.wait_for(token.wait(), 5)
+        # returns at once if already cancelled
+        await asyncio.wait_for(token.wait(), 5)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestStoppedRun:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    @pytest.fixture(autouse=True)
+    def hang(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_HANG_AFTER", "3")
+
+    @pytest.mark.parametrize("separate_progress", [False, True])
+    def test_sync_timeout(self, separate_progress):
+        ff = FfmpegProgress(TestStoppedRun.cmd, separate_progress=separate_progress)
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            list(ff.run_command_with_progress(timeout=0.2))
+        assert time.monotonic() - start < 5
+        assert ff.process is None
+
+    @pytest.mark.parametrize("separate_progress", [False, True])
+    def test_sync_cancel(self, separate_progress):
+        ff = FfmpegProgress(TestStoppedRun.cmd, separate_progress=separate_progress)
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        with pytest.raises(RunCancelledError):
+            list(ff.run_command_with_progress(cancel=token))
+        assert ff.process is None
+
+    def test_sync_cancel_from_loop(self, monkeypatch):
+        monkeypatch.delenv("FAKE_FFMPEG_HANG_AFTER")
+        ff = FfmpegProgress(TestStoppedRun.cmd)
+        token = CancellationToken()
+        progresses = []
+        with pytest.raises(RunCancelledError):
+            for progress in ff.run_command_with_progress(cancel=token):
+                progresses.append(progress)
+                token.cancel()
+        assert len(progresses) == 1
+
+    def test_sync_not_stopped(self, monkeypatch):
+        monkeypatch.delenv("FAKE_FFMPEG_HANG_AFTER")
+        ff = FfmpegProgress(TestStoppedRun.cmd)
+        progresses = list(
+            ff.run_command_with_progress(timeout=60, cancel=CancellationToken())
+        )
+        assert progresses[-1] == 100
+
+    @pytest.mark.parametrize("stop", ["timeout", "cancel", "cancel_from_loop", None])
+    def test_sync_without_selector(self, monkeypatch, stop):
+        # on Windows, the process is killed from another thread instead
+        monkeypatch.setattr(
+            "ffmpeg_progress_yield.ffmpeg_progress_yield._CAN_SELECT_PIPES", False
+        )
+        if stop in ("cancel_from_loop", None):
+            monkeypatch.delenv("FAKE_FFMPEG_HANG_AFTER")
+        ff = FfmpegProgress(TestStoppedRun.cmd)
+        token = CancellationToken()
+        if stop == "cancel":
+            threading.Timer(0.2, token.cancel).start()
+        run = ff.run_command_with_progress(
+            timeout=0.2 if stop == "timeout" else 60, cancel=token
+        )
+        if stop is None:
+            assert list(run)[-1] == 100
+            return
+        with pytest.raises(TimeoutError if stop == "timeout" else RunCancelledError):
+            for _ in run:
+                if stop == "cancel_from_loop":
+                    token.cancel()
+        assert ff.process is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("separate_progress", [False, True])
+    async def test_async_timeout(self, separate_progress):
+        ff = FfmpegProgress(TestStoppedRun.cmd, separate_progress=separate_progress)
+        with pytest.raises(TimeoutError):
+            async for _ in ff.async_run_command_with_progress(timeout=0.2):
+                pass
+        assert ff.process is None
+
+    @pytest.mark.asyncio
+    async def test_async_cancel(self):
+        ff = FfmpegProgress(TestStoppedRun.cmd)
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        with pytest.raises(RunCancelledError):
+            async for _ in ff.async_run_command_with_progress(cancel=token):
+                pass
+        assert ff.process is None
+
+    @pytest.mark.asyncio
+    async def test_async_not_stopped(self, monkeypatch):
+        monkeypatch.delenv("FAKE_FFMPEG_HANG_AFTER")
+        ff = FfmpegProgress(TestStoppedRun.cmd)
+        progresses = [
+            progress
+            async for progress in ff.async_run_command_with_progress(
+                timeout=60, cancel=CancellationToken()
+            )
+        ]
+        assert progresses[-1] == 100
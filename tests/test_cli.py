@@ -0,0 +1,75 @@
+#!/usr/bin/env pytest
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield.__main__ import JSON_FIELDS, format_json  # noqa: E402
+from ffmpeg_progress_yield.progress import ProgressRecord  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_SRC = os.path.join(os.path.dirname(__file__), "../src")
+CMD = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+
+def run_cli(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = _SRC
+    return subprocess.run(
+        [sys.executable, "-m", "ffmpeg_progress_yield", *args],
+        capture_output=True,
+        env=env,
+        **kwargs,
+    )
+
+
+class TestFormatJson:
+    def test_format(self):
+        record = ProgressRecord(48.0, fps=23.5, out_time_us=4800000, eta=5.12345)
+        assert format_json(record) == (
+            b'{"percent":48.0,"out_time_us":4800000,"speed":null,"fps":23.5,"eta":5.123}\n'
+        )
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestJsonProgress:
+    def test_stdout(self):
+        ret = run_cli("--json", "-p", *CMD)
+        assert ret.returncode == 0
+        records = [json.loads(line) for line in ret.stdout.splitlines()]
+        assert all(tuple(record) == JSON_FIELDS for record in records)
+        assert records[0]["percent"] == 0
+        assert records[-1]["percent"] == 100
+        assert records[-1]["out_time_us"] == 10_000_000
+        assert records[-1]["speed"] == 0.952
+        assert records[-1]["eta"] == 0
+
+    def test_progress_fd(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            ret = run_cli(
+                "--progress-fd",
+                str(write_fd),
+                "--min-delta",
+                "30",
+                *CMD,
+                pass_fds=(write_fd,),
+            )
+        finally:
+            os.close(write_fd)
+        with open(read_fd, "rb") as f:
+            lines = f.read().splitlines()
+        assert ret.returncode == 0
+        # the log is still written to stderr, and nothing to stdout
+        assert b"Duration: " in ret.stderr
+        assert ret.stdout == b""
+        assert [json.loads(line)["percent"] for line in lines] == [0, 30, 60, 90, 100]
+
+    def test_invalid_fd(self):
+        ret = run_cli("--progress-fd", "99", *CMD)
+        assert ret.returncode == 2
+        assert b"file descriptor 99" in ret.stderr
@@ -0,0 +1,143 @@
+#!/usr/bin/env pytest
+import os
+import struct
+import sys
+import wave
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import DurationCache, FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.container import read_duration  # noqa: E402
+
+_TEST_MP4 = os.path.join(os.path.dirname(__file__), "test.mp4")
+
+
+def mp4_box(box_type, payload):
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def mvhd(version, timescale, duration):
+    if version == 1:
+        fields = struct.pack(">QQIQ", 0, 0, timescale, duration)
+    else:
+        fields = struct.pack(">IIII", 0, 0, timescale, duration)
+    return mp4_box(b"mvhd", bytes([version, 0, 0, 0]) + fields + b"\0" * 80)
+
+
+def ebml_element(element_id, payload):
+    # always use an 8-byte size, which is valid for any element
+    return element_id + (0x01 << 56 | len(payload)).to_bytes(8, "big") + payload
+
+
+def mkv(info_elements, before_info=b""):
+    header = ebml_element(b"\x1a\x45\xdf\xa3", ebml_element(b"\x42\x82", b"webm"))
+    info = ebml_element(b"\x15\x49\xa9\x66", b"".join(info_elements))
+    # a segment of unknown size, as written by live muxers
+    return (
+        header
+        + b"\x18\x53\x80\x67"
+        + b"\x01\xff\xff\xff\xff\xff\xff\xff"
+        + before_info
+        + info
+    )
+
+
+class TestReadDuration:
+    def test_mp4(self):
+        assert read_duration(_TEST_MP4) == 10000
+
+    def test_mp4_moov_at_end(self, tmp_path):
+        path = tmp_path / "out.mov"
+        path.write_bytes(
+            mp4_box(b"ftyp", b"qt  \0\0\0\0")
+            + mp4_box(b"mdat", b"\0" * 10000)
+            + mp4_box(b"moov", mvhd(1, 90000, 90000 * 12 + 45000))
+        )
+        assert read_duration(str(path)) == 12500
+
+    def test_mp4_without_duration(self, tmp_path):
+        # e.g. fragmented MP4
+        path = tmp_path / "out.mp4"
+        path.write_bytes(mp4_box(b"ftyp", b"isom") + mp4_box(b"moov", mvhd(0, 1000, 0)))
+        assert read_duration(str(path)) is None
+
+    def test_wav(self, tmp_path):
+        path = tmp_path / "out.wav"
+        with wave.open(str(path), "wb") as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+            f.writeframes(b"\0" * 4 * 12000)
+        assert read_duration(str(path)) == 1500
+
+    @pytest.mark.parametrize("size", [0, 0xFFFFFFFF])
+    def test_wav_unknown_size(self, tmp_path, size):
+        path = tmp_path / "out.wav"
+        fmt = struct.pack("<HHIIHH", 1, 2, 8000, 32000, 4, 16)
+        path.write_bytes(
+            b"RIFF\xff\xff\xff\xffWAVE"
+            + struct.pack("<4sI", b"fmt ", len(fmt))
+            + fmt
+            + struct.pack("<4sI", b"data", size)
+            + b"\0" * 32000
+        )
+        assert read_duration(str(path)) is None
+
+    def test_mkv(self, tmp_path):
+        path = tmp_path / "out.mkv"
+        path.write_bytes(
+            mkv(
+                [
+                    ebml_element(b"\x2a\xd7\xb1", (1_000_000).to_bytes(3, "big")),
+                    ebml_element(b"\x44\x89", struct.pack(">d", 12345.0)),
+                ],
+                before_info=ebml_element(b"\xec", b"\0" * 100),
+            )
+        )
+        assert read_duration(str(path)) == 12345
+
+    def test_mkv_float_and_scale(self, tmp_path):
+        path = tmp_path / "out.webm"
+        path.write_bytes(
+            mkv(
+                [
+                    ebml_element(b"\x44\x89", struct.pack(">f", 250.0)),
+                    ebml_element(b"\x2a\xd7\xb1", (10_000_000).to_bytes(4, "big")),
+                ]
+            )
+        )
+        assert read_duration(str(path)) == 2500
+
+    def test_mkv_without_duration(self, tmp_path):
+        path = tmp_path / "out.mkv"
+        path.write_bytes(mkv([ebml_element(b"\x2a\xd7\xb1", b"\x0f\x42\x40")]))
+        assert read_duration(str(path)) is None
+
+    @pytest.mark.parametrize("data", [b"", b"not a media file", b"RIFF\0\0"])
+    def test_unsupported(self, tmp_path, data):
+        path = tmp_path / "in.bin"
+        path.write_bytes(data)
+        assert read_duration(str(path)) is None
+
+    def test_truncated(self, tmp_path):
+        path = tmp_path / "out.mp4"
+        with open(_TEST_MP4, "rb") as f:
+            data = f.read()
+        # cut off in the middle of the mvhd box
+        path.write_bytes(data[: data.index(b"mvhd") + 12])
+        assert read_duration(str(path)) is None
+
+
+class TestProbeHeaders:
+    @pytest.fixture(autouse=True)
+    def no_cache(self, monkeypatch):
+        monkeypatch.setattr(DurationCache, "shared", None)
+
+    def test_without_ffprobe(self, tmp_path):
+        cmd = ["ffmpeg", "-loglevel", "error", "-i", _TEST_MP4, "out.mp4"]
+        missing = str(tmp_path / "ffprobe")
+        assert FfmpegProgress(cmd, ffprobe_path=missing).total_dur == 10000
+        ff = FfmpegProgress(cmd, ffprobe_path=missing, read_headers=False)
+        assert ff.total_dur is None
@@ -0,0 +1,116 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import DurationCache, FfmpegProgress  # noqa: E402
+
+
+@pytest.fixture
+def media_files(tmp_path):
+    files = []
+    for i in range(3):
+        path = tmp_path / f"in{i}.mp4"
+        path.write_bytes(b"x" * (i + 1))
+        files.append(str(path))
+    return files
+
+
+@pytest.fixture
+def fake_ffprobe(tmp_path):
+    # prints a duration of 10 s and counts its invocations
+    calls = tmp_path / "calls"
+    script = tmp_path / "ffprobe"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        f"with open({str(calls)!r}, 'a') as f:\n"
+        "    f.write('x')\n"
+        "print('10.0')\n"
+    )
+    script.chmod(0o755)
+
+    def count():
+        return len(calls.read_text()) if calls.exists() else 0
+
+    return str(script), count
+
+
+class TestDurationCache:
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            DurationCache(maxsize=0)
+
+    def test_get_put(self, media_files):
+        cache = DurationCache()
+        assert cache.get(media_files[0]) is None
+        cache.put(media_files[0], 1000)
+        assert cache.get(media_files[0]) == 1000
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_missing_file(self, tmp_path):
+        cache = DurationCache()
+        missing = str(tmp_path / "missing.mp4")
+        cache.put(missing, 1000)
+        assert cache.get(missing) is None
+        assert len(cache) == 0
+
+    def test_changed_file(self, media_files):
+        cache = DurationCache()
+        cache.put(media_files[0], 1000)
+        with open(media_files[0], "ab") as f:
+            f.write(b"more")
+        assert cache.get(media_files[0]) is None
+
+    def test_lru(self, media_files):
+        cache = DurationCache(maxsize=2)
+        cache.put(media_files[0], 1000)
+        cache.put(media_files[1], 2000)
+        assert cache.get(media_files[0]) == 1000
+        cache.put(media_files[2], 3000)
+        assert len(cache) == 2
+        # the least recently used entry was evicted
+        assert cache.get(media_files[1]) is None
+        assert cache.get(media_files[0]) == 1000
+        assert cache.get(media_files[2]) == 3000
+
+    def test_database(self, media_files, tmp_path):
+        path = str(tmp_path / "durations.sqlite")
+        DurationCache(path=path).put(media_files[0], 1000)
+        cache = DurationCache(path=path)
+        assert cache.get(media_files[0]) == 1000
+        assert cache.get(media_files[1]) is None
+        cache.clear()
+        assert cache.get(media_files[0]) == 1000
+        assert cache.hits == 1
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffprobe cannot be run on Windows")
+class TestProbeCache:
+    @pytest.fixture(autouse=True)
+    def shared_cache(self, monkeypatch):
+        monkeypatch.setattr(DurationCache, "shared", DurationCache())
+
+    def make(self, media_files, ffprobe_path):
+        cmd = ["ffmpeg", "-loglevel", "error"]
+        for file_name in media_files:
+            cmd += ["-i", file_name]
+        return FfmpegProgress(cmd + ["out.mp4"], ffprobe_path=ffprobe_path)
+
+    def test_probe_once(self, media_files, fake_ffprobe):
+        ffprobe_path, count = fake_ffprobe
+        for _ in range(5):
+            ff = self.make(media_files, ffprobe_path)
+            assert ff.total_dur == 10000
+        assert count() == 3
+        assert DurationCache.shared is not None
+        assert DurationCache.shared.hits == 12
+
+    def test_disabled(self, media_files, fake_ffprobe, monkeypatch):
+        monkeypatch.setattr(DurationCache, "shared", None)
+        ffprobe_path, count = fake_ffprobe
+        for _ in range(2):
+            self.make(media_files[:1], ffprobe_path)
+        assert count() == 2
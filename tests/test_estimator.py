@@ -0,0 +1,104 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.estimator import ProgressEstimator  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestProgressEstimator:
+    def test_invalid_alpha(self):
+        with pytest.raises(ValueError):
+            ProgressEstimator(alpha=0)
+        with pytest.raises(ValueError):
+            ProgressEstimator(alpha=1.5)
+
+    def test_initial_speed(self):
+        estimator = ProgressEstimator()
+        assert estimator.eta is None
+        estimator.update(0, 0, out_time_us=0, frame=0, speed=2.5)
+        assert estimator.speed == 2.5
+        assert estimator.fps is None
+        assert estimator.eta is None
+
+    def test_constant_rate(self):
+        estimator = ProgressEstimator()
+        # 1 percent, 2 seconds of media and 50 frames per second of wall-clock time
+        for second in range(11):
+            estimator.update(
+                second, second, out_time_us=second * 2_000_000, frame=second * 50
+            )
+        assert estimator.speed == pytest.approx(2)
+        assert estimator.fps == pytest.approx(50)
+        assert estimator.eta == pytest.approx(90)
+
+    def test_smoothing(self):
+        estimator = ProgressEstimator(alpha=0.5)
+        estimator.update(0, 0)
+        estimator.update(1, 10)
+        # a sudden burst only moves the estimate halfway
+        estimator.update(2, 40)
+        assert estimator.eta == pytest.approx(60 / 20)
+
+    def test_no_elapsed_time(self):
+        estimator = ProgressEstimator()
+        estimator.update(0, 0)
+        estimator.update(1, 10)
+        estimator.update(1, 20)
+        assert estimator.eta == pytest.approx(90 / 10)
+
+    def test_done_and_unknown(self):
+        estimator = ProgressEstimator()
+        estimator.update(0, None, out_time_us=0)
+        estimator.update(1, None, out_time_us=500_000)
+        assert estimator.eta is None
+        assert estimator.speed == pytest.approx(0.5)
+        estimator.update(2, 100)
+        assert estimator.eta == 0
+
+    def test_reset(self):
+        estimator = ProgressEstimator()
+        estimator.update(0, 0, frame=0)
+        estimator.update(1, 50, frame=25)
+        estimator.reset()
+        assert estimator.eta is None
+        assert estimator.fps is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestEstimatedProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    @pytest.fixture(autouse=True)
+    def delay(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_DELAY", "0.01")
+
+    def test_sync(self):
+        ff = FfmpegProgress(TestEstimatedProgress.cmd)
+        etas = []
+        for _ in ff.run_command_with_progress():
+            etas.append(ff.estimator.eta)
+        assert any(eta is not None and eta > 0 for eta in etas)
+        assert ff.estimator.speed is not None and ff.estimator.speed > 0
+        assert ff.estimator.fps is not None and ff.estimator.fps > 0
+
+    def test_sync_structured(self):
+        ff = FfmpegProgress(TestEstimatedProgress.cmd)
+        records = list(ff.run_command_with_progress(structured=True))
+        assert any(record.eta is not None for record in records[:-1])
+        assert records[-1].eta == 0
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestEstimatedProgress.cmd)
+        etas = []
+        async for _ in ff.async_run_command_with_progress():
+            etas.append(ff.estimator.eta)
+        assert any(eta is not None and eta > 0 for eta in etas)
+        assert ff.estimator.speed is not None and ff.estimator.speed > 0
@@ -0,0 +1,175 @@
+#!/usr/bin/env pytest
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress, ProgressRecord  # noqa: E402
+from ffmpeg_progress_yield.events import EventBus  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class Collector:
+    def __init__(self):
+        self.events = []
+
+    def add(self, event):
+        self.events.append(event)
+
+
+class TestEventBus:
+    def test_invalid(self):
+        bus = EventBus()
+        with pytest.raises(ValueError):
+            bus.subscribe(print, topic="nope")
+        with pytest.raises(ValueError):
+            bus.subscribe(print, policy="nope")
+        with pytest.raises(ValueError):
+            bus.subscribe(print, maxsize=0)
+        with pytest.raises(ValueError):
+            bus.subscribe("not callable")  # type: ignore
+        with pytest.raises(ValueError):
+            # a queue needs a running event loop
+            bus.subscribe(asyncio.Queue())
+
+    def test_multiple_subscribers(self):
+        bus = EventBus()
+        first, second = Collector(), Collector()
+        bus.subscribe(first.add)
+        bus.subscribe(second.add)
+        bus.subscribe(lambda event: 1 / 0)
+        for i in range(100):
+            bus.publish("progress", i)
+        bus.publish("log", "not subscribed")
+        assert bus.join(timeout=5)
+        assert first.events == list(range(100))
+        assert second.events == list(range(100))
+
+    def test_unsubscribe(self):
+        bus = EventBus()
+        collector = Collector()
+        subscription = bus.subscribe(collector.add)
+        bus.publish("progress", 1)
+        bus.unsubscribe(subscription)
+        bus.publish("progress", 2)
+        assert subscription.join(timeout=5)
+        assert collector.events == [1]
+        assert not bus.has_subscribers("progress")
+
+    def test_errors(self):
+        bus = EventBus()
+        subscription = bus.subscribe(lambda event: 1 / 0)
+        bus.publish("progress", 1)
+        assert bus.join(timeout=5)
+        assert subscription.errors == 1
+        assert isinstance(subscription.last_error, ZeroDivisionError)
+
+    def test_threads_end(self):
+        threads = threading.active_count()
+        for _ in range(20):
+            ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4", "-f", "null", "-"])
+            ff.subscribe(Collector().add)
+            ff.subscribe(Collector().add, topic="log")
+        del ff
+        gc.collect()
+        deadline = time.monotonic() + 5
+        while threading.active_count() > threads and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert threading.active_count() == threads
+
+    @pytest.mark.parametrize(
+        "policy,expected", [("drop_oldest", [0, 8, 9]), ("latest", [0, 9])]
+    )
+    def test_slow_subscriber(self, policy, expected):
+        bus = EventBus()
+        release = threading.Event()
+        received = []
+
+        def slow(event):
+            release.wait(5)
+            received.append(event)
+
+        subscription = bus.subscribe(slow, policy=policy, maxsize=2)
+        bus.publish("progress", 0)
+        # wait until the first event is being delivered
+        while subscription._buffer:
+            time.sleep(0.001)
+        start = time.monotonic()
+        for i in range(1, 10):
+            bus.publish("progress", i)
+        # publishing does not wait for the subscriber
+        assert time.monotonic() - start < 1
+        release.set()
+        assert bus.join(timeout=5)
+        assert received == expected
+        assert subscription.dropped == 10 - len(expected)
+
+    def test_block(self):
+        bus = EventBus()
+        received = []
+
+        def slow(event):
+            time.sleep(0.01)
+            received.append(event)
+
+        bus.subscribe(slow, policy="block", maxsize=1)
+        for i in range(10):
+            bus.publish("progress", i)
+        assert bus.join(timeout=5)
+        assert received == list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_queue(self):
+        bus = EventBus()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=3)
+        latest: asyncio.Queue = asyncio.Queue()
+        subscription = bus.subscribe(queue)
+        bus.subscribe(latest, policy="latest")
+        with pytest.raises(ValueError):
+            bus.subscribe(asyncio.Queue(), policy="block")
+        # publish from another thread, as the reader of a sync run would
+        thread = threading.Thread(
+            target=lambda: [bus.publish("progress", i) for i in range(10)]
+        )
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.01)
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == [7, 8, 9]
+        assert subscription.dropped == 7
+        assert [latest.get_nowait() for _ in range(latest.qsize())] == [9]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestSubscribedProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def test_sync(self):
+        ff = FfmpegProgress(TestSubscribedProgress.cmd)
+        records, lines = Collector(), Collector()
+        ff.subscribe(records.add)
+        ff.subscribe(lines.add, topic="log")
+        progresses = list(ff.run_command_with_progress())
+        assert ff.events.join(timeout=5)
+        assert all(isinstance(record, ProgressRecord) for record in records.events)
+        assert [record.percent for record in records.events][-1] == 100
+        # every update of the generator was also published
+        assert len(records.events) == len(progresses) - 1
+        assert any("Duration: " in line for line in lines.events)
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestSubscribedProgress.cmd)
+        queue: asyncio.Queue = asyncio.Queue()
+        ff.subscribe(queue)
+        progresses = [p async for p in ff.async_run_command_with_progress()]
+        await asyncio.sleep(0)
+        records = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert len(records) == len(progresses) - 1
+        assert records[-1].percent == 100
@@ -0,0 +1,144 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.log_buffer import LogBuffer  # noqa: E402
+
+_TEST_LOG = os.path.join(os.path.dirname(__file__), "fixtures", "ffmpeg_output.log")
+
+
+def read_log_lines():
+    with open(_TEST_LOG) as f:
+        return f.read().splitlines()
+
+
+class TestLogBuffer:
+    def test_empty(self):
+        buf = LogBuffer()
+        assert buf.text is None
+        assert len(buf) == 0
+
+    def test_append(self):
+        buf = LogBuffer()
+        buf.append("first")
+        assert buf.text == "first"
+        buf.append("second")
+        assert buf.text == "first\nsecond"
+        assert len(buf) == 2
+
+    def test_exclude_progress(self):
+        buf = LogBuffer(exclude_progress=True)
+        buf.append("Stream mapping:")
+        buf.append("out_time=00:00:01.000000")
+        buf.append("progress=continue")
+        assert buf.text == "Stream mapping:"
+        buf.append("frame=1", is_progress=True)
+        buf.append("frame=1", is_progress=False)
+        assert buf.text == "Stream mapping:\nframe=1"
+
+    def test_text_is_cached(self):
+        buf = LogBuffer()
+        buf.append("line")
+        assert buf.text is buf.text
+
+
+class TestProcessOutput:
+    def test_matches_full_join(self):
+        lines = read_log_lines()
+        for exclude_progress in (False, True):
+            ff = FfmpegProgress(
+                ["ffmpeg", "-i", "in.mp4"], exclude_progress=exclude_progress
+            )
+            for line in lines:
+                ff._process_output(line, None)
+            expected = "\n".join(
+                line.strip()
+                for line in lines
+                if not (exclude_progress and FfmpegProgress.PROGRESS_REGEX.match(line))
+            )
+            assert ff.stderr == expected
+
+    def test_progress_values(self):
+        ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4"])
+        progresses = [
+            p
+            for p in (ff._process_output(line, None) for line in read_log_lines())
+            if p is not None
+        ]
+        assert ff.total_dur == 10000
+        assert progresses == sorted(progresses)
+        assert progresses[-1] == 100
+
+
+class TestLogRetention:
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            LogBuffer(max_lines=0)
+        with pytest.raises(ValueError):
+            LogBuffer(max_bytes=0)
+
+    def test_max_lines(self):
+        lines = read_log_lines()
+        buf = LogBuffer(max_lines=20)
+        for _ in range(100):
+            for line in lines:
+                buf.append(line)
+        header_end = lines.index("progress=continue")
+        assert buf.text is not None
+        text_lines = buf.text.splitlines()
+        # the header is kept, up to the limit
+        assert text_lines[:20] == lines[:20]
+        assert header_end > 20
+        assert text_lines[20].startswith("[... ")
+        # the trailing lines are kept
+        assert text_lines[-20:] == lines[-20:]
+        assert len(buf) == 40
+
+    def test_max_bytes_constant(self):
+        lines = read_log_lines()
+        buf = LogBuffer(max_bytes=4096)
+        sizes = []
+        for _ in range(50):
+            for line in lines:
+                buf.append(line)
+            assert buf.text is not None
+            sizes.append(len(buf.text))
+        assert max(sizes) <= 2 * 4096 + 100
+        assert sizes[-1] == sizes[-10]
+        assert buf.text is not None
+        assert buf.text.endswith(lines[-1])
+
+    def test_max_bytes_utf8(self):
+        buf = LogBuffer(max_bytes=100)
+        buf.append("progress=continue")
+        # 10 characters, but 21 bytes with the newline
+        for _ in range(10):
+            buf.append("é" * 10)
+        assert len(buf._lines) == 4
+        assert buf._lines_bytes == 84
+
+    def test_keeps_short_header(self):
+        buf = LogBuffer(max_lines=3)
+        buf.append("Input #0")
+        buf.append("Duration: 00:00:10.00")
+        for i in range(10):
+            buf.append(f"out_time_us={i}")
+            buf.append("progress=continue")
+        buf.append("Error while encoding")
+        assert buf.text is not None
+        text_lines = buf.text.splitlines()
+        assert text_lines[:2] == ["Input #0", "Duration: 00:00:10.00"]
+        assert text_lines[-1] == "Error while encoding"
+
+    def test_ffmpeg_progress_limits(self):
+        ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4"], max_log_lines=10)
+        for line in read_log_lines():
+            ff._process_output(line, None)
+        assert ff.stderr is not None
+        assert "lines omitted" in ff.stderr
+        assert ff.total_dur == 10000
@@ -0,0 +1,179 @@
+#!/usr/bin/env pytest
+import os
+import sys
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import (  # noqa: E402
+    FfmpegProgress,
+    Metrics,
+    RunCancelledError,
+    StallError,
+)
+from ffmpeg_progress_yield.metrics import CONTENT_TYPE, job_result  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_LOG_LINES = 304
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics.shared = Metrics()
+    yield metrics
+    Metrics.shared = None
+
+
+def samples(metrics):
+    # the samples by name and labels, without comments
+    return dict(
+        line.rsplit(" ", 1)
+        for line in metrics.render().splitlines()
+        if not line.startswith("#")
+    )
+
+
+class TestMetrics:
+    def test_empty(self):
+        text = Metrics().render()
+        assert "# TYPE ffmpeg_progress_active_jobs gauge\n" in text
+        assert "# TYPE ffmpeg_progress_job_duration_seconds histogram\n" in text
+        assert samples(Metrics())["ffmpeg_progress_active_jobs"] == "0"
+
+    def test_jobs(self):
+        metrics = Metrics(namespace="test")
+        job = metrics.start_job()
+        job.update(
+            {"speed": "1.5x", "fps": "30.0", "drop_frames": "2", "dup_frames": "1"},
+            50.0,
+            100,
+        )
+        running = samples(metrics)
+        assert running["test_active_jobs"] == "1"
+        assert running[f'test_job_speed{{job="{job.job}"}}'] == "1.5"
+        assert running[f'test_job_fps{{job="{job.job}"}}'] == "30"
+        assert running[f'test_job_progress_percent{{job="{job.job}"}}'] == "50"
+        assert running["test_frames_dropped_total"] == "2"
+        assert running["test_lines_parsed_total"] == "100"
+
+        metrics.finish_job(job, "failed")
+        # finishing twice does not count twice
+        metrics.finish_job(job, "failed")
+        finished = samples(metrics)
+        assert finished["test_active_jobs"] == "0"
+        assert f'test_job_speed{{job="{job.job}"}}' not in finished
+        assert finished['test_jobs_total{result="failed"}'] == "1"
+        assert finished['test_job_duration_seconds_bucket{le="+Inf"}'] == "1"
+        # the totals are kept
+        assert finished["test_frames_dropped_total"] == "2"
+        assert finished["test_frames_duplicated_total"] == "1"
+        assert finished["test_lines_parsed_total"] == "100"
+
+    def test_histogram(self):
+        metrics = Metrics(probe_duration_buckets=[0.1, 1])
+        for seconds in (0.05, 0.5, 5):
+            metrics.observe_probe(seconds)
+        observed = samples(metrics)
+        assert (
+            observed['ffmpeg_progress_probe_duration_seconds_bucket{le="0.1"}'] == "1"
+        )
+        assert observed['ffmpeg_progress_probe_duration_seconds_bucket{le="1"}'] == "2"
+        assert (
+            observed['ffmpeg_progress_probe_duration_seconds_bucket{le="+Inf"}'] == "3"
+        )
+        assert observed["ffmpeg_progress_probe_duration_seconds_sum"] == "5.55"
+        assert observed["ffmpeg_progress_probe_duration_seconds_count"] == "3"
+
+    def test_job_result(self):
+        assert job_result(None) == "succeeded"
+        assert job_result(RuntimeError()) == "failed"
+        assert job_result(TimeoutError()) == "timeout"
+        assert job_result(StallError(["ffmpeg"], 1, None, None, None)) == "stalled"
+        assert job_result(RunCancelledError()) == "cancelled"
+        assert job_result(GeneratorExit()) == "cancelled"
+
+    def test_serve(self):
+        metrics = Metrics()
+        server = metrics.serve(port=0)
+        try:
+            host, port = server.server_address[:2]
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+                assert response.headers["Content-Type"] == CONTENT_TYPE
+                assert response.read().decode() == metrics.render()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestCollectedMetrics:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def test_disabled(self):
+        ff = FfmpegProgress(TestCollectedMetrics.cmd)
+        list(ff.run_command_with_progress())
+        assert ff._metrics_job is None
+
+    def test_sync(self, metrics):
+        ff = FfmpegProgress(TestCollectedMetrics.cmd)
+        for progress in ff.run_command_with_progress():
+            if 0 < progress < 100:
+                assert samples(metrics)["ffmpeg_progress_active_jobs"] == "1"
+        observed = samples(metrics)
+        assert observed["ffmpeg_progress_active_jobs"] == "0"
+        assert observed['ffmpeg_progress_jobs_total{result="succeeded"}'] == "1"
+        assert observed["ffmpeg_progress_lines_parsed_total"] == str(_LOG_LINES)
+
+    def test_separate_progress(self, metrics):
+        ff = FfmpegProgress(TestCollectedMetrics.cmd, separate_progress=True)
+        list(ff.run_command_with_progress())
+        observed = samples(metrics)
+        assert observed["ffmpeg_progress_lines_parsed_total"] == str(_LOG_LINES)
+
+    def test_failure(self, metrics, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        with pytest.raises(RuntimeError):
+            list(FfmpegProgress(TestCollectedMetrics.cmd).run_command_with_progress())
+        assert samples(metrics)['ffmpeg_progress_jobs_total{result="failed"}'] == "1"
+
+    def test_iter_output_in_except(self, metrics, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_MEDIA_BYTES", "1000")
+        ff = FfmpegProgress(
+            [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "mpegts", "-"],
+            separate_progress=True,
+        )
+        try:
+            raise KeyError("handled")
+        except KeyError:
+            # the handled exception is not the result of the run
+            for _ in ff.iter_output():
+                pass
+        assert samples(metrics)['ffmpeg_progress_jobs_total{result="succeeded"}'] == "1"
+
+    def test_abandoned(self, metrics):
+        run = FfmpegProgress(TestCollectedMetrics.cmd).run_command_with_progress()
+        next(run)
+        run.close()  # type: ignore
+        observed = samples(metrics)
+        assert observed["ffmpeg_progress_active_jobs"] == "0"
+        assert observed['ffmpeg_progress_jobs_total{result="cancelled"}'] == "1"
+
+    @pytest.mark.asyncio
+    async def test_async(self, metrics):
+        ff = FfmpegProgress(TestCollectedMetrics.cmd)
+        async for _ in ff.async_run_command_with_progress():
+            pass
+        observed = samples(metrics)
+        assert observed['ffmpeg_progress_jobs_total{result="succeeded"}'] == "1"
+        assert observed["ffmpeg_progress_lines_parsed_total"] == str(_LOG_LINES)
+
+    def test_probe(self, metrics, tmp_path):
+        script = tmp_path / "ffprobe"
+        script.write_text(f"#!{sys.executable}\nprint('10.0')\n")
+        script.chmod(0o755)
+        ff = FfmpegProgress(["ffmpeg"], ffprobe_path=str(script))
+        assert ff._probe_file_duration("in.mp4") == 10000
+        count = samples(metrics)["ffmpeg_progress_probe_duration_seconds_count"]
+        assert count == "1"
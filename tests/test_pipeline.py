@@ -0,0 +1,98 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import Pipeline  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_TEST_MP4 = os.path.join(os.path.dirname(__file__), "test.mp4")
+
+
+def _cmd(input_file: str, output_file: str = "/dev/null"):
+    return [_FAKE_FFMPEG, "-i", input_file, "-f", "null", output_file]
+
+
+class TestPipelineWeights:
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Pipeline([])
+        with pytest.raises(ValueError):
+            Pipeline([_cmd("a"), _cmd("b")], weights=[1])
+        with pytest.raises(ValueError):
+            Pipeline([_cmd("a")], weights=[0])
+
+    def test_explicit(self):
+        pipeline = Pipeline([_cmd("a"), _cmd("b")], weights=[1, 3])
+        pipeline._probe()
+        assert pipeline._step_weights() == [0.25, 0.75]
+
+    def test_equal_without_durations(self):
+        pipeline = Pipeline([_cmd("a"), _cmd("b")])
+        pipeline._probe()
+        assert pipeline.durations == [None, None]
+        assert pipeline._step_weights() == [0.5, 0.5]
+
+    def test_shared_probe(self, monkeypatch):
+        pipeline = Pipeline(
+            [_cmd(_TEST_MP4, "filtered.mkv"), _cmd("filtered.mkv"), _cmd(_TEST_MP4)]
+        )
+        probed = []
+        step = pipeline.steps[0]
+        probe_duration = step._probe_duration
+        monkeypatch.setattr(
+            step,
+            "_probe_duration",
+            lambda cmd: probed.append(cmd) or probe_duration(cmd),
+        )
+        pipeline._probe()
+        # the intermediate file inherits the duration, and the input is probed once
+        assert len(probed) == 1
+        assert pipeline.durations[0] is not None
+        assert pipeline.durations == [pipeline.durations[0]] * 3
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestPipelineRun:
+    def check_progresses(self, progresses):
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert progresses == sorted(progresses)
+        assert len(set(progresses)) == len(progresses)
+
+    def test_run(self):
+        pipeline = Pipeline([_cmd("a"), _cmd("b")], weights=[1, 3])
+        progresses = list(pipeline.run())
+        self.check_progresses(progresses)
+        # the first step ends at its weight
+        assert 25 in progresses
+        assert pipeline.current == 1
+
+    def test_failing_step(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        pipeline = Pipeline([_cmd("a"), _cmd("b")])
+        with pytest.raises(RuntimeError):
+            list(pipeline.run())
+        assert pipeline.current == 0
+
+    def test_structured(self):
+        pipeline = Pipeline([_cmd("a")])
+        with pytest.raises(ValueError):
+            list(pipeline.run(structured=True))
+
+    @pytest.mark.asyncio
+    async def test_async_structured(self):
+        pipeline = Pipeline([_cmd("a")])
+        with pytest.raises(ValueError):
+            async for _ in pipeline.async_run(structured=True):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_async_run(self):
+        pipeline = Pipeline([_cmd("a"), _cmd("b"), _cmd("c")])
+        progresses = [p async for p in pipeline.async_run(min_delta=5)]
+        self.check_progresses(progresses)
+        assert pipeline.current == 2
@@ -0,0 +1,221 @@
+#!/usr/bin/env pytest
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import BatchRunner, DurationCache, FfmpegProgress  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+PROBE_DELAY = 0.3
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(DurationCache, "shared", None)
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    files = []
+    for i in range(5):
+        path = tmp_path / f"in{i}.mp4"
+        path.write_bytes(b"")
+        files.append(str(path))
+    return files
+
+
+@pytest.fixture
+def fake_ffprobe(tmp_path):
+    # reports the number in the file name as the duration in seconds, after a delay
+    calls = tmp_path / "calls"
+    script = tmp_path / "ffprobe"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import re, sys, time\n"
+        f"with open({str(calls)!r}, 'a') as f:\n"
+        "    f.write('x')\n"
+        f"time.sleep({PROBE_DELAY})\n"
+        "print(re.findall(r'in(\\d+)', sys.argv[-1])[-1] + '.5')\n"
+    )
+    script.chmod(0o755)
+
+    def count():
+        return len(calls.read_text()) if calls.exists() else 0
+
+    return str(script), count
+
+
+@pytest.fixture
+def fake_frame_probe(tmp_path):
+    # only reports the number of frames when packets are counted
+    calls = tmp_path / "frame_calls"
+    script = tmp_path / "ffprobe_frames"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        f"with open({str(calls)!r}, 'a') as f:\n"
+        "    f.write('x')\n"
+        "print('250' if '-count_packets' in sys.argv else 'N/A')\n"
+    )
+    script.chmod(0o755)
+
+    def count():
+        return len(calls.read_text()) if calls.exists() else 0
+
+    return str(script), count
+
+
+def make_cmd(executable, inputs):
+    cmd = [executable, "-loglevel", "error"]
+    for file_name in inputs:
+        cmd += ["-i", file_name]
+    return cmd + ["-f", "null", "/dev/null"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffprobe cannot be run on Windows")
+class TestProbe:
+    def test_parallel(self, inputs, fake_ffprobe):
+        ffprobe_path, count = fake_ffprobe
+        start = time.monotonic()
+        ff = FfmpegProgress(make_cmd("ffmpeg", inputs), ffprobe_path=ffprobe_path)
+        assert time.monotonic() - start < PROBE_DELAY * len(inputs) / 2
+        assert ff.total_dur == 4500
+        assert count() == 5
+
+    def test_shortest(self, inputs, fake_ffprobe):
+        ffprobe_path, _ = fake_ffprobe
+        cmd = make_cmd("ffmpeg", inputs) + ["-shortest"]
+        assert FfmpegProgress(cmd, ffprobe_path=ffprobe_path).total_dur == 500
+
+    def test_failure(self, inputs, tmp_path):
+        ff = FfmpegProgress(
+            make_cmd("ffmpeg", inputs), ffprobe_path=str(tmp_path / "missing")
+        )
+        assert ff.total_dur is None
+
+    def test_lazy(self, inputs, fake_ffprobe, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_LOG", os.devnull)
+        ffprobe_path, count = fake_ffprobe
+        ff = FfmpegProgress(
+            make_cmd(_FAKE_FFMPEG, inputs), ffprobe_path=ffprobe_path, lazy_probe=True
+        )
+        assert ff.total_dur is None
+        assert count() == 0
+        assert list(ff.run_command_with_progress()) == [0, 100]
+        assert ff.total_dur == 4500
+        assert count() == 5
+
+    def test_lazy_with_override(self, inputs, fake_ffprobe, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_LOG", os.devnull)
+        ffprobe_path, count = fake_ffprobe
+        ff = FfmpegProgress(
+            make_cmd(_FAKE_FFMPEG, inputs), ffprobe_path=ffprobe_path, lazy_probe=True
+        )
+        list(ff.run_command_with_progress(duration_override=2))
+        assert ff.total_dur == 2000
+        assert count() == 0
+
+    @pytest.mark.asyncio
+    async def test_async_create(self, inputs, fake_ffprobe):
+        ffprobe_path, count = fake_ffprobe
+        start = time.monotonic()
+        ff = await FfmpegProgress.async_create(
+            make_cmd("ffmpeg", inputs), ffprobe_path=ffprobe_path
+        )
+        assert time.monotonic() - start < PROBE_DELAY * len(inputs) / 2
+        assert ff.total_dur == 4500
+        assert count() == 5
+
+    @pytest.mark.asyncio
+    async def test_async_batch(self, inputs, fake_ffprobe, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_LOG", os.devnull)
+        ffprobe_path, count = fake_ffprobe
+        cmds = [make_cmd(_FAKE_FFMPEG, [file_name]) for file_name in inputs[1:]]
+        batch = BatchRunner(cmds, concurrency=len(cmds), ffprobe_path=ffprobe_path)
+        longest_block = 0.0
+
+        async def ticker():
+            nonlocal longest_block
+            while True:
+                start = time.monotonic()
+                await asyncio.sleep(0.01)
+                longest_block = max(longest_block, time.monotonic() - start - 0.01)
+
+        tick = asyncio.ensure_future(ticker())
+        start = time.monotonic()
+        async for _ in batch.async_run():
+            pass
+        tick.cancel()
+        # the jobs are probed in parallel (the time includes running them),
+        # and no probe blocks the event loop
+        assert time.monotonic() - start < PROBE_DELAY * len(cmds)
+        assert longest_block < PROBE_DELAY
+        assert count() == len(cmds)
+        assert [job.total_dur for job in batch.jobs] == [1500, 2500, 3500, 4500]  # type: ignore
+
+    @pytest.mark.asyncio
+    async def test_async_lazy(self, inputs, fake_ffprobe, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_LOG", os.devnull)
+        ffprobe_path, count = fake_ffprobe
+        ff = FfmpegProgress(
+            make_cmd(_FAKE_FFMPEG, inputs), ffprobe_path=ffprobe_path, lazy_probe=True
+        )
+        progresses = [p async for p in ff.async_run_command_with_progress()]
+        assert progresses == [0, 100]
+        assert ff.total_dur == 4500
+        assert count() == 5
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffprobe cannot be run on Windows")
+class TestFrameProbe:
+    def test_frames(self, fake_frame_probe):
+        ffprobe_path, count = fake_frame_probe
+        cmd = ["ffmpeg", "-i", "img%04d.png", "out.mp4"]
+        ff = FfmpegProgress(cmd, ffprobe_path=ffprobe_path, progress_basis="frames")
+        assert ff.total_frames == 250
+        assert count() == 2
+
+    def test_no_probe(self, fake_frame_probe):
+        ffprobe_path, count = fake_frame_probe
+        # known from the command
+        cmd = ["ffmpeg", "-i", "img%04d.png", "-vframes", "10", "out.mp4"]
+        ff = FfmpegProgress(cmd, ffprobe_path=ffprobe_path, progress_basis="frames")
+        assert ff.total_frames == 10
+        # not needed, as the duration will be in the log
+        cmd = ["ffmpeg", "-i", "img%04d.png", "out.mp4"]
+        ff = FfmpegProgress(cmd, ffprobe_path=ffprobe_path, progress_basis="auto")
+        assert ff.total_frames is None
+        # cannot be probed
+        cmd = ["ffmpeg", "-i", "pipe:0", "out.mp4"]
+        ff = FfmpegProgress(cmd, ffprobe_path=ffprobe_path, progress_basis="frames")
+        assert ff.total_frames is None
+        assert count() == 0
+
+    def test_run(self, fake_frame_probe, monkeypatch):
+        ffprobe_path, count = fake_frame_probe
+        cmd = [_FAKE_FFMPEG, "-loglevel", "error", "-i", "-", "-f", "null", "-"]
+        ff = FfmpegProgress(
+            cmd, ffprobe_path=ffprobe_path, progress_basis="auto", lazy_probe=True
+        )
+        assert count() == 0
+        # the input is a pipe, so there is nothing to probe
+        progresses = list(ff.run_command_with_progress())
+        assert ff.total_frames is None
+        assert count() == 0
+        assert len(progresses) > 2
+
+    @pytest.mark.asyncio
+    async def test_async(self, fake_frame_probe):
+        ffprobe_path, count = fake_frame_probe
+        cmd = ["ffmpeg", "-loglevel", "error", "-i", "img%04d.png", "out.mp4"]
+        ff = await FfmpegProgress.async_create(
+            cmd, ffprobe_path=ffprobe_path, progress_basis="auto"
+        )
+        assert ff.total_frames == 250
+        assert count() == 2
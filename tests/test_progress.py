@@ -0,0 +1,203 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress, ProgressRecord  # noqa: E402
+from ffmpeg_progress_yield.progress import (  # noqa: E402
+    BLOCK_END,
+    LOG_LINE,
+    PROGRESS_LINE,
+    ProgressParser,
+)
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestProgressRecord:
+    def test_from_fields(self):
+        record = ProgressRecord.from_fields(
+            {
+                "frame": "100",
+                "fps": "50.00",
+                "bitrate": "1234.5kbits/s",
+                "total_size": "120000",
+                "out_time_us": "4000000",
+                "speed": "2x",
+                "dup_frames": "1",
+                "drop_frames": "0",
+            },
+            40.0,
+        )
+        assert record.percent == 40.0
+        assert record.frame == 100
+        assert record.fps == 50.0
+        assert record.bitrate == 1234.5
+        assert record.total_size == 120000
+        assert record.out_time_us == 4000000
+        assert record.speed == 2.0
+        assert record.dup_frames == 1
+        assert record.drop_frames == 0
+
+    def test_not_available(self):
+        record = ProgressRecord.from_fields(
+            {"bitrate": "N/A", "speed": "N/A", "out_time_us": "N/A"}, None
+        )
+        assert record.bitrate is None
+        assert record.speed is None
+        assert record.out_time_us is None
+
+    def test_slots(self):
+        record = ProgressRecord(10)
+        with pytest.raises(AttributeError):
+            record.foo = 1  # type: ignore
+
+    def test_copy(self):
+        record = ProgressRecord(10, frame=5)
+        other = record.copy(percent=100)
+        assert other.percent == 100
+        assert other.frame == 5
+        assert record.percent == 10
+
+
+class TestStructuredProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def check_records(self, records):
+        assert records[0].percent == 0
+        assert records[-1].percent == 100
+        # one record per progress block, plus the first and last one
+        assert len(records) == 22 + 2
+        percents = [r.percent for r in records]
+        assert percents == sorted(percents)
+        assert records[-2].frame == 250
+        assert records[-2].out_time_us == 10_000_000
+        assert records[-1].frame == 250
+        timestamps = [r.timestamp for r in records]
+        assert timestamps == sorted(timestamps)
+
+    def test_sync(self):
+        ff = FfmpegProgress(TestStructuredProgress.cmd)
+        records = list(ff.run_command_with_progress(structured=True))
+        self.check_records(records)
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestStructuredProgress.cmd)
+        records = [
+            record
+            async for record in ff.async_run_command_with_progress(structured=True)
+        ]
+        self.check_records(records)
+
+    def test_float_mode_unchanged(self):
+        ff = FfmpegProgress(TestStructuredProgress.cmd)
+        progresses = list(ff.run_command_with_progress())
+        assert all(isinstance(p, (int, float)) for p in progresses)
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+
+    def test_dry_run(self):
+        ff = FfmpegProgress(TestStructuredProgress.cmd, dry_run=True)
+        records = list(ff.run_command_with_progress(structured=True))
+        assert [r.percent for r in records] == [0, 100]
+        assert records[-1].eta == 0.0
+
+    @pytest.mark.asyncio
+    async def test_async_dry_run(self):
+        ff = FfmpegProgress(TestStructuredProgress.cmd, dry_run=True)
+        records = [r async for r in ff.async_run_command_with_progress(structured=True)]
+        assert [r.percent for r in records] == [0, 100]
+        assert records[-1].eta == 0.0
+
+
+class TestProgressParser:
+    def test_block(self):
+        parser = ProgressParser()
+        assert parser.feed("Stream mapping:") == LOG_LINE
+        assert parser.feed("[libx264 @ 0x55d5c8a0a2c0] using SAR=1/1") == LOG_LINE
+        assert parser.feed("frame=25") == PROGRESS_LINE
+        assert parser.feed("out_time_us=1000000") == PROGRESS_LINE
+        assert parser.out_time_us is None
+        assert parser.feed("progress=continue") == BLOCK_END
+        assert parser.out_time_us == 1_000_000
+        assert parser.block == {"frame": "25", "out_time_us": "1000000"}
+        assert parser.fields == {}
+
+    def test_not_available(self):
+        parser = ProgressParser()
+        parser.feed("out_time_us=N/A")
+        parser.feed("progress=continue")
+        assert parser.out_time_us is None
+
+    def test_out_time_fallback(self):
+        parser = ProgressParser()
+        parser.feed("out_time=00:01:02.500000")
+        parser.feed("progress=end")
+        assert parser.out_time_us == 62_500_000
+
+    def test_percent_precision(self):
+        ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4"])
+        ff._process_output("  Duration: 00:00:10.00, start: 0.000000", None)
+        ff._process_output("out_time_us=1234000", None)
+        assert ff._process_output("progress=continue", None) == 12.34
+
+
+class TestFrameProgress:
+    def log_lines(self, with_duration=True):
+        log = os.path.join(os.path.dirname(__file__), "fixtures", "ffmpeg_output.log")
+        with open(log) as f:
+            return [
+                line
+                for line in f.read().splitlines()
+                if with_duration or "Duration: " not in line
+            ]
+
+    def progresses(self, ff, lines):
+        return [
+            p
+            for p in (ff._process_output(line, None) for line in lines)
+            if p is not None
+        ]
+
+    def test_invalid_basis(self):
+        with pytest.raises(ValueError):
+            FfmpegProgress(["ffmpeg", "-i", "in.mp4"], progress_basis="bytes")
+
+    def test_frames(self):
+        ff = FfmpegProgress(
+            ["ffmpeg", "-i", "in.mp4", "out.mp4"],
+            progress_basis="frames",
+            total_frames=500,
+        )
+        progresses = self.progresses(ff, self.log_lines())
+        assert progresses == sorted(progresses)
+        # 250 of 500 frames were encoded
+        assert progresses[-1] == 50
+        assert progresses[:3] == [0, 0, 12 * 100 / 500]
+
+    def test_frames_from_cmd(self):
+        ff = FfmpegProgress(
+            ["ffmpeg", "-i", "in.mp4", "-frames:v", "250", "out.mp4"],
+            progress_basis="frames",
+        )
+        assert ff.total_frames == 250
+        assert self.progresses(ff, self.log_lines())[-1] == 100
+
+    def test_auto(self):
+        cmd = ["ffmpeg", "-i", "-", "out.mp4"]
+        # without a duration, the frames are used
+        ff = FfmpegProgress(cmd, progress_basis="auto", total_frames=250)
+        progresses = self.progresses(ff, self.log_lines(with_duration=False))
+        assert ff.total_dur is None
+        assert progresses[-1] == 100
+        # with a duration, the time is used
+        ff = FfmpegProgress(cmd, progress_basis="auto", total_frames=1000)
+        assert self.progresses(ff, self.log_lines())[-1] == 100
+
+    def test_time_ignores_frames(self):
+        ff = FfmpegProgress(["ffmpeg", "-i", "-", "out.mp4"], total_frames=250)
+        assert self.progresses(ff, self.log_lines(with_duration=False)) == []
@@ -0,0 +1,197 @@
+#!/usr/bin/env pytest
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.reader import LineSplitter  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_TEST_LOG = os.path.join(os.path.dirname(__file__), "fixtures", "ffmpeg_output.log")
+
+
+class TestLineSplitter:
+    def test_split(self):
+        splitter = LineSplitter()
+        assert splitter.feed(b"frame=1\nfps=2") == ["frame=1"]
+        assert splitter.feed(b"5.0\n  Duration: 00:00:10.00\r\n") == [
+            "fps=25.0",
+            "Duration: 00:00:10.00",
+        ]
+        assert splitter.flush() == []
+
+    def test_multibyte_across_chunks(self):
+        splitter = LineSplitter()
+        data = "title=Übung\n".encode()
+        assert splitter.feed(data[:7]) == []
+        assert splitter.feed(data[7:]) == ["title=Übung"]
+
+    def test_flush_incomplete_line(self):
+        splitter = LineSplitter()
+        assert splitter.feed(b"progress=end") == []
+        assert splitter.flush() == ["progress=end"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestMergedOutput:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def test_sync(self):
+        with open(_TEST_LOG) as f:
+            log_lines = f.read().splitlines()
+        lines = []
+        ff = FfmpegProgress(TestMergedOutput.cmd)
+        ff.set_stderr_callback(lambda line: lines.append(line))
+        progresses = list(ff.run_command_with_progress())
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert progresses == sorted(progresses)
+        assert len(progresses) == 22 + 2
+        assert lines == [line.strip() for line in log_lines]
+        assert ff.stderr == "\n".join(lines)
+
+    def test_sync_structured_unknown_duration(self, monkeypatch, tmp_path):
+        with open(_TEST_LOG) as f:
+            log = [line for line in f if "Duration: " not in line]
+        log_path = tmp_path / "no_duration.log"
+        log_path.write_text("".join(log))
+        monkeypatch.setenv("FAKE_FFMPEG_LOG", str(log_path))
+        ff = FfmpegProgress(TestMergedOutput.cmd)
+        records = list(ff.run_command_with_progress(structured=True))
+        assert len(records) == 22 + 2
+        assert records[1].percent is None
+        assert records[-2].frame == 250
+
+    def test_sync_error(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        ff = FfmpegProgress(TestMergedOutput.cmd)
+        with pytest.raises(RuntimeError, match="kb/s:72.89"):
+            list(ff.run_command_with_progress())
+
+    def test_no_stdout(self):
+        # without a pipe to read from, only wait for the process to finish
+        ff = FfmpegProgress(TestMergedOutput.cmd)
+        progresses = list(ff.run_command_with_progress({"stdout": subprocess.DEVNULL}))
+        assert progresses == [0, 100]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="not supported on Windows")
+class TestSeparateProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    @pytest.fixture(autouse=True)
+    def progress_delay(self, monkeypatch):
+        # like real ffmpeg, leave time between the banner and progress updates,
+        # as both are read from different pipes
+        monkeypatch.setenv("FAKE_FFMPEG_DELAY", "0.005")
+
+    def test_sync(self):
+        lines = []
+        ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+        ff.set_stderr_callback(lambda line: lines.append(line))
+        progresses = list(ff.run_command_with_progress())
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert progresses == sorted(progresses)
+        assert len(progresses) > 10
+        assert ff.cmd_with_progress[1] == "-progress"
+        assert ff.cmd_with_progress[2].startswith("pipe:")
+        # the log only contains the stderr output
+        assert ff.stderr is not None
+        assert "out_time" not in ff.stderr
+        assert "Duration: 00:00:10.00" in ff.stderr
+        assert not any(line.startswith("frame=") for line in lines)
+
+    def test_sync_structured(self):
+        ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+        records = list(ff.run_command_with_progress(structured=True))
+        assert len(records) == 22 + 2
+        assert records[-2].frame == 250
+
+    def test_sync_error(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+        with pytest.raises(RuntimeError, match="kb/s:72.89"):
+            list(ff.run_command_with_progress())
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+        progresses = [p async for p in ff.async_run_command_with_progress()]
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert len(progresses) > 10
+        assert ff.stderr is not None
+        assert "out_time" not in ff.stderr
+
+    @pytest.mark.asyncio
+    async def test_async_error(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+        with pytest.raises(RuntimeError):
+            async for _ in ff.async_run_command_with_progress():
+                pass
+
+    def test_no_leaked_fds(self):
+        before = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc") else 0
+        for _ in range(5):
+            ff = FfmpegProgress(TestSeparateProgress.cmd, separate_progress=True)
+            for progress in ff.run_command_with_progress():
+                if progress > 50:
+                    break
+        after = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc") else 0
+        assert after <= before
+
+
+@pytest.mark.skipif(os.name == "nt", reason="not supported on Windows")
+class TestIterOutput:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "mpegts", "-"]
+    media_bytes = 200_000
+
+    @pytest.fixture(autouse=True)
+    def media_output(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_DELAY", "0.005")
+        monkeypatch.setenv("FAKE_FFMPEG_MEDIA_BYTES", str(self.media_bytes))
+
+    def test_output_and_progress(self):
+        ff = FfmpegProgress(TestIterOutput.cmd, separate_progress=True)
+        output = bytearray()
+        progresses = []
+        for chunk in ff.iter_output(chunk_size=1000):
+            assert isinstance(chunk, memoryview)
+            assert len(chunk) <= 1000
+            output += chunk
+            progresses.append(ff.progress)
+        expected = (bytes(range(256)) * (self.media_bytes // 256 + 1))[
+            : self.media_bytes
+        ]
+        assert output == expected
+        assert ff.progress == 100
+        assert any(p is not None and 0 < p < 100 for p in progresses)
+        assert ff.stderr is not None
+        assert "Duration: 00:00:10.00" in ff.stderr
+
+    def test_requires_separate_progress(self):
+        ff = FfmpegProgress(TestIterOutput.cmd)
+        with pytest.raises(ValueError):
+            next(ff.iter_output())
+
+    def test_error(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        ff = FfmpegProgress(TestIterOutput.cmd, separate_progress=True)
+        with pytest.raises(RuntimeError):
+            for _ in ff.iter_output():
+                pass
+
+    def test_stdout_to_file(self, tmp_path):
+        # the output is written to the file by the process itself
+        path = tmp_path / "out.ts"
+        ff = FfmpegProgress(TestIterOutput.cmd, separate_progress=True)
+        with open(path, "wb") as f:
+            progresses = list(ff.run_command_with_progress({"stdout": f}))
+        assert progresses[-1] == 100
+        assert path.stat().st_size == self.media_bytes
@@ -0,0 +1,160 @@
+#!/usr/bin/env pytest
+import gzip
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.replay import ReplayProcess  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_SRC = os.path.join(os.path.dirname(__file__), "../src")
+
+# two progress blocks, written 0.1 and 0.2 seconds after the start
+_TIMED_LOG = """Input #0, lavfi, from 'testsrc':
+  Duration: 00:00:01.00, start: 0.000000, bitrate: N/A
+frame=12
+out_time_us=500000
+speed=5x
+progress=continue
+frame=25
+out_time_us=1000000
+speed=5x
+progress=end
+"""
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """
+    Run the fake ffmpeg, and save its log like `--log-file` does.
+
+    Returns:
+        Tuple[str, List[float]]: The path of the log, and the progress of the run.
+    """
+    ff = FfmpegProgress([_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"])
+    progresses = list(ff.run_command_with_progress())
+    path = tmp_path / "log.txt"
+    with open(path, "w") as f:
+        print(ff.stderr, file=f)
+    return str(path), progresses
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestReplay:
+    def test_same_progress(self, recorded):
+        path, progresses = recorded
+        ff = FfmpegProgress.from_log(path)
+        assert list(ff.run_command_with_progress()) == progresses
+        assert ff.total_dur == 10000
+
+    def test_structured(self, recorded):
+        path, progresses = recorded
+        ff = FfmpegProgress.from_log(path)
+        records = list(ff.run_command_with_progress(structured=True))
+        assert [record.percent for record in records][1:] == progresses[1:]
+        assert records[-2].speed == 0.952
+
+    def test_gzip(self, recorded, tmp_path):
+        path, progresses = recorded
+        gz_path = str(tmp_path / "log.txt.gz")
+        with open(path, "rb") as f, gzip.open(gz_path, "wb") as gz:
+            gz.write(f.read())
+        assert list(FfmpegProgress.from_log(gz_path).run_command_with_progress()) == (
+            progresses
+        )
+
+    def test_bounded_log(self, recorded):
+        path, _ = recorded
+        ff = FfmpegProgress.from_log(path, max_log_lines=10)
+        list(ff.run_command_with_progress())
+        assert ff._log.dropped > 0
+        assert ff.total_dur == 10000
+
+    def test_truncated(self, recorded, tmp_path):
+        path, _ = recorded
+        gz_path = tmp_path / "log.txt.gz"
+        with open(path, "rb") as f:
+            gz_path.write_bytes(gzip.compress(f.read())[:-100])
+        ff = FfmpegProgress.from_log(str(gz_path))
+        with pytest.raises(RuntimeError, match="Error replaying"):
+            list(ff.run_command_with_progress())
+
+    def test_invalid(self, recorded):
+        path, _ = recorded
+        with pytest.raises(ValueError):
+            FfmpegProgress.from_log(path, separate_progress=True)
+        with pytest.raises(OSError):
+            list(FfmpegProgress.from_log(path + ".missing").run_command_with_progress())
+
+    @pytest.mark.asyncio
+    async def test_async_unsupported(self, recorded):
+        path, _ = recorded
+        with pytest.raises(ValueError):
+            async for _ in FfmpegProgress.from_log(
+                path
+            ).async_run_command_with_progress():
+                pass
+
+    def test_cli(self, recorded):
+        path, _ = recorded
+        env = os.environ.copy()
+        env["FFMPEG_PROGRESS_NO_TQDM"] = "1"
+        env["PYTHONPATH"] = _SRC
+        ret = subprocess.run(
+            [sys.executable, "-m", "ffmpeg_progress_yield", "-p", "--replay", path],
+            capture_output=True,
+            universal_newlines=True,
+            env=env,
+        )
+        assert ret.returncode == 0
+        assert "50.0/100" in ret.stdout
+        assert "100/100" in ret.stdout
+
+
+class TestRealtime:
+    @pytest.fixture
+    def timed_log(self, tmp_path):
+        path = tmp_path / "timed.txt"
+        path.write_text(_TIMED_LOG)
+        return str(path)
+
+    def test_original_timing(self, timed_log):
+        ff = FfmpegProgress.from_log(timed_log, realtime=True)
+        times = []
+        start = time.monotonic()
+        for progress in ff.run_command_with_progress():
+            times.append((progress, time.monotonic() - start))
+        assert [progress for progress, _ in times] == [0, 50, 100, 100]
+        assert times[1][1] >= 0.1
+        assert 0.2 <= times[2][1] < 2
+
+    def test_kill(self, timed_log):
+        process = ReplayProcess(timed_log, realtime=True)
+        assert process.poll() is None
+        process.kill()
+        assert process.wait(timeout=1) == -9
+        # the reader sees the end of the output
+        assert process.stdout.read() == b""
+
+    def test_kill_full_pipe(self, tmp_path):
+        # much more than fits into the pipe, which is never read
+        path = tmp_path / "large.txt"
+        path.write_text(_TIMED_LOG * 10000)
+        process = ReplayProcess(str(path))
+        time.sleep(0.1)
+        assert process.poll() is None
+        process.kill()
+        assert process.wait(timeout=1) == -9
+
+    def test_timeout(self, tmp_path):
+        path = tmp_path / "slow.txt"
+        path.write_text(_TIMED_LOG.replace("speed=5x", "speed=0.01x"))
+        ff = FfmpegProgress.from_log(str(path), realtime=True)
+        with pytest.raises(TimeoutError):
+            list(ff.run_command_with_progress(timeout=0.2))
@@ -0,0 +1,167 @@
+#!/usr/bin/env pytest
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import BatchRunner, CpuScheduler, FfmpegProgress  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestCpuScheduler:
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            CpuScheduler(cores=0)
+        with pytest.raises(ValueError):
+            CpuScheduler(threads_per_job=0)
+
+    def test_declared_threads(self):
+        assert (
+            CpuScheduler.declared_threads(["ffmpeg", "-i", "in.mp4", "out.mp4"]) is None
+        )
+        assert (
+            CpuScheduler.declared_threads(
+                [
+                    "ffmpeg",
+                    "-filter_threads",
+                    "2",
+                    "-i",
+                    "in.mp4",
+                    "-threads",
+                    "4",
+                    "out.mp4",
+                ]
+            )
+            == 4
+        )
+        assert (
+            CpuScheduler.declared_threads(["ffmpeg", "-threads", "0", "out.mp4"]) == 0
+        )
+
+    def test_prepare(self):
+        cmd = ["ffmpeg", "-i", "in.mp4", "out.mp4"]
+        scheduler = CpuScheduler(cores=8)
+        ff = FfmpegProgress(cmd)
+        assert scheduler.prepare(ff) == 8
+        assert "-threads" not in ff.cmd_with_progress
+
+        scheduler = CpuScheduler(cores=8, threads_per_job=2)
+        ff = FfmpegProgress(cmd)
+        assert scheduler.prepare(ff) == 2
+        assert ff.cmd_with_progress[1:3] == ["-filter_threads", "2"]
+        assert ff.cmd_with_progress[-3:] == ["-threads", "2", "out.mp4"]
+
+        # declared threads are kept, and capped to the cores
+        ff = FfmpegProgress(["ffmpeg", "-i", "in.mp4", "-threads", "16", "out.mp4"])
+        assert scheduler.prepare(ff) == 8
+        assert ff.cmd_with_progress.count("-threads") == 1
+
+    @pytest.mark.skipif(
+        os.name == "nt", reason="separate_progress is not supported on Windows"
+    )
+    def test_prepare_separate_progress(self):
+        scheduler = CpuScheduler(cores=8, threads_per_job=2)
+        ff = FfmpegProgress(
+            ["ffmpeg", "-i", "in.mp4", "out.mp4"], separate_progress=True
+        )
+        scheduler.prepare(ff)
+        read_fd, write_fd = ff._open_progress_pipe({})
+        os.close(read_fd)
+        os.close(write_fd)
+        # the thread options are kept when the progress target is set
+        assert ff.cmd_with_progress == [
+            "ffmpeg",
+            "-filter_threads",
+            "2",
+            "-progress",
+            f"pipe:{write_fd}",
+            "-nostats",
+            "-i",
+            "in.mp4",
+            "-threads",
+            "2",
+            "out.mp4",
+        ]
+
+    def test_acquire_release(self):
+        scheduler = CpuScheduler(cores=4)
+        assert scheduler.acquire(3)
+        assert not scheduler.acquire(2, timeout=0.05)
+        assert scheduler.acquire(1)
+        assert scheduler.in_use == 4
+        scheduler.release(3)
+        assert scheduler.acquire(2, timeout=0)
+        assert scheduler.admitted == 3
+        assert scheduler.max_wait < 0.05
+        assert 0 < scheduler.utilization <= 1
+
+    def test_oversized_job(self):
+        scheduler = CpuScheduler(cores=2)
+        assert scheduler.acquire(4)
+        assert not scheduler.acquire(1, timeout=0)
+
+    @pytest.mark.asyncio
+    async def test_async_acquire(self):
+        scheduler = CpuScheduler(cores=2)
+        await scheduler.async_acquire(2)
+        waiting = asyncio.ensure_future(scheduler.async_acquire(1))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        scheduler.release(2)
+        await asyncio.wait_for(waiting, 1)
+        assert scheduler.in_use == 1
+        assert scheduler.max_wait >= 0.05
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestScheduledBatch:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    @pytest.fixture(autouse=True)
+    def progress_delay(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_DELAY", "0.002")
+
+    def running_jobs(self, batch):
+        return sum(
+            1
+            for job in batch.jobs
+            if job is not None
+            and job.process is not None
+            and job.process.returncode is None
+        )
+
+    @pytest.mark.parametrize("separate_progress", [False, True])
+    def test_run(self, separate_progress):
+        scheduler = CpuScheduler(cores=4, threads_per_job=2)
+        batch = BatchRunner(
+            [self.cmd] * 4,
+            concurrency=4,
+            scheduler=scheduler,
+            separate_progress=separate_progress,
+        )
+        max_running = 0
+        for _ in batch.run():
+            max_running = max(max_running, self.running_jobs(batch))
+        assert max_running <= 2
+        assert batch.overall == 100
+        assert scheduler.in_use == 0
+        assert scheduler.admitted == 4
+        assert all(
+            job is not None and "-filter_threads" in job.cmd_with_progress
+            for job in batch.jobs
+        )
+
+    @pytest.mark.asyncio
+    async def test_async_run(self):
+        scheduler = CpuScheduler(cores=2)
+        batch = BatchRunner([self.cmd] * 3, concurrency=3, scheduler=scheduler)
+        max_running = 0
+        async for _ in batch.async_run():
+            max_running = max(max_running, self.running_jobs(batch))
+        assert max_running == 1
+        assert batch.overall == 100
+        assert scheduler.in_use == 0
@@ -0,0 +1,148 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import SegmentedTranscode  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestSplit:
+    def test_without_keyframes(self):
+        assert SegmentedTranscode.split(9, 3, []) == [(0, 3), (3, 3), (6, None)]
+
+    def test_keyframes(self):
+        keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+        assert SegmentedTranscode.split(10, 3, keyframes) == [
+            (0, 4),
+            (4, 2),
+            (6, None),
+        ]
+
+    def test_few_keyframes(self):
+        # ranges that would start at the same keyframe are merged
+        assert SegmentedTranscode.split(10, 4, [0, 5]) == [(0, 5), (5, None)]
+
+    def test_timestamp_offset(self):
+        assert SegmentedTranscode.split(4, 2, [1.5, 2.5, 3.5, 4.5]) == [
+            (0, 2),
+            (2, None),
+        ]
+
+    def test_single_segment(self):
+        assert SegmentedTranscode.split(10, 1, [0, 5]) == [(0, None)]
+
+
+class TestSegmentedTranscode:
+    def test_invalid_commands(self):
+        with pytest.raises(ValueError):
+            SegmentedTranscode(["ffmpeg", "-i", "a", "-i", "b", "out.mp4"])
+        with pytest.raises(ValueError):
+            SegmentedTranscode(["ffmpeg", "-ss", "5", "-i", "a", "out.mp4"])
+
+    def test_commands(self):
+        transcode = SegmentedTranscode(
+            [
+                "ffmpeg",
+                "-y",
+                "-hwaccel",
+                "auto",
+                "-i",
+                "in.mp4",
+                "-c:v",
+                "libx264",
+                "out.mp4",
+            ]
+        )
+        transcode.duration = 10
+        transcode.ranges = [(0, 4), (4, None)]
+        cmds = transcode.segment_cmds("segments")
+        assert cmds == [
+            ["ffmpeg", "-y", "-hwaccel", "auto", "-ss", "0.000000", "-i", "in.mp4"]
+            + [
+                "-c:v",
+                "libx264",
+                "-t",
+                "4.000000",
+                os.path.join("segments", "segment_00000.mp4"),
+            ],
+            ["ffmpeg", "-y", "-hwaccel", "auto", "-ss", "4.000000", "-i", "in.mp4"]
+            + ["-c:v", "libx264", os.path.join("segments", "segment_00001.mp4")],
+        ]
+        assert transcode.concat_cmd("list.txt") == [
+            "ffmpeg",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            "list.txt",
+            "-c",
+            "copy",
+            "out.mp4",
+        ]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestSegmentedRun:
+    @pytest.fixture
+    def transcode(self, tmp_path, monkeypatch):
+        transcode = SegmentedTranscode(
+            [
+                _FAKE_FFMPEG,
+                "-i",
+                "in.mp4",
+                "-c:v",
+                "libx264",
+                str(tmp_path / "out.mp4"),
+            ],
+            segments=3,
+            workers=2,
+            temp_dir=str(tmp_path),
+        )
+        monkeypatch.setattr(transcode, "_probe_duration", lambda: 10.0)
+        monkeypatch.setattr(transcode, "_probe_keyframes", lambda: [0, 2, 4, 6, 8])
+        return transcode
+
+    def check_progresses(self, progresses):
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert progresses == sorted(progresses)
+
+    def test_run(self, transcode, tmp_path):
+        progresses = list(transcode.run())
+        self.check_progresses(progresses)
+        assert len(transcode.ranges) == 3
+        assert transcode.batch is not None
+        assert transcode.batch.durations == [4, 2, 4]
+        # the segments are removed
+        assert os.listdir(tmp_path) == []
+
+    def test_run_options(self, transcode):
+        progresses = list(transcode.run(min_delta=30, stall_timeout=60))
+        self.check_progresses(progresses)
+        with pytest.raises(TypeError):
+            list(transcode.run(structured=True))
+
+    def test_keep_segments(self, transcode, tmp_path):
+        transcode.keep_segments = True
+        list(transcode.run())
+        (directory,) = os.listdir(tmp_path)
+        with open(tmp_path / directory / "segments.txt") as f:
+            assert len(f.readlines()) == 3
+
+    def test_failing_segment(self, transcode, tmp_path, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_EXIT_CODE", "1")
+        with pytest.raises(RuntimeError):
+            list(transcode.run())
+        assert os.listdir(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_async_run(self, transcode):
+        progresses = [p async for p in transcode.async_run(min_delta=10)]
+        self.check_progresses(progresses)
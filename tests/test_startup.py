@@ -0,0 +1,124 @@
+#!/usr/bin/env pytest
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+import ffmpeg_progress_yield  # noqa: E402
+
+_SRC = os.path.join(os.path.dirname(__file__), "../src")
+# not `from ffmpeg_progress_yield import FfmpegProgress`, as the module would
+# then be imported by importlib, which -X importtime does not report
+_IMPORT = "import ffmpeg_progress_yield.ffmpeg_progress_yield"
+
+# modules that are slow to import, and only needed by some runs
+_DEFERRED = (
+    "asyncio",
+    "concurrent.futures",
+    "http.server",
+    "importlib.metadata",
+    "sqlite3",
+    "tqdm",
+)
+
+# the import time budgets in milliseconds, on top of the interpreter's own
+# startup, with plenty of headroom for slow machines (typically, the import
+# takes about half, and the dry run a third of that)
+IMPORT_BUDGET_MS = 150
+DRY_RUN_BUDGET_MS = 100
+
+
+def import_times(*args: str) -> List[Tuple[str, int]]:
+    """
+    Run Python with `-X importtime`.
+
+    Returns:
+        List[Tuple[str, int]]: Each imported module, indented by its nesting, and the cumulative time of its import in microseconds.
+    """
+    env = os.environ.copy()
+    env["PYTHONPATH"] = _SRC
+    ret = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        universal_newlines=True,
+        env=env,
+        check=True,
+    )
+    times = []
+    # skip the header
+    for line in ret.stderr.splitlines()[1:]:
+        if line.startswith("import time:"):
+            _, cumulative, name = line.split("|")
+            times.append((name[1:], int(cumulative)))
+    return times
+
+
+def modules(*args: str) -> List[str]:
+    return [name.strip() for name, _ in import_times(*args)]
+
+
+def added_ms(*args: str, runs: int = 3) -> float:
+    """
+    Get the least time that imports took on top of the interpreter's, in milliseconds.
+    """
+    baseline = set(modules("-c", "pass"))
+    best = float("inf")
+    for _ in range(runs):
+        # nested imports are indented, and counted for their parent
+        added = sum(
+            cumulative
+            for name, cumulative in import_times(*args)
+            if not name.startswith(" ") and name not in baseline
+        )
+        best = min(best, added / 1000)
+    return best
+
+
+class TestLazyExports:
+    def test_exports(self):
+        for name in ffmpeg_progress_yield.__all__:
+            assert getattr(ffmpeg_progress_yield, name).__name__ == name
+        assert set(ffmpeg_progress_yield.__all__) <= set(dir(ffmpeg_progress_yield))
+
+    def test_version(self):
+        assert isinstance(ffmpeg_progress_yield.__version__, str)
+
+    def test_missing(self):
+        with pytest.raises(AttributeError):
+            ffmpeg_progress_yield.Missing
+
+
+class TestStartup:
+    def test_import(self):
+        imported = modules("-c", _IMPORT)
+        assert "ffmpeg_progress_yield.ffmpeg_progress_yield" in imported
+        assert not [name for name in imported if name.startswith(_DEFERRED)]
+
+    def test_dry_run(self):
+        cmd = ["-m", "ffmpeg_progress_yield", "-n", "ffmpeg", "-i", "in file.mp4"]
+        imported = modules(*cmd)
+        assert "ffmpeg_progress_yield.ffmpeg_progress_yield" not in imported
+        assert not [name for name in imported if name.startswith(_DEFERRED)]
+
+        env = os.environ.copy()
+        env["PYTHONPATH"] = _SRC
+        ret = subprocess.run(
+            [sys.executable, *cmd],
+            capture_output=True,
+            universal_newlines=True,
+            env=env,
+        )
+        assert ret.returncode == 0
+        assert ret.stdout == "ffmpeg -i 'in file.mp4'\n"
+
+    def test_import_budget(self):
+        ms = added_ms("-c", _IMPORT)
+        assert ms < IMPORT_BUDGET_MS
+
+    def test_dry_run_budget(self):
+        ms = added_ms("-m", "ffmpeg_progress_yield", "-n", "ffmpeg", "-i", "in.mp4")
+        assert ms < DRY_RUN_BUDGET_MS
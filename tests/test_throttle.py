@@ -0,0 +1,81 @@
+#!/usr/bin/env pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.throttle import Throttle  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestThrottle:
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            Throttle(min_interval=-1)
+        with pytest.raises(ValueError):
+            Throttle(min_delta=-1)
+
+    def test_min_interval(self):
+        throttle = Throttle(min_interval=1)
+        throttle.reset()
+        start = throttle._last_time
+        assert not throttle.ready(10, now=start + 0.5)
+        assert throttle.ready(20, now=start + 1)
+        assert not throttle.ready(30, now=start + 1.5)
+        assert throttle.ready(None, now=start + 2)
+
+    def test_min_delta(self):
+        throttle = Throttle(min_delta=5)
+        assert not throttle.ready(4.99)
+        assert throttle.ready(5)
+        assert not throttle.ready(9)
+        assert throttle.ready(10.5)
+        # the delta is not applied if the progress is unknown
+        assert throttle.ready(None)
+
+    def test_both(self):
+        throttle = Throttle(min_interval=1, min_delta=5)
+        start = throttle._last_time
+        assert not throttle.ready(50, now=start + 0.5)
+        assert not throttle.ready(1, now=start + 2)
+        assert throttle.ready(50, now=start + 2)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestThrottledProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def check_progresses(self, progresses, min_delta):
+        assert progresses[0] == 0
+        assert progresses[-1] == 100
+        assert progresses == sorted(progresses)
+        deltas = [b - a for a, b in zip(progresses[:-2], progresses[1:-1])]
+        assert all(delta >= min_delta for delta in deltas)
+
+    def test_sync(self):
+        ff = FfmpegProgress(TestThrottledProgress.cmd)
+        progresses = list(ff.run_command_with_progress(min_delta=20))
+        assert len(progresses) < 10
+        self.check_progresses(progresses, 20)
+
+    def test_sync_structured(self):
+        ff = FfmpegProgress(TestThrottledProgress.cmd)
+        records = list(ff.run_command_with_progress(structured=True, min_delta=20))
+        assert len(records) < 10
+        self.check_progresses([record.percent for record in records], 20)
+
+    def test_sync_min_interval(self):
+        ff = FfmpegProgress(TestThrottledProgress.cmd)
+        progresses = list(ff.run_command_with_progress(min_interval=60))
+        assert progresses == [0, 100]
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestThrottledProgress.cmd)
+        progresses = [p async for p in ff.async_run_command_with_progress(min_delta=20)]
+        assert len(progresses) < 10
+        self.check_progresses(progresses, 20)
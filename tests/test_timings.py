@@ -0,0 +1,94 @@
+#!/usr/bin/env pytest
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress  # noqa: E402
+from ffmpeg_progress_yield.timings import STAGES, Timings  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+_LOG_LINES = 304
+
+
+class TestTimings:
+    def test_nested(self):
+        timings = Timings()
+
+        def callback():
+            time.sleep(0.02)
+
+        def parse():
+            timings.call("callback", callback)
+
+        timings.call("parse", parse)
+        assert timings.calls["parse"] == 1
+        assert timings.calls["callback"] == 1
+        assert timings.seconds["callback"] >= 0.02
+        # the callback is not counted for the parse stage
+        assert timings.seconds["parse"] < 0.01
+        assert timings.total == pytest.approx(
+            timings.seconds["parse"] + timings.seconds["callback"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_wrap_async(self):
+        timings = Timings()
+
+        async def read():
+            time.sleep(0.01)
+            return b"data"
+
+        assert await timings.wrap_async("read", read)() == b"data"
+        assert timings.calls["read"] == 1
+        assert timings.seconds["read"] >= 0.01
+
+    def test_reset(self):
+        timings = Timings()
+        timings.add("read", 1.0)
+        timings.reset()
+        assert timings.seconds == {stage: 0.0 for stage in STAGES}
+        assert timings.calls == {stage: 0 for stage in STAGES}
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestCollectedTimings:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    def check(self, ff, lines):
+        timings = ff.timings
+        assert all(timings.seconds[stage] > 0 for stage in STAGES)
+        assert timings.calls["callback"] == len(lines)
+
+    def test_disabled(self):
+        ff = FfmpegProgress(TestCollectedTimings.cmd)
+        list(ff.run_command_with_progress())
+        assert ff.timings is None
+
+    @pytest.mark.parametrize("separate_progress", [False, True])
+    def test_sync(self, separate_progress):
+        ff = FfmpegProgress(
+            TestCollectedTimings.cmd,
+            separate_progress=separate_progress,
+            collect_timings=True,
+        )
+        lines = []
+        ff.set_stderr_callback(lambda line: lines.append(line))
+        progresses = list(ff.run_command_with_progress())
+        assert progresses[-1] == 100
+        self.check(ff, lines)
+        # with a separate pipe, the callback is only called for log lines
+        assert (len(lines) < _LOG_LINES) == separate_progress
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestCollectedTimings.cmd, collect_timings=True)
+        lines = []
+        ff.set_stderr_callback(lambda line: lines.append(line))
+        progresses = [p async for p in ff.async_run_command_with_progress()]
+        assert progresses[-1] == 100
+        self.check(ff, lines)
+        assert len(lines) == _LOG_LINES
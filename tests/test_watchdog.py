@@ -0,0 +1,105 @@
+#!/usr/bin/env pytest
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../"))
+
+from ffmpeg_progress_yield import FfmpegProgress, StallError  # noqa: E402
+from ffmpeg_progress_yield.watchdog import StallWatchdog  # noqa: E402
+
+_FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+
+class TestStallWatchdog:
+    def test_invalid_timeouts(self):
+        with pytest.raises(ValueError):
+            StallWatchdog(0)
+        with pytest.raises(ValueError):
+            StallWatchdog(1, grace_period=-1)
+
+    def test_out_time_must_advance(self):
+        watchdog = StallWatchdog(10)
+        watchdog.feed(1_000_000)
+        advanced = watchdog._last_advance
+        time.sleep(0.01)
+        watchdog.feed(1_000_000)
+        assert watchdog._last_advance == advanced
+        watchdog.feed(2_000_000)
+        assert watchdog._last_advance > advanced
+
+    def test_pause(self):
+        watchdog = StallWatchdog(0.05)
+        watchdog.pause()
+        time.sleep(0.1)
+        assert watchdog.remaining() == 0.05
+        watchdog.resume()
+        assert 0 < watchdog.remaining() <= 0.05
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake ffmpeg cannot be run on Windows")
+class TestStalledProgress:
+    cmd = [_FAKE_FFMPEG, "-i", "in.mp4", "-f", "null", "/dev/null"]
+
+    @pytest.fixture(autouse=True)
+    def hang(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_HANG_AFTER", "3")
+
+    def check_error(self, error):
+        assert error.stall_timeout == 0.2
+        assert error.record is not None
+        assert error.record.out_time_us is not None
+        assert error.progress == error.record.percent
+
+    def test_sync(self):
+        ff = FfmpegProgress(TestStalledProgress.cmd)
+        start = time.monotonic()
+        with pytest.raises(StallError) as excinfo:
+            for _ in ff.run_command_with_progress(stall_timeout=0.2):
+                pass
+        assert time.monotonic() - start < 5
+        self.check_error(excinfo.value)
+
+    def test_sync_kill(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_IGNORE_QUIT", "1")
+        ff = FfmpegProgress(TestStalledProgress.cmd, grace_period=0.2)
+        with pytest.raises(StallError) as excinfo:
+            list(ff.run_command_with_progress(structured=True, stall_timeout=0.2))
+        self.check_error(excinfo.value)
+
+    def test_sync_separate_progress(self):
+        ff = FfmpegProgress(TestStalledProgress.cmd, separate_progress=True)
+        with pytest.raises(StallError) as excinfo:
+            list(ff.run_command_with_progress(stall_timeout=0.2))
+        self.check_error(excinfo.value)
+
+    def test_slow_caller(self, monkeypatch):
+        monkeypatch.delenv("FAKE_FFMPEG_HANG_AFTER")
+        ff = FfmpegProgress(TestStalledProgress.cmd)
+        progresses = []
+        for progress in ff.run_command_with_progress(stall_timeout=0.2):
+            # ffmpeg cannot make progress while the caller is busy
+            time.sleep(0.05)
+            progresses.append(progress)
+        assert progresses[-1] == 100
+
+    @pytest.mark.asyncio
+    async def test_async(self):
+        ff = FfmpegProgress(TestStalledProgress.cmd)
+        with pytest.raises(StallError) as excinfo:
+            async for _ in ff.async_run_command_with_progress(stall_timeout=0.2):
+                pass
+        self.check_error(excinfo.value)
+
+    @pytest.mark.asyncio
+    async def test_async_kill(self, monkeypatch):
+        monkeypatch.setenv("FAKE_FFMPEG_IGNORE_QUIT", "1")
+        ff = FfmpegProgress(
+            TestStalledProgress.cmd, separate_progress=True, grace_period=0.2
+        )
+        with pytest.raises(StallError) as excinfo:
+            async for _ in ff.async_run_command_with_progress(stall_timeout=0.2):
+                pass
+        self.check_error(excinfo.value)